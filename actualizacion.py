@@ -0,0 +1,126 @@
+# actualizacion.py — Disparo de escenarios Make y espera de hojas frescas
+#
+# Los webhooks S1/S2/S3 se disparan en paralelo. En vez de dormir un tiempo
+# fijo, se toma la huella (hash del contenido) de cada pestaña antes del
+# disparo y se vuelve a leer con backoff hasta que cambie o venza el plazo.
+# Las lecturas del sondeo quedan en la caché de sheets.py, así la predicción
+# parte con los datos recién llegados sin volver a descargarlos.
+# Si el escenario termina con un "Webhook response" que devuelve JSON
+# {"terminado": true, "cambios": false|true}, no se espera el plazo completo:
+# sin cambios basta una lectura; con cambios, PLAZO_TERMINADO_SEG (lo que
+# tarda el export de Sheets en reflejarlos). Un webhook que solo responde
+# "Accepted" (lo normal en Make) se espera hasta PLAZO_SEG.
+
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from sheets import Lector, descargar_tab, guardar
+
+PLAZO_SEG = 90
+PLAZO_TERMINADO_SEG = 10
+ESPERA_INICIAL_SEG = 1.0
+ESPERA_MAX_SEG = 8.0
+
+# ======================================
+# WEBHOOKS
+# ======================================
+def trigger_make(url: str, payload: dict) -> dict:
+    if not url:
+        return {"ok": False, "error": "webhook no configurado"}
+    try:
+        r = requests.post(url, json=payload, timeout=10)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    respuesta = {"ok": r.ok, "status": r.status_code, "text": r.text[:500]}
+    try:
+        datos = r.json()
+    except ValueError:
+        datos = None
+    if r.ok and isinstance(datos, dict) and datos.get("terminado"):
+        respuesta["terminado"] = True
+        respuesta["cambios"] = bool(datos.get("cambios", True))
+    return respuesta
+
+
+def plazo_escenario(respuesta: dict) -> float:
+    """Cuánto esperar las hojas de un escenario según lo que respondió su webhook."""
+    if not respuesta.get("terminado"):
+        return PLAZO_SEG
+    return PLAZO_TERMINADO_SEG if respuesta.get("cambios") else 0.0
+
+
+def disparar_escenarios(escenarios: Dict[str, Tuple[str, dict]]) -> Dict[str, dict]:
+    """Dispara {nombre: (url, payload)} en paralelo y devuelve la respuesta de cada uno."""
+    if not escenarios:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(escenarios)) as pool:
+        futuros = {n: pool.submit(trigger_make, url, payload) for n, (url, payload) in escenarios.items()}
+        return {n: f.result() for n, f in futuros.items()}
+
+# ======================================
+# FRESCURA DE PESTAÑAS
+# ======================================
+def huella_inicial(columnas: Iterable) -> "hashlib._Hash":
+    """Hash en curso de una pestaña con esas columnas; se completa con sumar_filas."""
+    return hashlib.sha1("|".join(map(str, columnas)).encode("utf-8"))
+
+
+def sumar_filas(h: "hashlib._Hash", df: pd.DataFrame) -> None:
+    """Agrega las filas de df (sin índice): por bloques da lo mismo que el frame entero."""
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+
+def huella(df: pd.DataFrame) -> str:
+    """Hash del contenido (columnas + valores) de una pestaña."""
+    h = huella_inicial(df.columns)
+    sumar_filas(h, df)
+    return h.hexdigest()
+
+
+def _leer_en_paralelo(sheet_id: str, tabs: List[str], lector: Lector) -> Dict[str, pd.DataFrame]:
+    if not tabs:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(tabs)) as pool:
+        futuros = {t: pool.submit(lector, sheet_id, t) for t in tabs}
+        return {t: f.result() for t, f in futuros.items()}
+
+
+def huellas_actuales(sheet_id: str, tabs: List[str], lector: Lector = descargar_tab) -> Dict[str, str]:
+    """Huella de cada pestaña leída ahora mismo (sin caché)."""
+    return {t: huella(df) for t, df in _leer_en_paralelo(sheet_id, tabs, lector).items()}
+
+
+def esperar_actualizacion(sheet_id: str,
+                          previas: Dict[str, str],
+                          lector: Lector = descargar_tab,
+                          plazo: float = PLAZO_SEG,
+                          espera_inicial: float = ESPERA_INICIAL_SEG,
+                          espera_max: float = ESPERA_MAX_SEG,
+                          plazos: Optional[Dict[str, float]] = None) -> Dict[str, bool]:
+    """Sondea las pestañas hasta que su huella cambie o venza el plazo.
+
+    plazos da un plazo propio a algunas pestañas (p.ej. 0 si su escenario
+    ya avisó que terminó sin cambios: se leen una sola vez).
+    Devuelve {tab: cambió}. La última lectura de cada pestaña queda en la caché.
+    """
+    cambios = {t: False for t in previas}
+    inicio = time.monotonic()
+    limites = {t: inicio + (plazos or {}).get(t, plazo) for t in previas}
+    espera = espera_inicial
+    pendientes = list(previas)
+    while pendientes:
+        for tab, df in _leer_en_paralelo(sheet_id, pendientes, lector).items():
+            guardar(sheet_id, tab, df)
+            cambios[tab] = huella(df) != previas[tab]
+        ahora = time.monotonic()
+        pendientes = [t for t in pendientes if not cambios[t] and ahora + espera <= limites[t]]
+        if not pendientes:
+            break
+        time.sleep(espera)
+        espera = min(espera * 2, espera_max)
+    return cambios
@@ -0,0 +1,88 @@
+# agregados.py — Cubo CLASIFICACION × MES para el dashboard comparativo
+#
+# Los movimientos se resumen una vez (abonos, cargos, neto y cantidad por
+# clasificación y mes) y el cruce con la proyección se hace sobre ese cubo,
+# así los filtros del dashboard solo recortan una tabla chica.
+#
+# El semáforo y el avance del mes están vectorizados: sirven igual para los
+# totales mensuales que para grillas clasificación × mes de muchos clientes.
+
+import numpy as np
+import pandas as pd
+
+# bandas del semáforo sobre DIFERENCIA / MONTO
+UMBRAL_OK = -0.05
+UMBRAL_ATENCION = -0.15
+SEMAFORO_OK = "🟢 OK"
+SEMAFORO_ATENCION = "🟡 Atención"
+SEMAFORO_CRITICO = "🔴 Crítico"
+
+COLUMNAS_CUBO = ["CLASIFICACION", "MES", "CARGOS (CLP)", "ABONOS (CLP)", "NETO", "MOVIMIENTOS"]
+
+
+def construir_cubo(movimientos: pd.DataFrame) -> pd.DataFrame:
+    """Suma cargos/abonos por (CLASIFICACION, MES); NETO = abonos - cargos."""
+    if movimientos.empty:
+        return pd.DataFrame(columns=COLUMNAS_CUBO)
+    df = movimientos[["CLASIFICACION", "FECHA", "CARGOS (CLP)", "ABONOS (CLP)"]].copy()
+    df["MES"] = df["FECHA"].dt.to_period("M").dt.to_timestamp()
+    cubo = (
+        df.groupby(["CLASIFICACION", "MES"])
+        .agg(**{
+            "CARGOS (CLP)": ("CARGOS (CLP)", "sum"),
+            "ABONOS (CLP)": ("ABONOS (CLP)", "sum"),
+            "MOVIMIENTOS": ("FECHA", "size"),
+        })
+        .reset_index()
+    )
+    cubo["NETO"] = cubo["ABONOS (CLP)"] - cubo["CARGOS (CLP)"]
+    return cubo[COLUMNAS_CUBO]
+
+
+def cruzar_con_proyeccion(cubo: pd.DataFrame, proyeccion: pd.DataFrame) -> pd.DataFrame:
+    """Proyección + real por (CLASIFICACION, MES), con REAL_NETO y DIFERENCIA ya calculados."""
+    real = cubo[["CLASIFICACION", "MES", "CARGOS (CLP)", "ABONOS (CLP)"]].copy()
+    real["REAL_NETO"] = cubo["NETO"].abs()
+    df = pd.merge(proyeccion, real, how="left", on=["CLASIFICACION", "MES"])
+    df["REAL_NETO"] = df["REAL_NETO"].fillna(0)
+    df["DIFERENCIA"] = df["REAL_NETO"] - df["MONTO"]
+    return df
+
+
+def totales_mensuales(cubo: pd.DataFrame) -> pd.DataFrame:
+    """Cargos y abonos totales por mes (todas las clasificaciones)."""
+    return (
+        cubo.groupby("MES", as_index=False)[["CARGOS (CLP)", "ABONOS (CLP)"]]
+        .sum()
+        .sort_values("MES")
+        .reset_index(drop=True)
+    )
+
+
+# ======================================
+# SEMÁFORO
+# ======================================
+def evaluar_semaforo(diferencia: pd.Series,
+                     monto: pd.Series,
+                     sin_base: str = "🔘 Sin Proyección",
+                     umbral_ok: float = UMBRAL_OK,
+                     umbral_atencion: float = UMBRAL_ATENCION) -> np.ndarray:
+    """Clasifica diferencia/monto en OK / Atención / Crítico; monto 0 -> sin_base."""
+    monto = np.asarray(monto, dtype=float)
+    diferencia = np.asarray(diferencia, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = diferencia / monto
+    return np.select(
+        [monto == 0, pct >= umbral_ok, pct >= umbral_atencion],
+        [sin_base, SEMAFORO_OK, SEMAFORO_ATENCION],
+        default=SEMAFORO_CRITICO,
+    )
+
+
+def calcular_avance(meses: pd.Series, fecha_max: pd.Timestamp) -> pd.Series:
+    """Fracción del mes ya transcurrida al fecha_max (0 para meses futuros o vacíos)."""
+    meses = pd.to_datetime(meses)
+    dias_totales = meses.dt.days_in_month
+    dias_ejecutados = ((fecha_max - meses).dt.days + 1).clip(upper=dias_totales)
+    avance = dias_ejecutados / dias_totales
+    return avance.where(meses.notna() & (meses <= fecha_max), 0.0)
@@ -1,33 +1,38 @@
-# app_predictor.py — Predictor de Compras (ONLINE Sheets + OFFLINE CSV)
+# app_predictor.py — Predictor de Compras (ONLINE Sheets + copia local / OFFLINE)
 # Ejecuta:
 #   streamlit run app_predictor.py
 
-import os, time, requests
+import os
 import pandas as pd
 import streamlit as st
-from urllib.parse import quote
 from typing import Optional
-from predictor_core import forecast_all  # tu core
+from sheets import descargar_tab, estado_cache_tabs, leer_tabs
+from cache_compartida import TENANTS
+from instrumentacion import iniciar_corrida, medido
+from particionado import TAM_SHARD
+from precalentado import iniciar as iniciar_precalentado
+from prediccion import (
+    TAB_CONFIG,
+    TAB_INBOUND,
+    TAB_STOCK,
+    TAB_STOCK_TRANS,
+    TAB_VENTAS,
+    TABS_LECTURA,
+    actualizar_y_esperar,
+    disparar_escenario,
+    entradas_core,
+    leer_offline,
+    leer_online,
+    lector_tenant,
+    normalizadas_compartidas,
+    predecir,
+)
+from tenants import DEFAULT_SHEET_ID, leer_clientes_config, tenant_desde_fila, tenants, url_con_tenant, urls_globales
 
 # ======================================
 # CONFIG / MODOS
 # ======================================
-OFFLINE = False               # True: lee CSV locales
-BASE = "templates_csv"
-
-# Google Sheets (valores por defecto / modo single-tenant)
-DEFAULT_SHEET_ID   = "1Pbjxy_V-NuTbfnN_SLpexkYx_w62Umsg7eBr2qrQJrI"
-TAB_VENTAS         = "ventas_raw"
-TAB_STOCK          = "stock_snapshot"
-TAB_STOCK_TRANS    = "stock_transición"   # la seguimos leyendo, pero NO se suma
-TAB_CONFIG         = "config"
-TAB_INBOUND        = "inbound_po"
-TAB_CLIENTES_CONF  = "clientes_config"
-
-# Webhooks Make por defecto (3 escenarios)
-DEFAULT_MAKE_WEBHOOK_S1_URL = "https://hook.us1.make.com/1pdchxe8cl7qg2oo7byqi4u5x4p9cc4n"
-DEFAULT_MAKE_WEBHOOK_S2_URL = "https://hook.us1.make.com/vdj87rfcjpmeuccds9vieu45410tnsug"
-DEFAULT_MAKE_WEBHOOK_S3_URL = "https://hook.us1.make.com/k50t6u1rtrswqd6vl4s8mqf2ndu6noa3"
+OFFLINE = False               # True: todos los tenants leen solo la copia local (o CSV de plantillas)
 
 # URL de reportería (solo respaldo, la real se lee del sheet del tenant)
 REPORT_APP_URL = "http://localhost:8504"
@@ -36,6 +41,7 @@ REPORT_APP_URL = "http://localhost:8504"
 # STREAMLIT BASE
 # ======================================
 st.set_page_config(page_title="Predictor de Compras", layout="wide")
+corrida = iniciar_corrida("predictor")
 
 # CSS
 st.markdown(
@@ -77,27 +83,17 @@ st.markdown(
 # ======================================
 # HELPERS DE LECTURA
 # ======================================
+@medido("read_gsheets")
 def read_gsheets(sheet_id: str, tab: str) -> pd.DataFrame:
-    """Lee una pestaña de Google Sheets como CSV."""
-    if OFFLINE:
-        return pd.read_csv(os.path.join(BASE, f"{tab}.csv"))
-    sheet_param = quote(tab, safe="")
-    url = (
-        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?"
-        f"tqx=out:csv&sheet={sheet_param}"
-    )
-    return pd.read_csv(url)
+    """Copia local (refrescada en segundo plano) o, en modo OFFLINE, solo la copia."""
+    return leer_offline(sheet_id, tab) if OFFLINE else leer_online(sheet_id, tab)
 
 
 @st.cache_data
 def load_clientes_config() -> Optional[pd.DataFrame]:
     """Intenta leer la pestaña clientes_config del sheet por defecto."""
     try:
-        df = read_gsheets(DEFAULT_SHEET_ID, TAB_CLIENTES_CONF)
-        if "activo" in df.columns:
-            df = df[df["activo"].astype(str).str.upper().isin(["TRUE", "1", "SI"])]
-        df.columns = [c.strip() for c in df.columns]
-        return df
+        return leer_clientes_config(read_gsheets)
     except Exception:
         return None
 
@@ -106,275 +102,60 @@ def load_clientes_config() -> Optional[pd.DataFrame]:
 def load_global_urls(sheet_id: str) -> dict:
     """Lee la hoja config y devuelve predictor_url y reporteria_url (fila 1)."""
     try:
-        df = read_gsheets(sheet_id, TAB_CONFIG)
-        if df.empty:
-            return {}
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        row = df.iloc[0]
-        return {
-            "predictor_url": str(row.get("predictor_url", "")).strip(),
-            "reporteria_url": str(row.get("reporteria_url", "")).strip(),
-        }
+        return urls_globales(read_gsheets(sheet_id, TAB_CONFIG))
     except Exception:
         return {}
 
-# ======================================
-# NORMALIZADORES
-# ======================================
-def _is_numeric_col(s: pd.Series) -> bool:
-    return pd.to_numeric(s, errors="coerce").notna().sum() > 0
-
-
-def normalize_ventas_sheet(df: pd.DataFrame) -> pd.DataFrame:
-    cols_lc = {c.lower(): c for c in df.columns}
-    fecha_col = cols_lc.get("fecha")
-    sku_col   = cols_lc.get("sku")
-    qty_col   = cols_lc.get("cantidad") or cols_lc.get("qty")
-    if not fecha_col or not sku_col or not qty_col:
-        raise ValueError("ventas_raw debe tener columnas 'fecha', 'sku' y 'cantidad'.")
-    out = pd.DataFrame()
-    out["fecha"] = pd.to_datetime(df[fecha_col], errors="coerce")
-    out["sku"]   = df[sku_col].astype(str).str.strip().str.upper()
-    out["qty"]   = pd.to_numeric(df[qty_col], errors="coerce").fillna(0)
-    out = out.dropna(subset=["fecha", "sku"])
-    return out
-
-
-def _guess_sku_col(df: pd.DataFrame) -> str:
-    prefer = ["sku", "SKU", "codigo", "producto", "Producto"]
-    for c in prefer:
-        if c in df.columns and not _is_numeric_col(df[c]):
-            return c
-    for c in df.columns:
-        if not _is_numeric_col(df[c]):
-            return c
-    return df.columns[0]
-
-
-def _guess_stock_col(df: pd.DataFrame) -> str:
-    prefer = ["stock", "cantidad", "qty", "disponible", "on_hand"]
-    for c in prefer:
-        if c in df.columns and _is_numeric_col(df[c]):
-            return c
-    for c in df.columns:
-        if _is_numeric_col(df[c]):
-            return c
-    raise ValueError("No encontré columna numérica de stock.")
-
-
-def normalize_stock_sheet(df: pd.DataFrame) -> pd.DataFrame:
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["sku", "stock"])
-    sku_col = _guess_sku_col(df)
-    qty_col = _guess_stock_col(df)
-    out = pd.DataFrame()
-    out["sku"]   = df[sku_col].astype(str).str.strip().str.upper()
-    out["stock"] = pd.to_numeric(df[qty_col], errors="coerce").fillna(0)
-    return out
-
-
-def normalize_config_sheet(df: pd.DataFrame,
-                           ventas_n: pd.DataFrame,
-                           stock_n: pd.DataFrame) -> pd.DataFrame:
-    """
-    Devuelve SIEMPRE un dataframe por SKU.
-    Si la hoja viene en modo global (1 fila) replica los valores a todos los SKU
-    y también trae predictor_url / reporteria_url.
-    """
-    if df.empty:
-        skus = sorted(set(ventas_n["sku"]).union(set(stock_n["sku"])))
-        return pd.DataFrame(
-            {
-                "sku": skus,
-                "proveedor": "",
-                "lead_time_dias": 0,
-                "minimo_compra": 1,
-                "multiplo": 1,
-                "alias": None,
-                "activo": True,
-                "seguridad_dias": 0,
-                "predictor_url": None,
-                "reporteria_url": None,
-            }
-        )
-
-    df2 = df.copy()
-    df2.columns = [str(c).strip().lower() for c in df2.columns]
-
-    # ----- caso 1: por SKU -----
-    if "sku" in df2.columns:
-        rename_map = {
-            "min_lote": "minimo_compra",
-            "minimo_lote": "minimo_compra",
-            "multiplo_lote": "multiplo",
-        }
-        df2 = df2.rename(columns={k: v for k, v in rename_map.items() if k in df2.columns})
-
-        for c in ["lead_time_dias", "minimo_compra", "multiplo", "seguridad_dias"]:
-            if c in df2.columns:
-                df2[c] = pd.to_numeric(df2[c], errors="coerce").fillna(0)
-
-        df2["sku"] = df2["sku"].astype(str).str.strip().str.upper()
-
-        for c, default in [
-            ("proveedor", ""),
-            ("minimo_compra", 1),
-            ("multiplo", 1),
-            ("alias", None),
-            ("activo", True),
-            ("seguridad_dias", 0),
-            ("predictor_url", None),
-            ("reporteria_url", None),
-        ]:
-            if c not in df2.columns:
-                df2[c] = default
-
-        return df2
-
-    # ----- caso 2: global -----
-    lead_time = int(pd.to_numeric(df2.get("lead_time_dias", pd.Series([0])).iloc[0], errors="coerce") or 0)
-    seg_dias  = int(pd.to_numeric(df2.get("seguridad_dias", pd.Series([0])).iloc[0], errors="coerce") or 0)
-    min_lote  = int(pd.to_numeric(df2.get("min_lote", pd.Series([1])).iloc[0], errors="coerce") or 1)
-
-    predictor_url  = df2.get("predictor_url",  pd.Series([None])).iloc[0]
-    reporteria_url = df2.get("reporteria_url", pd.Series([None])).iloc[0]
-
-    skus = sorted(set(ventas_n["sku"]).union(set(stock_n["sku"])))
-    cfg = pd.DataFrame(
-        {
-            "sku": skus,
-            "proveedor": "",
-            "lead_time_dias": lead_time,
-            "minimo_compra": min_lote,
-            "multiplo": 1,
-            "alias": None,
-            "activo": True,
-            "seguridad_dias": seg_dias,
-            "predictor_url": predictor_url,
-            "reporteria_url": reporteria_url,
-        }
-    )
-    return cfg
-
-
-def normalize_inbound_sheet(df: pd.DataFrame) -> pd.DataFrame:
-    """Versión robusta: si hay filas sin estado, no rompe."""
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["sku", "qty", "eta", "estado"])
-    cols = {c.lower(): c for c in df.columns}
-    sku_c = cols.get("sku")
-    qty_c = cols.get("qty") or cols.get("cantidad")
-    eta_c = cols.get("eta") or cols.get("fecha")
-    est_c = cols.get("estado") or cols.get("status")
-    if not sku_c or not qty_c:
-        return pd.DataFrame(columns=["sku", "qty", "eta", "estado"])
-    out = pd.DataFrame()
-    out["sku"] = df[sku_c].astype(str).str.strip().str.upper()
-    out["qty"] = pd.to_numeric(df[qty_c], errors="coerce").fillna(0)
-    out["eta"] = pd.to_datetime(df[eta_c], errors="coerce") if eta_c else pd.NaT
-    if est_c:
-        out["estado"] = df[est_c].astype(str).str.upper().str.strip()
-    else:
-        out["estado"] = "ABIERTA"
-    out = out[out["qty"] > 0]
-    return out
-
-
-def prepare_inbound_for_core(inbound: pd.DataFrame) -> pd.DataFrame:
-    if inbound is None or inbound.empty:
-        return pd.DataFrame(columns=["sku", "qty", "eta", "estado"])
-    df = inbound.copy()
-    df = df[pd.to_numeric(df["qty"], errors="coerce").fillna(0) > 0]
-    today = pd.Timestamp.today().normalize()
-    df["eta"] = pd.to_datetime(df["eta"], errors="coerce")
-    df.loc[df["eta"].isna(), "eta"] = today
-    df.loc[df["eta"] < today, "eta"] = today
-    df_grp = df.groupby("sku", as_index=False)["qty"].sum()
-    df_grp["eta"] = today
-    df_grp["estado"] = "PENDIENTE"
-    return df_grp
-
-# ======================================
-# UTIL WEBHOOK
-# ======================================
-def trigger_make(url: str, payload: dict) -> dict:
-    if not url:
-        return {"ok": False, "error": "webhook no configurado"}
-    try:
-        r = requests.post(url, json=payload, timeout=10)
-        return {"ok": r.ok, "status": r.status_code, "text": r.text[:500]}
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
-
 # ======================================
 # UI / MULTITENANT con sesión
 # ======================================
 
 clientes_df = load_clientes_config()
-
-CURRENT_SHEET_ID = DEFAULT_SHEET_ID
-MAKE_WEBHOOK_S1_URL = DEFAULT_MAKE_WEBHOOK_S1_URL
-MAKE_WEBHOOK_S2_URL = DEFAULT_MAKE_WEBHOOK_S2_URL
-MAKE_WEBHOOK_S3_URL = DEFAULT_MAKE_WEBHOOK_S3_URL
-CURRENT_TENANT_ID   = "default"
-KAME_CLIENT_ID      = ""
-KAME_CLIENT_SECRET  = ""
-USE_STOCK_TOTAL     = False
+tenant = tenant_desde_fila({"tenant_id": "default", "sheet_id": DEFAULT_SHEET_ID})
 
 # leemos tenant de la URL si viene
 params = st.query_params
 tenant_from_url = params.get("tenant", None)
 
 if clientes_df is not None and len(clientes_df):
-    tenant_ids = clientes_df["tenant_id"].tolist()
+    por_id = tenants(clientes_df)
+    tenant_ids = list(por_id)
 
-    # decidir tenant
+    # decidir tenant: URL, luego sesión, luego el primero
     if tenant_from_url and tenant_from_url in tenant_ids:
-        CURRENT_TENANT_ID = tenant_from_url
         st.session_state["tenant_id"] = tenant_from_url
-    else:
-        # mirar sesión
-        if "tenant_id" in st.session_state and st.session_state["tenant_id"] in tenant_ids:
-            CURRENT_TENANT_ID = st.session_state["tenant_id"]
-        else:
-            # default al primero
-            CURRENT_TENANT_ID = tenant_ids[0]
-            st.session_state["tenant_id"] = CURRENT_TENANT_ID
+    elif st.session_state.get("tenant_id") not in tenant_ids:
+        st.session_state["tenant_id"] = tenant_ids[0]
 
     # select visible
-    sel = st.sidebar.selectbox("Cliente", tenant_ids, index=tenant_ids.index(CURRENT_TENANT_ID))
-    if sel != CURRENT_TENANT_ID:
-        CURRENT_TENANT_ID = sel
-        st.session_state["tenant_id"] = sel
-
-    # cargar datos del tenant
-    row = clientes_df[clientes_df["tenant_id"] == CURRENT_TENANT_ID].iloc[0]
-    CURRENT_SHEET_ID   = row.get("sheet_id", DEFAULT_SHEET_ID)
-    KAME_CLIENT_ID     = row.get("kame_client_id", "")
-    KAME_CLIENT_SECRET = row.get("kame_client_secret", "")
-    USE_STOCK_TOTAL    = str(row.get("use_stock_total", "FALSE")).upper() in ["TRUE", "1", "SI"]
-
-    MAKE_WEBHOOK_S1_URL = row.get("webhook_s1", DEFAULT_MAKE_WEBHOOK_S1_URL)
-    MAKE_WEBHOOK_S2_URL = row.get("webhook_s2", DEFAULT_MAKE_WEBHOOK_S2_URL)
-    MAKE_WEBHOOK_S3_URL = row.get("webhook_s3", DEFAULT_MAKE_WEBHOOK_S3_URL)
+    sel = st.sidebar.selectbox("Cliente", tenant_ids, index=tenant_ids.index(st.session_state["tenant_id"]))
+    st.session_state["tenant_id"] = sel
+    tenant = por_id[sel]
 else:
     st.sidebar.selectbox("Cliente", ["(sin clientes_config)"])
 
+tenant["offline"] = OFFLINE or tenant["offline"]
+CURRENT_TENANT_ID = tenant["tenant_id"]
+corrida.contexto["tenant"] = CURRENT_TENANT_ID
+CURRENT_SHEET_ID  = tenant["sheet_id"]
+OFFLINE_TENANT    = tenant["offline"]
+
 # ahora sí: leemos URLs de ese sheet
 urls_cfg = load_global_urls(CURRENT_SHEET_ID)
-report_url_from_sheet = urls_cfg.get("reporteria_url", "").strip()
-
-target_report_url = report_url_from_sheet or REPORT_APP_URL
-if CURRENT_TENANT_ID:
-    sep = "&" if "?" in target_report_url else "?"
-    target_report_url = f"{target_report_url}{sep}tenant={CURRENT_TENANT_ID}"
+target_report_url = url_con_tenant(urls_cfg.get("reporteria_url", "").strip() or REPORT_APP_URL, CURRENT_TENANT_ID)
 
 # --- navegación lateral ---
 st.sidebar.markdown("### Navegación")
 st.sidebar.markdown(f"[📊 Reportería de ventas]({target_report_url})")
 st.sidebar.markdown("---")
 
-modo_datos = "ONLINE (KAME ERP)" if not OFFLINE else "OFFLINE (CSV)"
+# precalentado de fondo de los tenants activos (uno por proceso)
+precalentador = iniciar_precalentado("predictor", offline=OFFLINE)
+
+# tenant OFFLINE: solo copia local, nunca Sheets
+lector_tenant_actual = lector_tenant(OFFLINE_TENANT)
+
+modo_datos = "ONLINE (KAME ERP)" if not OFFLINE_TENANT else "OFFLINE (copia local)"
 st.title("🧠 Predictor de Compras ↪")
 st.caption(f"Fuente de datos: **{modo_datos}** — Tenant: **{CURRENT_TENANT_ID}**")
 
@@ -384,22 +165,13 @@ st.caption(f"Fuente de datos: **{modo_datos}** — Tenant: **{CURRENT_TENANT_ID}
 bt1, bt2, bt3 = st.columns(3)
 with bt1:
     if st.button("📘 Actualizar ventas (S1)", use_container_width=True):
-        st.json(trigger_make(MAKE_WEBHOOK_S1_URL, {"reason": "ui_run", "tenant_id": CURRENT_TENANT_ID}))
+        st.json(disparar_escenario("S1", tenant))
 with bt2:
     if st.button("📦 Actualizar stock total (S2)", use_container_width=True):
-        st.json(
-            trigger_make(
-                MAKE_WEBHOOK_S2_URL,
-                {
-                    "reason": "ui_run",
-                    "tenant_id": CURRENT_TENANT_ID,
-                    "use_stock_total": True,
-                },
-            )
-        )
+        st.json(disparar_escenario("S2", tenant))
 with bt3:
     if st.button("🧾 Actualizar inbound (S3)", use_container_width=True):
-        st.json(trigger_make(MAKE_WEBHOOK_S3_URL, {"reason": "ui_run", "tenant_id": CURRENT_TENANT_ID}))
+        st.json(disparar_escenario("S3", tenant))
 
 st.markdown("")
 
@@ -416,45 +188,35 @@ with st.expander("Opciones avanzadas (Make / Debug)"):
     mostrar_debug   = st.checkbox("Mostrar debug de columnas/valores config", value=False)
     mostrar_inbound = st.checkbox("Mostrar inbound agrupado", value=True)
     mostrar_stocks  = st.checkbox("Mostrar stocks (informativos)", value=True)
+    usar_cache      = st.checkbox("Reutilizar resultados en caché (mismas entradas)", value=True)
+    paralelo        = st.checkbox("Pronóstico en paralelo por SKU (muchos SKU)", value=False)
+    if paralelo:
+        colP1, colP2 = st.columns(2)
+        tam_shard = colP1.number_input("SKU por shard", min_value=10, value=TAM_SHARD, step=50)
+        workers   = colP2.number_input("Procesos", min_value=1, value=os.cpu_count() or 1, step=1)
 
 # botón principal
 if st.button("Ejecutar predicción", type="primary", use_container_width=True):
     if disparar:
-        st.info("Disparando S1/S2/S3…")
-        st.write("S1:", trigger_make(MAKE_WEBHOOK_S1_URL, {"reason": "ui_run", "tenant_id": CURRENT_TENANT_ID}))
-        st.write("S2:", trigger_make(MAKE_WEBHOOK_S2_URL, {"reason": "ui_run", "tenant_id": CURRENT_TENANT_ID, "use_stock_total": True}))
-        st.write("S3:", trigger_make(MAKE_WEBHOOK_S3_URL, {"reason": "ui_run", "tenant_id": CURRENT_TENANT_ID}))
-        st.write("Esperando 5s para que Make actualice las hojas…")
-        time.sleep(5)
+        with st.spinner("Disparando S1/S2/S3 y esperando que Make actualice las hojas…"):
+            respuestas, cambios = actualizar_y_esperar(tenant, descargar_tab)
+        for nombre, resp in respuestas.items():
+            st.write(f"{nombre}:", resp)
+        sin_cambio = [tab for tab, ok in cambios.items() if not ok]
+        if sin_cambio:
+            st.warning(f"Sin cambios tras el plazo en: {', '.join(sin_cambio)} (se usan los datos actuales).")
 
     # leer datos
     with st.spinner("Leyendo datos de Sheets…"):
-        ventas_raw   = read_gsheets(CURRENT_SHEET_ID, TAB_VENTAS)
-        stock_raw    = read_gsheets(CURRENT_SHEET_ID, TAB_STOCK)
-        stock_tr_raw = read_gsheets(CURRENT_SHEET_ID, TAB_STOCK_TRANS)
-        config_raw   = read_gsheets(CURRENT_SHEET_ID, TAB_CONFIG)
-        inbound_raw  = read_gsheets(CURRENT_SHEET_ID, TAB_INBOUND)
-
-        ventas  = normalize_ventas_sheet(ventas_raw)
-        stock_p = normalize_stock_sheet(stock_raw)
-        stock_t = normalize_stock_sheet(stock_tr_raw)
-        config  = normalize_config_sheet(config_raw, ventas, stock_p)
-        inbound = normalize_inbound_sheet(inbound_raw)
-
-        # stock al core = solo stock_snapshot
-        stock_total = stock_p.copy()
-
-    # filtrar por SKU
-    if modo == "Por SKU" and sku_q:
-        f = str(sku_q).strip().lower()
-        ventas      = ventas[ventas["sku"].str.lower() == f]
-        stock_p     = stock_p[stock_p["sku"].str.lower() == f]
-        stock_t     = stock_t[stock_t["sku"].str.lower() == f]
-        stock_total = stock_total[stock_total["sku"].str.lower() == f]
-        config      = config[config["sku"].str.lower() == f]
-        inbound     = inbound[inbound["sku"].str.lower() == f]
-
-    inbound_core = prepare_inbound_for_core(inbound)
+        tabs, tiempos_tabs = leer_tabs(CURRENT_SHEET_ID, TABS_LECTURA, lector=lector_tenant_actual)
+
+        # "Por SKU": solo se materializan las filas de ese SKU;
+        # lo normalizado se comparte con las otras sesiones del tenant
+        sku_sel = str(sku_q).strip().upper() if modo == "Por SKU" and sku_q else None
+        normalizadas = normalizadas_compartidas(tabs, CURRENT_SHEET_ID, sku=sku_sel)
+
+    entradas = entradas_core(normalizadas)
+    ventas, stock_total, config, inbound_core = (entradas[k] for k in ["ventas", "stock", "config", "inbound"])
 
     # panel resumen
     sku_mostrar = sku_q.upper() if sku_q else "(varios)"
@@ -469,18 +231,19 @@ if st.button("Ejecutar predicción", type="primary", use_container_width=True):
 
     # secciones técnicas
     with st.expander("Estado de los Servicios 📄", expanded=False):
-        st.write(f"Ventas: {'✅ OK' if not ventas_raw.empty else '⚠️ Vacío'}")
-        st.write(f"Stock (stock_snapshot): {'✅ OK' if not stock_raw.empty else '⚠️ Vacío'}")
-        st.write(f"Stock transición (solo informativo): {'✅ OK' if not stock_tr_raw.empty else '⚠️ Vacío'}")
-        st.write(f"Inbound: {'✅ OK' if not inbound_raw.empty else '⚠️ Vacío'}")
+        for nombre, tab in [("Ventas", TAB_VENTAS), ("Stock (stock_snapshot)", TAB_STOCK),
+                            ("Stock transición (solo informativo)", TAB_STOCK_TRANS), ("Inbound", TAB_INBOUND)]:
+            st.write(f"{nombre}: {'✅ OK' if not tabs[tab].empty else '⚠️ Vacío'}")
+        st.caption("Tiempos de lectura por pestaña (cache = servida sin descargar)")
+        st.dataframe(tiempos_tabs, use_container_width=True, hide_index=True)
 
     if mostrar_stocks:
         with st.expander("Stocks leídos", expanded=False):
             st.subheader("Stock (stock_snapshot)")
-            st.dataframe(stock_p, use_container_width=True, hide_index=True)
+            st.dataframe(normalizadas["stock"], use_container_width=True, hide_index=True)
 
             st.subheader("Stock transición (informativo, NO se usa en el cálculo)")
-            st.dataframe(stock_t, use_container_width=True, hide_index=True)
+            st.dataframe(normalizadas["stock_trans"], use_container_width=True, hide_index=True)
 
             st.subheader("Stock TOTAL enviado al core")
             st.dataframe(stock_total, use_container_width=True, hide_index=True)
@@ -488,7 +251,7 @@ if st.button("Ejecutar predicción", type="primary", use_container_width=True):
     if mostrar_inbound:
         with st.expander("Inbound (crudo de Sheets) / agrupado", expanded=False):
             st.subheader("Inbound (crudo de Sheets)")
-            st.dataframe(inbound, use_container_width=True)
+            st.dataframe(normalizadas["inbound"], use_container_width=True)
             st.subheader("Inbound agrupado que se envía al core")
             st.dataframe(inbound_core, use_container_width=True)
 
@@ -503,15 +266,13 @@ if st.button("Ejecutar predicción", type="primary", use_container_width=True):
     else:
         with st.spinner("Calculando pronóstico…"):
             freq_code = "M" if freq.startswith("Mensual") else "W"
-            det, res, prop = forecast_all(
-                ventas=ventas,
-                stock=stock_total,
-                config=config,
-                inbound=inbound_core,
-                freq=freq_code,
-                horizon_override=horizon,
+            (det, res, prop), estado_cache = predecir(
+                entradas, freq_code, horizon, CURRENT_TENANT_ID, usar_cache=usar_cache, paralelo=paralelo,
+                tam_shard=int(tam_shard) if paralelo else TAM_SHARD, workers=int(workers) if paralelo else None,
             )
 
+        st.caption(f"Caché de resultados: {estado_cache}")
+
         st.success("Listo ✅")
 
         if not prop.empty:
@@ -547,26 +308,13 @@ if st.button("Ejecutar predicción", type="primary", use_container_width=True):
             "text/csv",
         )
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+# ======================================
+# DEBUG: TRAMOS DE LA CORRIDA (?debug=1)
+# ======================================
+if st.query_params.get("debug") == "1":
+    with st.expander("⏱️ Tramos de la corrida", expanded=False):
+        st.caption(f"Corrida {corrida.id}: {corrida.segundos():.2f}s en total; lo que no cubren los tramos es render.")
+        st.dataframe(corrida.tabla(), use_container_width=True, hide_index=True)
+        st.caption(f"Caché compartida — tenants: {TENANTS.estado()} · pestañas: {estado_cache_tabs()}")
+        st.caption("Último precalentado de fondo")
+        st.dataframe(pd.DataFrame(precalentador.ultimo), use_container_width=True, hide_index=True)
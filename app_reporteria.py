@@ -4,22 +4,36 @@
 import pandas as pd
 import streamlit as st
 import altair as alt
-from urllib.parse import quote
-from datetime import timedelta
 from typing import Optional
+from cache_compartida import TENANTS, invalidar_tenant
+from instrumentacion import iniciar_corrida, medido
+from precalentado import iniciar as iniciar_precalentado
+from sheets import descargar_tab, estado_cache_tabs
+from snapshots import leer_snapshot, leer_snapshot_por_partes, lector_con_snapshot, partes_con_snapshot, refrescar
+from cobertura import ESTADO_BAJO, ESTADO_SOBRE
+from reporteria import (
+    DIAS_COBERTURA,
+    TABS_REPORTERIA,
+    alza_baja,
+    tenant_compartido,
+    cobertura_stock,
+    evolucion_mensual,
+    ventas_ventana,
+)
+from tenants import DEFAULT_SHEET_ID, leer_clientes_config, tenants
 
 # ============================
 # CONFIG BÁSICA
 # ============================
-DEFAULT_SHEET_ID   = "1Pbjxy_V-NuTbfnN_SLpexkYx_w62Umsg7eBr2qrQJrI"
-TAB_VENTAS         = "ventas_raw"
-TAB_STOCK          = "stock_snapshot"
-TAB_CLIENTES_CONF  = "clientes_config"
+
+# tiempo que los datos normalizados quedan en memoria entre interacciones
+CACHE_TTL_SEG = 600
 
 # URL de la otra app (predictor) para navegar
 PREDICTOR_APP_URL = "http://localhost:8503"
 
 st.set_page_config(page_title="Reportería de Ventas", layout="wide")
+corrida = iniciar_corrida("reporteria")
 
 # ============================
 # COSMÉTICA (igual que predictor)
@@ -76,74 +90,72 @@ st.markdown(
 # ============================
 # HELPERS
 # ============================
+_read_con_snapshot = lector_con_snapshot(descargar_tab)
+_partes_con_snapshot = partes_con_snapshot(descargar_tab)
+
+
+@medido("read_gsheets")
 def read_gsheets(sheet_id: str, tab: str) -> pd.DataFrame:
-    sheet_param = quote(tab, safe="")
-    url = (
-        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?"
-        f"tqx=out:csv&sheet={sheet_param}"
-    )
-    return pd.read_csv(url)
+    """Copia local de la pestaña (snapshots/), refrescada en segundo plano desde Sheets."""
+    return _read_con_snapshot(sheet_id, tab)
+
+
+def read_offline(sheet_id: str, tab: str) -> pd.DataFrame:
+    """Tenant OFFLINE: solo la copia local."""
+    df = leer_snapshot(sheet_id, tab)
+    if df is None:
+        st.error(f"No hay copia local de '{tab}' para este cliente (modo OFFLINE).")
+        st.stop()
+    return df
 
 
 @st.cache_data
 def load_clientes_config() -> Optional[pd.DataFrame]:
     try:
-        df = read_gsheets(DEFAULT_SHEET_ID, TAB_CLIENTES_CONF)
-        if "activo" in df.columns:
-            df = df[df["activo"].astype(str).str.upper().isin(["TRUE", "1", "SI"])]
-        df.columns = [c.strip() for c in df.columns]
-        return df
+        return leer_clientes_config(read_gsheets)
     except Exception:
         return None
 
 
-def normalize_ventas(df: pd.DataFrame) -> pd.DataFrame:
-    cols = {c.lower(): c for c in df.columns}
-    out = pd.DataFrame()
-    out["fecha"] = pd.to_datetime(df[cols.get("fecha")], errors="coerce")
-    out["sku"]   = df[cols.get("sku")].astype(str).str.strip().str.upper()
-    qty_col = cols.get("cantidad") or cols.get("qty")
-    out["qty"]   = pd.to_numeric(df[qty_col], errors="coerce").fillna(0)
-    out = out.dropna(subset=["fecha", "sku"])
-    return out
-
-
-def normalize_stock(df: pd.DataFrame) -> pd.DataFrame:
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["sku", "stock"])
-    cols = {c.lower(): c for c in df.columns}
-    sku_c = cols.get("sku") or cols.get("codigo") or list(df.columns)[0]
-    stock_c = None
-    for c in df.columns:
-        if pd.to_numeric(df[c], errors="coerce").notna().sum() > 0:
-            stock_c = c
-            break
-    out = pd.DataFrame()
-    out["sku"]   = df[sku_c].astype(str).str.strip().str.upper()
-    out["stock"] = pd.to_numeric(df[stock_c], errors="coerce").fillna(0)
-    return out
+def cargar_datos(sheet_id: str, offline: bool):
+    """Rollup diario de ventas, stock y umbrales de cobertura del tenant.
+
+    Van en la caché compartida del proceso (no en st.cache_data): todas las
+    sesiones del tenant usan los mismos objetos, sin copiarlos ni deserializarlos.
+    """
+    if offline:
+        return tenant_compartido(sheet_id, read_offline, leer_snapshot, modo="offline",
+                                 partes=leer_snapshot_por_partes, ttl=CACHE_TTL_SEG)
+    return tenant_compartido(sheet_id, read_gsheets, modo="online", partes=_partes_con_snapshot, ttl=CACHE_TTL_SEG)
 
 
 # ============================
 # MULTI-TENANT
 # ============================
+# precalentado de fondo de los tenants activos (uno por proceso)
+precalentador = iniciar_precalentado("reporteria")
+
 clientes_df = load_clientes_config()
 
 CURRENT_SHEET_ID = DEFAULT_SHEET_ID
 CURRENT_TENANT_ID = "default"
+OFFLINE_TENANT = False
 
 params = st.query_params
 tenant_from_url = params.get("tenant", None)
 
 if clientes_df is not None and len(clientes_df):
-    tenant_ids = clientes_df["tenant_id"].tolist()
+    por_id = tenants(clientes_df)
+    tenant_ids = list(por_id)
     if tenant_from_url and tenant_from_url in tenant_ids:
         tenant_sel = tenant_from_url
     else:
         tenant_sel = st.sidebar.selectbox("Cliente", tenant_ids, index=0)
-    row = clientes_df[clientes_df["tenant_id"] == tenant_sel].iloc[0]
-    CURRENT_TENANT_ID = row["tenant_id"]
-    CURRENT_SHEET_ID  = row.get("sheet_id", DEFAULT_SHEET_ID)
+    CURRENT_TENANT_ID = tenant_sel
+    CURRENT_SHEET_ID  = por_id[tenant_sel]["sheet_id"]
+    OFFLINE_TENANT    = por_id[tenant_sel]["offline"]
+
+corrida.contexto["tenant"] = CURRENT_TENANT_ID
 
 # --- navegación lateral ---
 st.sidebar.markdown("### Navegación")
@@ -151,6 +163,10 @@ st.sidebar.markdown(
     f"[🧠 Predictor de compras]({PREDICTOR_APP_URL}?tenant={CURRENT_TENANT_ID})"
 )
 st.sidebar.markdown("---")
+if st.sidebar.button("🔄 Actualizar datos"):
+    if not OFFLINE_TENANT:
+        refrescar(CURRENT_SHEET_ID, TABS_REPORTERIA)
+    invalidar_tenant(CURRENT_SHEET_ID)
 
 # ============================
 # UI PRINCIPAL
@@ -169,13 +185,10 @@ sku_filter = colf2.text_input("Filtrar por SKU (opcional)").strip().upper()
 # CARGA DE DATOS
 # ============================
 with st.spinner("Cargando datos desde Google Sheets…"):
-    ventas_raw = read_gsheets(CURRENT_SHEET_ID, TAB_VENTAS)
-    stock_raw  = read_gsheets(CURRENT_SHEET_ID, TAB_STOCK)
-
-ventas = normalize_ventas(ventas_raw)
-stock  = normalize_stock(stock_raw)
+    rollup, stock, umbrales, cargado_en = cargar_datos(CURRENT_SHEET_ID, OFFLINE_TENANT)
+st.sidebar.caption(f"Datos cargados: {cargado_en:%d-%m-%Y %H:%M}")
 
-if ventas.empty:
+if rollup.empty:
     st.warning("No hay ventas en la hoja.")
     st.stop()
 
@@ -183,15 +196,13 @@ if ventas.empty:
 # FECHA BASE = HOY REAL
 # ============================
 hoy = pd.Timestamp.today().normalize()
-desde = hoy - timedelta(days=dias)
 colf3.write(f"Hasta: **{hoy.date()}**")
 
-# filtrar ventas por fecha
-ventas_rango = ventas[(ventas["fecha"] >= desde) & (ventas["fecha"] <= hoy)]
+# ventas del rango (todas las ventanas salen del rollup diario)
+ventas_rango = ventas_ventana(rollup, hoy, dias, sku_filter)
 
 # aplicar filtro SKU global
 if sku_filter:
-    ventas_rango = ventas_rango[ventas_rango["sku"] == sku_filter]
     stock = stock[stock["sku"] == sku_filter]
 
 # ============================
@@ -199,12 +210,7 @@ if sku_filter:
 # ============================
 st.subheader(f"🏆 Top 10 más vendidos (últimos {dias} días)")
 
-top10 = (
-    ventas_rango.groupby("sku", as_index=False)["qty"]
-    .sum()
-    .sort_values("qty", ascending=False)
-    .head(10)
-)
+top10 = ventas_rango.sort_values("qty", ascending=False).head(10)
 st.dataframe(top10, use_container_width=True, hide_index=True)
 
 bar_top10 = (
@@ -224,14 +230,7 @@ st.altair_chart(bar_top10, use_container_width=True)
 # ============================
 st.subheader("📈 Evolución de ventas (mensual, últimos 12 meses)")
 
-ventas_12m = ventas[(ventas["fecha"] <= hoy) & (ventas["fecha"] >= hoy - timedelta(days=365))]
-ventas_12m["mes"] = ventas_12m["fecha"].dt.to_period("M").astype(str)
-if sku_filter:
-    ventas_12m = ventas_12m[ventas_12m["sku"] == sku_filter]
-
-ventas_mensual = (
-    ventas_12m.groupby("mes", as_index=False)["qty"].sum().sort_values("mes")
-)
+ventas_mensual = evolucion_mensual(rollup, hoy, sku_filter)
 
 if not ventas_mensual.empty:
     line_mes = (
@@ -253,23 +252,7 @@ else:
 # ============================
 st.subheader("📊 Productos en alza / en baja ↔")
 
-hoy = pd.Timestamp.today().normalize()
-ini_mes_actual = hoy.replace(day=1)
-ini_mes_m1 = ini_mes_actual - pd.offsets.MonthBegin(1)
-ini_mes_m2 = ini_mes_actual - pd.offsets.MonthBegin(2)
-
-ventas_m1 = ventas[(ventas["fecha"] >= ini_mes_m1) & (ventas["fecha"] < ini_mes_actual)]
-ventas_m2 = ventas[(ventas["fecha"] >= ini_mes_m2) & (ventas["fecha"] < ini_mes_m1)]
-
-if sku_filter:
-    ventas_m1 = ventas_m1[ventas_m1["sku"] == sku_filter]
-    ventas_m2 = ventas_m2[ventas_m2["sku"] == sku_filter]
-
-m1 = ventas_m1.groupby("sku")["qty"].sum().rename("qty_cur").reset_index()
-m2 = ventas_m2.groupby("sku")["qty"].sum().rename("qty_prev").reset_index()
-
-alzabaja = pd.merge(m1, m2, on="sku", how="outer").fillna(0)
-alzabaja["delta"] = alzabaja["qty_cur"] - alzabaja["qty_prev"]
+alzabaja = alza_baja(rollup, hoy, sku_filter)
 
 col_1, col_2 = st.columns(2)
 
@@ -302,51 +285,26 @@ with col_2:
 # ============================
 st.subheader("📦 Productos sobre-stockeados")
 
-ultimos_60 = hoy - timedelta(days=60)
-ventas_60 = ventas[(ventas["fecha"] >= ultimos_60) & (ventas["fecha"] <= hoy)]
-
-consumo_60 = (
-    ventas_60.groupby("sku")["qty"]
-    .sum()
-    .rename("consumo_60d")
-    .reset_index()
-)
-
-over = stock.merge(consumo_60, on="sku", how="left").fillna({"consumo_60d": 0})
+over = cobertura_stock(rollup, stock, umbrales, hoy, DIAS_COBERTURA)
+consumo_col = f"consumo_{DIAS_COBERTURA}d"
 
 if over.empty:
     st.info("No hay datos de stock para este cliente / filtro.")
 else:
-    over["consumo_dia"] = over["consumo_60d"] / 60.0
-    over["dias_cobertura"] = 0.0
-
-    mask_sin_consumo = (over["consumo_60d"] == 0) & (over["stock"] > 0)
-    if mask_sin_consumo.any():
-        over.loc[mask_sin_consumo, "dias_cobertura"] = 9999
-
-    mask_con_consumo = (over["consumo_60d"] > 0)
-    if mask_con_consumo.any():
-        over.loc[mask_con_consumo, "dias_cobertura"] = (
-            over.loc[mask_con_consumo, "stock"] / over.loc[mask_con_consumo, "consumo_dia"]
-        )
-
-    UMBRAL_SOBRE = 20
-    UMBRAL_BAJO  = 5
-
-    overstock = over[over["dias_cobertura"] >= UMBRAL_SOBRE].sort_values("dias_cobertura", ascending=False)
+    overstock = over[over["estado"] == ESTADO_SOBRE].sort_values("dias_cobertura", ascending=False)
 
     if overstock.empty:
         st.info("No se detectaron productos sobre-stockeados con los criterios actuales.")
         top_cobertura = over.sort_values("dias_cobertura", ascending=False).head(20)
         st.write("Top por cobertura (referencia):")
         st.dataframe(
-            top_cobertura[["sku", "stock", "consumo_60d", "dias_cobertura"]],
+            top_cobertura[["sku", "stock", consumo_col, "dias_cobertura"]],
             use_container_width=True,
             hide_index=True,
         )
     else:
         st.dataframe(
-            overstock[["sku", "stock", "consumo_60d", "dias_cobertura"]].head(50),
+            overstock[["sku", "stock", consumo_col, "dias_cobertura"]].head(50),
             use_container_width=True,
             hide_index=True,
         )
@@ -363,23 +321,27 @@ else:
         st.altair_chart(chart_over, use_container_width=True)
 
     # 5. BAJO STOCK
-    st.subheader("📦 Productos con bajo stock (cobertura ≤ 5 días)")
+    st.subheader("📦 Productos con bajo stock (cobertura ≤ lead time + seguridad, 5 días por defecto)")
 
-    bajo_stock = over[(over["dias_cobertura"] > 0) & (over["dias_cobertura"] <= UMBRAL_BAJO)]
+    bajo_stock = over[over["estado"] == ESTADO_BAJO]
     bajo_stock = bajo_stock.sort_values("dias_cobertura", ascending=True)
 
     if bajo_stock.empty:
         st.info("No se detectaron productos con bajo stock.")
     else:
         st.dataframe(
-            bajo_stock[["sku", "stock", "consumo_60d", "dias_cobertura"]],
+            bajo_stock[["sku", "stock", consumo_col, "dias_cobertura", "umbral_bajo"]],
             use_container_width=True,
             hide_index=True,
         )
 
-
-
-
-
-
-
+# ============================
+# DEBUG: TRAMOS DE LA CORRIDA (?debug=1)
+# ============================
+if st.query_params.get("debug") == "1":
+    with st.expander("⏱️ Tramos de la corrida", expanded=False):
+        st.caption(f"Corrida {corrida.id}: {corrida.segundos():.2f}s en total; lo que no cubren los tramos es render.")
+        st.dataframe(corrida.tabla(), use_container_width=True, hide_index=True)
+        st.caption(f"Caché compartida — tenants: {TENANTS.estado()} · pestañas: {estado_cache_tabs()}")
+        st.caption("Último precalentado de fondo")
+        st.dataframe(pd.DataFrame(precalentador.ultimo), use_container_width=True, hide_index=True)
@@ -0,0 +1,403 @@
+# benchmark.py — Benchmarks sin Streamlit con datos sintéticos
+#
+# Genera cartolas con la forma de cartola_junio_2025.xlsx (Fecha, Descripción,
+# Canal o Sucursal, Cargos / Abonos / Saldo (CLP)) y pestañas ventas_raw,
+# stock_snapshot, config e inbound_po de N filas, y mide por etapa el tiempo de
+# pared y el pico de memoria (tracemalloc) de lo que hacen los dashboards:
+#   cartola     carga del xlsx (hasta XLSX_MAX_FILAS), carga desde la caché
+#               Feather, normalización, clasificación con la cascada de
+#               flujo_caja_app y la del comparativo, cubo + cruce con la
+#               proyección + totales mensuales
+#   ventas      lectura del CSV (como descargar_tab), en bloques al modelo
+#               compacto, y desde la copia local (snapshot)
+#   reporteria  rollup diario, ventanas por SKU / mensual, cobertura
+#   predictor   normalize_* y prepare_inbound_for_core
+# Cada tamaño corre dos veces, cada vez en un proceso nuevo (cachés frías) y en
+# un directorio temporal, con los mismos datos: una para el tiempo y otra, con
+# tracemalloc activo, para la memoria (tracemalloc multiplica los tiempos).
+# Los tiempos solo son comparables con una baseline de la misma máquina, y la
+# memoria de Arrow (lecturas Feather memory-mapped) no pasa por tracemalloc.
+#
+#   python benchmark.py [--filas 10000 100000 1000000] [--baseline benchmark_baseline.json]
+#                       [--guardar-baseline] [--tolerancia 0.25] [--salida resultados.json]
+# Con baseline, termina con código 1 si alguna etapa pasa la tolerancia en
+# tiempo o memoria.
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+FILAS = [10_000, 100_000, 1_000_000]
+XLSX_MAX_FILAS = 10_000      # escribir y leer xlsx más grandes con openpyxl toma minutos
+BASELINE_PATH = "benchmark_baseline.json"
+TOLERANCIA = 0.25
+MIN_SEG = 0.05               # diferencias menores son ruido
+MIN_MB = 1.0
+SEMILLA = 7
+FECHA_FIN = pd.Timestamp("2025-06-30")
+SHEET_ID = "benchmark"
+
+# ======================================
+# GENERADORES
+# ======================================
+_NOMBRES = ["Constructora", "Sociedad Comercial", "Inversiones", "Transportes", "Servicios",
+            "Distribuidora", "Ferreteria", "Asesorias", "Comercial", "Inmobiliaria"]
+_APELLIDOS = ["Sepco", "Del Austro", "Ducci Y Swett", "Rojas Vega", "Los Andes", "Pacifico",
+              "Santa Elena", "Del Sur", "Norte Grande", "San Ramon", "Las Condes", "Mapocho"]
+_SOCIEDADES = ["Spa", "Ltda", "S.a", "Limitada", "E.i.r.l"]
+EMPRESAS = [f"{n} {a} {s}" for n in _NOMBRES for a in _APELLIDOS for s in _SOCIEDADES]
+
+# (plantilla, es_abono, peso); la distribución imita la cartola real
+PLANTILLAS = [
+    ("Traspaso De: {empresa}", True, 0.46),
+    ("App-traspaso De: {empresa}", True, 0.02),
+    ("Transferencia Desde Linea De Credito", True, 0.03),
+    ("Dep.cheq.otros Bancos", True, 0.02),
+    ("Deposito En Efectivo", True, 0.01),
+    ("Traspaso De: Reciclajes Ecologicos De Chile Limitada", True, 0.01),
+    ("Traspaso A: {empresa}", False, 0.08),
+    ("Pago: Proveedores {doc}", False, 0.17),
+    ("Provision: Proveedores {doc}", False, 0.04),
+    ("Amortizacion A Linea De Credito", False, 0.04),
+    ("Comision Servicio De Pagos", False, 0.015),
+    ("Pago En Servipag.com*", False, 0.01),
+    ("Pago En Sii.cl*", False, 0.01),
+    ("Pago Instituciones Previsionales", False, 0.01),
+    ("Pago Automatico Tarjeta De Credito", False, 0.01),
+    ("Intereses Linea De Credito", False, 0.01),
+    ("Prima Seguro Desgravamen  *", False, 0.01),
+    ("Cargo Mantencion Cuenta {doc}", False, 0.035),
+]
+CANALES = ["Internet", "Oficina Central", "Torre Las Condes", "Providencia"]
+
+
+def cartola_sintetica(filas: int, semilla: int = SEMILLA) -> pd.DataFrame:
+    """Cartola de un año con columnas y textos como los de cartola_junio_2025.xlsx."""
+    rng = np.random.default_rng(semilla)
+    pesos = np.array([p for _, _, p in PLANTILLAS])
+    tipo = rng.choice(len(PLANTILLAS), size=filas, p=pesos / pesos.sum())
+    empresa = rng.integers(0, len(EMPRESAS), size=filas)
+    doc = rng.integers(0, max(filas // 10, 1), size=filas)
+    descripciones = [
+        PLANTILLAS[t][0].format(empresa=EMPRESAS[e], doc=f"{d:010d}")
+        for t, e, d in zip(tipo, empresa, doc)
+    ]
+    es_abono = np.array([a for _, a, _ in PLANTILLAS])[tipo]
+    monto = rng.integers(10_000, 5_000_000, size=filas).astype(float)
+    # la cartola viene de la fecha más reciente a la más antigua
+    dias = np.sort(rng.integers(0, 365, size=filas))
+    fechas = (FECHA_FIN - pd.to_timedelta(dias, unit="D")).strftime("%d/%m/%Y")
+    saldo = np.cumsum(np.where(es_abono, monto, -monto)[::-1])[::-1].astype(np.int64)
+    return pd.DataFrame({
+        "Fecha": fechas,
+        "Descripción": descripciones,
+        "Canal o Sucursal": rng.choice(CANALES, size=filas),
+        "Nro. Docto.": np.nan,
+        "Cargos (CLP)": np.where(es_abono, np.nan, monto),
+        "Abonos (CLP)": np.where(es_abono, monto, np.nan),
+        "Saldo (CLP)": saldo,
+    })
+
+
+def proyeccion_sintetica(etiquetas: List[str], semilla: int = SEMILLA) -> pd.DataFrame:
+    """Proyección ya derretida (CLASIFICACION, FECHA, MONTO, MES), como cargar_proyeccion."""
+    from clasificador import normalizar_serie
+
+    rng = np.random.default_rng(semilla)
+    meses = pd.date_range(FECHA_FIN - pd.DateOffset(months=11), periods=12, freq="MS")
+    etiquetas = sorted(set(etiquetas))
+    df = pd.DataFrame({
+        "CLASIFICACION": np.repeat(etiquetas, len(meses)),
+        "FECHA": np.tile(meses, len(etiquetas)),
+    })
+    df["MONTO"] = rng.integers(0, 80_000_000, size=len(df)).astype(float)
+    df["MES"] = df["FECHA"]
+    df["CLASIFICACION"] = normalizar_serie(df["CLASIFICACION"].astype(str))
+    return df
+
+
+def tabs_sinteticas(filas: int, semilla: int = SEMILLA) -> Dict[str, pd.DataFrame]:
+    """ventas_raw de filas filas (dos años) más stock_snapshot, config e inbound_po coherentes."""
+    rng = np.random.default_rng(semilla)
+    n_skus = max(100, filas // 200)
+    skus = np.array([f"SKU-{i:05d}" for i in range(n_skus)], dtype=object)
+    # algunas filas con minúsculas y espacios, como llegan desde Sheets
+    sucios = np.array([f" sku-{i:05d}" for i in range(n_skus)], dtype=object)
+
+    # SKU con popularidad desigual
+    pop = rng.zipf(1.3, size=filas) % n_skus
+    dias = rng.integers(0, 730, size=filas)
+    ventas = pd.DataFrame({
+        "fecha": (FECHA_FIN - pd.to_timedelta(dias, unit="D")).strftime("%Y-%m-%d"),
+        "sku": np.where(rng.random(filas) < 0.02, sucios[pop], skus[pop]),
+        "cantidad": rng.integers(1, 20, size=filas),
+        "cliente": [f"CLI-{c:04d}" for c in rng.integers(0, 2_000, size=filas)],
+        "precio": rng.integers(990, 99_990, size=filas),
+        "documento": rng.integers(1, 10_000_000, size=filas),
+    })
+    stock = pd.DataFrame({
+        "sku": skus,
+        "descripcion": [f"Producto {i}" for i in range(n_skus)],
+        "bodega": "CENTRAL",
+        "stock": rng.integers(0, 500, size=n_skus),
+    })
+    config = pd.DataFrame({
+        "sku": skus,
+        "proveedor": rng.choice(["PROV-A", "PROV-B", "PROV-C"], size=n_skus),
+        "lead_time_dias": rng.integers(0, 30, size=n_skus),
+        "seguridad_dias": rng.integers(0, 10, size=n_skus),
+        "min_lote": rng.choice([1, 6, 12], size=n_skus),
+        "multiplo_lote": rng.choice([1, 6], size=n_skus),
+    })
+    n_inbound = max(10, filas // 20)
+    inbound = pd.DataFrame({
+        "sku": skus[rng.integers(0, n_skus, size=n_inbound)],
+        "qty": rng.integers(0, 200, size=n_inbound),
+        "eta": (FECHA_FIN + pd.to_timedelta(rng.integers(-30, 90, size=n_inbound), unit="D")).strftime("%Y-%m-%d"),
+        "estado": rng.choice(["ABIERTA", "PENDIENTE", "RECIBIDA"], size=n_inbound),
+    })
+    return {"ventas_raw": ventas, "stock_snapshot": stock, "config": config, "inbound_po": inbound}
+
+# ======================================
+# MEDICIÓN
+# ======================================
+class Medidor:
+    """Corre etapas y guarda, por etapa, los segundos o (con memoria) el pico en MB."""
+
+    def __init__(self, filas: int, memoria: bool = False):
+        self.filas = filas
+        self.memoria = memoria
+        self.resultados: List[dict] = []
+
+    def etapa(self, nombre: str, funcion: Callable, *args, **kwargs):
+        gc.collect()
+        if self.memoria:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            valor = funcion(*args, **kwargs)
+        finally:
+            segundos = time.perf_counter() - t0
+            if self.memoria:
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        medida = {"pico_mb": round(pico / 2**20, 2)} if self.memoria else {"segundos": round(segundos, 4)}
+        self.resultados.append({"filas": self.filas, "etapa": nombre, **medida})
+        return valor
+
+
+def _etapas_cartola(m: Medidor, xlsx_max: int) -> None:
+    from agregados import construir_cubo, cruzar_con_proyeccion, totales_mensuales
+    from clasificador import REGLAS_BASE, REGLAS_FLUJO_CAJA, Clasificador, tabla_desde_cascada
+    from ingesta import cargar_cartola, normalizar_cartola
+
+    crudo = cartola_sintetica(m.filas)
+    comparativo = Clasificador(REGLAS_BASE)
+    flujo_caja = Clasificador(tabla_desde_cascada(REGLAS_FLUJO_CAJA))
+    if m.filas <= xlsx_max:
+        crudo.to_excel("cartola.xlsx", index=False)
+        crudo = m.etapa("cartola.carga_xlsx", pd.read_excel, "cartola.xlsx")
+        cargar_cartola("cartola.xlsx", comparativo)  # deja la copia Feather
+        m.etapa("cartola.carga_cache", cargar_cartola, "cartola.xlsx", comparativo)
+
+    df = m.etapa("cartola.normalizacion", normalizar_cartola, crudo)
+    m.etapa("cartola.clasificar_flujo_caja", flujo_caja.clasificar, df["COMENTARIO"], df["ABONOS (CLP)"])
+    df["CLASIFICACION"] = m.etapa("cartola.clasificar_comparativo", comparativo.clasificar,
+                                  df["COMENTARIO"], df["ABONOS (CLP)"])
+    proyeccion = proyeccion_sintetica(comparativo.reglas["CLASIFICACION"].tolist())
+
+    def comparar(movimientos: pd.DataFrame):
+        cubo = construir_cubo(movimientos)
+        return cruzar_con_proyeccion(cubo, proyeccion), totales_mensuales(cubo)
+
+    m.etapa("cartola.comparativo", comparar, df)
+
+
+def _etapas_ventas(m: Medidor) -> Dict[str, pd.DataFrame]:
+    from modelo_ventas import VentasCompactas, es_columna_ventas
+    from snapshots import guardar_snapshot, guardar_snapshot_por_partes, leer_snapshot, leer_snapshot_por_partes
+
+    tabs = {}
+    for tab, df in tabs_sinteticas(m.filas).items():
+        df.to_csv(f"{tab}.csv", index=False)
+        if tab != "ventas_raw":
+            tabs[tab] = pd.read_csv(f"{tab}.csv")
+    tabs["ventas_raw"] = m.etapa("ventas.carga_csv", pd.read_csv, "ventas_raw.csv")
+
+    # copia proyectada como la deja el refresco en streaming; la reportería
+    # compacta desde ella por record batches
+    with pd.read_csv("ventas_raw.csv", usecols=es_columna_ventas, dtype=str, chunksize=50_000) as partes:
+        guardar_snapshot_por_partes(SHEET_ID, "ventas_raw_proyectada", partes)
+    m.etapa("ventas.compactar_snapshot_entero",
+            lambda: VentasCompactas.desde_tab(leer_snapshot(SHEET_ID, "ventas_raw_proyectada")))
+    m.etapa("ventas.compactar_snapshot_por_partes",
+            lambda: VentasCompactas.desde_partes(leer_snapshot_por_partes(SHEET_ID, "ventas_raw_proyectada")))
+    guardar_snapshot(SHEET_ID, "ventas_raw", tabs["ventas_raw"])
+    m.etapa("ventas.carga_snapshot", leer_snapshot, SHEET_ID, "ventas_raw")
+    return tabs
+
+
+def _etapas_reporteria(m: Medidor, tabs: Dict[str, pd.DataFrame]) -> None:
+    from cobertura import calcular_cobertura, normalizar_stock, umbrales_desde_config
+    from modelo_ventas import VentasCompactas
+    from rollup_ventas import RollupVentas
+
+    rollup = m.etapa("reporteria.rollup",
+                     lambda: RollupVentas(VentasCompactas.desde_tab(tabs["ventas_raw"])))
+    hoy = FECHA_FIN
+
+    def ventanas():
+        # las mismas consultas que arma app_reporteria en una carga de página
+        ini_mes = hoy.replace(day=1)
+        ini_m1 = (ini_mes - timedelta(days=1)).replace(day=1)
+        ini_m2 = (ini_m1 - timedelta(days=1)).replace(day=1)
+        return [
+            rollup.por_sku(hoy - timedelta(days=30), hoy),
+            rollup.mensual(hoy - timedelta(days=365), hoy),
+            rollup.por_sku(ini_m1, ini_mes - timedelta(days=1)),
+            rollup.por_sku(ini_m2, ini_m1 - timedelta(days=1)),
+        ]
+
+    m.etapa("reporteria.ventanas", ventanas)
+
+    def cobertura():
+        stock = normalizar_stock(tabs["stock_snapshot"], SHEET_ID)
+        umbrales = umbrales_desde_config(tabs["config"])
+        return calcular_cobertura(stock, rollup.por_sku(hoy - timedelta(days=60), hoy), 60, umbrales)
+
+    m.etapa("reporteria.cobertura", cobertura)
+
+
+def _etapas_predictor(m: Medidor, tabs: Dict[str, pd.DataFrame]) -> None:
+    from normalizacion import (
+        normalize_config_sheet,
+        normalize_inbound_sheet,
+        normalize_stock_sheet,
+        normalize_ventas_sheet,
+        prepare_inbound_for_core,
+    )
+
+    ventas = m.etapa("predictor.ventas", normalize_ventas_sheet, tabs["ventas_raw"])
+    stock = m.etapa("predictor.stock", normalize_stock_sheet, tabs["stock_snapshot"],
+                    sheet_id=SHEET_ID, tab="stock_snapshot")
+    m.etapa("predictor.config", normalize_config_sheet, tabs["config"], ventas, stock)
+    m.etapa("predictor.inbound",
+            lambda: prepare_inbound_for_core(normalize_inbound_sheet(tabs["inbound_po"])))
+
+
+def medir(filas: int, xlsx_max: int = XLSX_MAX_FILAS, memoria: bool = False) -> List[dict]:
+    """Todas las etapas para un tamaño, en un directorio temporal."""
+    # los módulos del repo se importan desde aquí aunque se cambie de directorio
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    if raiz not in sys.path:
+        sys.path.insert(0, raiz)
+    m = Medidor(filas, memoria)
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp:
+        previo = os.getcwd()
+        os.chdir(tmp)
+        try:
+            _etapas_cartola(m, xlsx_max)
+            tabs = _etapas_ventas(m)
+            _etapas_reporteria(m, tabs)
+            _etapas_predictor(m, tabs)
+        finally:
+            os.chdir(previo)
+    return m.resultados
+
+# ======================================
+# BASELINE
+# ======================================
+def leer_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("resultados", {})
+
+
+def guardar_baseline(path: str, resultados: pd.DataFrame) -> None:
+    """Guarda los tamaños medidos; los demás tamaños de la baseline se conservan."""
+    base = leer_baseline(path)
+    for filas, grupo in resultados.groupby("filas"):
+        base[str(filas)] = {
+            r.etapa: {"segundos": r.segundos, "pico_mb": r.pico_mb} for r in grupo.itertuples()
+        }
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "creado": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "maquina": platform.platform(),
+            "resultados": base,
+        }, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def comparar(resultados: pd.DataFrame, baseline: dict, tolerancia: float = TOLERANCIA) -> pd.DataFrame:
+    """Agrega base_seg / base_mb y una columna regresion ("", "tiempo", "memoria" o ambas)."""
+    out = resultados.copy()
+    base = [baseline.get(str(f), {}).get(e, {}) for f, e in zip(out["filas"], out["etapa"])]
+    out["base_seg"] = [b.get("segundos", np.nan) for b in base]
+    out["base_mb"] = [b.get("pico_mb", np.nan) for b in base]
+    lento = (out["segundos"] > out["base_seg"] * (1 + tolerancia)) & (out["segundos"] - out["base_seg"] > MIN_SEG)
+    pesado = (out["pico_mb"] > out["base_mb"] * (1 + tolerancia)) & (out["pico_mb"] - out["base_mb"] > MIN_MB)
+    out["regresion"] = [
+        " + ".join(n for n, v in (("tiempo", a), ("memoria", b)) if v) for a, b in zip(lento, pesado)
+    ]
+    return out
+
+
+def correr(filas: List[int], xlsx_max: int = XLSX_MAX_FILAS) -> pd.DataFrame:
+    """Cada tamaño y pasada en un proceso nuevo, para no heredar cachés ni memoria."""
+    ctx = mp.get_context("spawn")
+    pasadas = {False: [], True: []}
+    for n in filas:
+        for memoria in (False, True):
+            with ctx.Pool(1) as pool:
+                pasadas[memoria].extend(pool.apply(medir, (n, xlsx_max, memoria)))
+    return pd.DataFrame(pasadas[False]).merge(pd.DataFrame(pasadas[True]), on=["filas", "etapa"], how="left")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, clasificación y agregados con datos sintéticos.")
+    parser.add_argument("--filas", type=int, nargs="+", default=FILAS)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--guardar-baseline", action="store_true",
+                        help="guarda estos resultados como baseline en vez de comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="aumento relativo permitido en tiempo y memoria")
+    parser.add_argument("--xlsx-max", type=int, default=XLSX_MAX_FILAS,
+                        help="tamaño máximo con etapas de xlsx")
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    resultados = comparar(correr(args.filas, args.xlsx_max), leer_baseline(args.baseline), args.tolerancia)
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(resultados.to_string(index=False))
+    print(f"{len(args.filas)} tamaños en {time.perf_counter() - t0:.1f}s")
+    if args.salida:
+        resultados.to_json(args.salida, orient="records", indent=2)
+
+    if args.guardar_baseline:
+        guardar_baseline(args.baseline, resultados)
+        print(f"baseline guardada en {args.baseline}")
+        sys.exit(0)
+    regresiones = resultados[resultados["regresion"] != ""]
+    if not regresiones.empty:
+        print(f"{len(regresiones)} etapas con regresión sobre {args.baseline} (tolerancia {args.tolerancia:.0%}):")
+        for r in regresiones.itertuples():
+            print(f"  {r.filas} filas {r.etapa}: {r.regresion} "
+                  f"({r.segundos:.3f}s vs {r.base_seg:.3f}s, {r.pico_mb:.1f} MB vs {r.base_mb:.1f} MB)")
+        sys.exit(1)
@@ -0,0 +1,243 @@
+# cache_compartida.py — Caché de proceso compartida entre sesiones
+#
+# Todas las sesiones de Streamlit corren en el mismo proceso: lo que carga una
+# sesión (pestañas crudas, frames normalizados, rollups de un tenant) lo
+# reutilizan las demás sin volver a descargar ni a deserializar.
+#
+# - LRU acotada por tamaño (MB); cada entrada puede tener TTL al consultarla.
+# - Carga única: si varias sesiones piden la misma clave a la vez, una carga y
+#   las demás esperan ese resultado.
+# - Los valores son inmutables: los arreglos numpy se marcan de solo lectura y
+#   cada consulta entrega vistas superficiales de los DataFrame (copy-on-write),
+#   nunca copias profundas.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_MB_ENV = "CACHE_TENANTS_MB"
+MAX_MB = float(os.environ.get(MAX_MB_ENV, 1024))
+
+# las vistas que entrega la caché comparten buffers con el valor guardado: sin
+# copy-on-write (pandas < 3), un cambio in-place de una sesión llegaría a todas
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ======================================
+# TAMAÑO E INMUTABILIDAD
+# ======================================
+def tamano_bytes(valor, _vistos: Optional[set] = None) -> int:
+    """Bytes aproximados de frames, arreglos y objetos que los contienen (sin índices ni strings sueltos)."""
+    vistos = set() if _vistos is None else _vistos
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(valor.memory_usage(index=True).sum() if isinstance(valor, pd.DataFrame) else valor.memory_usage(index=True))
+    if isinstance(valor, (np.ndarray, pd.Index)):
+        return int(valor.nbytes)
+    if isinstance(valor, (tuple, list)):
+        return sum(tamano_bytes(v, vistos) for v in valor)
+    if isinstance(valor, dict):
+        return sum(tamano_bytes(v, vistos) for v in valor.values())
+    if hasattr(valor, "__dict__"):
+        return sum(tamano_bytes(v, vistos) for v in vars(valor).values())
+    return 0
+
+
+def congelar(valor):
+    """Marca de solo lectura los arreglos numpy del valor (también dentro de objetos)."""
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, (tuple, list)):
+        for v in valor:
+            congelar(v)
+    elif isinstance(valor, dict):
+        for v in valor.values():
+            congelar(v)
+    elif hasattr(valor, "__dict__") and not isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        for v in vars(valor).values():
+            if isinstance(v, np.ndarray):
+                v.flags.writeable = False
+    return valor
+
+
+def vista(valor):
+    """Lo que recibe quien consulta: DataFrame/Series como vista superficial, el resto tal cual."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=False)
+    if isinstance(valor, tuple):
+        return tuple(vista(v) for v in valor)
+    if isinstance(valor, list):
+        return [vista(v) for v in valor]
+    if isinstance(valor, dict):
+        return {k: vista(v) for k, v in valor.items()}
+    return valor
+
+# ======================================
+# CACHÉ
+# ======================================
+class _Entrada:
+    __slots__ = ("valor", "bytes", "creada")
+
+    def __init__(self, valor, nbytes: int):
+        self.valor = valor
+        self.bytes = nbytes
+        self.creada = time.monotonic()
+
+
+class _Carga:
+    __slots__ = ("listo", "valor", "error")
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error: Optional[BaseException] = None
+
+
+class CacheCompartida:
+    """LRU thread-safe acotada a max_mb, con carga única por clave."""
+
+    def __init__(self, max_mb: float = MAX_MB):
+        self.max_bytes = int(max_mb * 2**20)
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[Hashable, _Entrada]" = OrderedDict()
+        self._en_vuelo: dict = {}
+        self._bytes = 0
+        # cambia con cada invalidación: una carga que se cruzó con una no se guarda
+        self._generacion = 0
+        self.hits = 0
+        self.misses = 0
+        self.esperas = 0
+
+    # ---------- consulta ----------
+    def obtener(self,
+                clave: Hashable,
+                cargar: Callable[[], Any],
+                ttl: Optional[float] = None,
+                forzar: bool = False) -> Tuple[Any, bool]:
+        """(valor, hit). Sin entrada vigente carga una sola vez aunque la pidan varias sesiones.
+
+        forzar recarga aunque haya entrada vigente; mientras tanto las demás
+        sesiones siguen recibiendo la anterior (precalentado).
+        """
+        with self._lock:
+            entrada = None if forzar else self._vigente(clave, ttl)
+            if entrada is not None:
+                self.hits += 1
+                return vista(entrada.valor), True
+            carga = self._en_vuelo.get(clave)
+            propia = carga is None
+            if propia:
+                carga = self._en_vuelo[clave] = _Carga()
+                generacion = self._generacion
+                self.misses += 1
+            else:
+                self.esperas += 1
+
+        if not propia:
+            carga.listo.wait()
+            if carga.error is not None:
+                raise carga.error
+            return vista(carga.valor), True
+
+        try:
+            carga.valor = congelar(cargar())
+        except BaseException as e:
+            carga.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+                if carga.error is None and generacion == self._generacion:
+                    self._guardar(clave, carga.valor)
+            carga.listo.set()
+        return vista(carga.valor), False
+
+    def consultar(self, clave: Hashable, ttl: Optional[float] = None):
+        """Valor vigente de la clave sin cargarlo; None si no hay."""
+        with self._lock:
+            entrada = self._vigente(clave, ttl)
+            if entrada is None:
+                return None
+            self.hits += 1
+            return vista(entrada.valor)
+
+    def poner(self, clave: Hashable, valor) -> None:
+        """Guarda un valor ya cargado por otra vía."""
+        with self._lock:
+            self._guardar(clave, congelar(valor))
+
+    def invalidar(self, predicado: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Descarta las claves que cumplen predicado (todas si es None). Devuelve cuántas."""
+        with self._lock:
+            self._generacion += 1
+            claves = [c for c in self._entradas if predicado is None or predicado(c)]
+            for clave in claves:
+                self._bytes -= self._entradas.pop(clave).bytes
+        return len(claves)
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "mb": round(self._bytes / 2**20, 1),
+                "max_mb": round(self.max_bytes / 2**20, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "esperas": self.esperas,
+            }
+
+    # ---------- internos (con _lock tomado) ----------
+    def _vigente(self, clave: Hashable, ttl: Optional[float]) -> Optional[_Entrada]:
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if ttl is not None and time.monotonic() - entrada.creada >= ttl:
+            self._bytes -= self._entradas.pop(clave).bytes
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    def _guardar(self, clave: Hashable, valor) -> None:
+        nbytes = tamano_bytes(valor)
+        anterior = self._entradas.pop(clave, None)
+        if anterior is not None:
+            self._bytes -= anterior.bytes
+        if nbytes > self.max_bytes:
+            return  # más grande que toda la caché: se entrega, pero no se guarda
+        self._entradas[clave] = _Entrada(valor, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            _, expulsada = self._entradas.popitem(last=False)
+            self._bytes -= expulsada.bytes
+
+# ======================================
+# DATOS DERIVADOS POR TENANT
+# ======================================
+# frames normalizados, rollups, cubos: clave (sheet_id, nombre, *parámetros)
+TENANTS = CacheCompartida()
+# sheet_id -> última consulta (monotonic), con acierto o sin él
+_usos: Dict[str, float] = {}
+
+
+def por_tenant(sheet_id: str, nombre: str, cargar: Callable[[], Any],
+               *parametros, ttl: Optional[float] = None, forzar: bool = False) -> Tuple[Any, bool]:
+    """Valor derivado del sheet de un tenant, compartido entre sesiones. Devuelve (valor, hit)."""
+    _usos[sheet_id] = time.monotonic()
+    return TENANTS.obtener((sheet_id, nombre, *parametros), cargar, ttl, forzar)
+
+
+def ultimo_uso(sheet_id: str) -> float:
+    """Cuándo (monotonic) se consultó por última vez algo del sheet; -inf si nunca."""
+    return _usos.get(sheet_id, float("-inf"))
+
+
+def invalidar_tenant(sheet_id: str) -> int:
+    """Descarta todo lo derivado del sheet (sus pestañas cambiaron)."""
+    return TENANTS.invalidar(lambda clave: clave[0] == sheet_id)
@@ -0,0 +1,234 @@
+# cache_forecast.py — Caché en disco de los resultados de forecast_all
+#
+# La clave es la huella de las entradas normalizadas (ventas, stock, config,
+# inbound_core) por SKU, más freq, horizonte, tenant, la fecha del día (el
+# core y el inbound dependen de "hoy") y la versión de predictor_core
+# (__version__ y hash de su código). Con la misma clave, det / res / prop se
+# leen del disco sin recalcular.
+# Si no hay acierto pero existe una corrida anterior del mismo tenant, freq y
+# horizonte, solo se recalculan los SKU cuyas filas cambiaron (o son nuevos) y
+# el resto se toma de esa corrida.
+# Las entradas viven en CACHE_DIR/<clave>/ y se desalojan por tamaño, la
+# menos usada primero (LRU), cuando el total pasa de MAX_BYTES.
+
+import functools
+import glob
+import hashlib
+import importlib
+import json
+import os
+import shutil
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = ".cache_forecast"
+MAX_BYTES = 500 * 1024 * 1024
+MAX_FRACCION_PARCIAL = 0.5     # sobre esta fracción de SKU cambiados se recalcula todo
+ENTRADAS = ["ventas", "stock", "config", "inbound"]
+RESULTADOS = ["det", "res", "prop"]
+
+Resultado = Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]
+
+
+# ======================================
+# HUELLAS
+# ======================================
+def huellas_por_sku(entradas: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Una huella uint64 por SKU y entrada (suma de los hash de sus filas)."""
+    columnas = {}
+    for nombre in ENTRADAS:
+        df = entradas.get(nombre)
+        if df is None or df.empty or "sku" not in df.columns:
+            continue
+        filas = pd.util.hash_pandas_object(df.astype({"sku": str}), index=False)
+        columnas[nombre] = filas.groupby(df["sku"].astype(str).to_numpy()).sum()
+    skus = pd.Index(sorted(set().union(*(c.index for c in columnas.values()))), name="sku")
+    # reindex con fill_value mantiene uint64 (un NaN lo pasaría a float y perdería bits)
+    return pd.DataFrame({
+        nombre: columnas[nombre].reindex(skus, fill_value=0).astype("uint64")
+        if nombre in columnas else np.zeros(len(skus), dtype="uint64")
+        for nombre in ENTRADAS
+    }, index=skus)
+
+
+def _sha1(*partes) -> str:
+    h = hashlib.sha1()
+    for p in partes:
+        h.update(p if isinstance(p, bytes) else str(p).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=1)
+def version_core() -> str:
+    """__version__ de predictor_core más el hash de su código (un cambio del modelo cambia las claves)."""
+    try:
+        core = importlib.import_module("predictor_core")
+    except ImportError:
+        return "sin_core"
+    archivo = getattr(core, "__file__", None) or ""
+    if os.path.basename(archivo) == "__init__.py":   # paquete: todos sus módulos
+        fuentes = sorted(glob.glob(os.path.join(os.path.dirname(archivo), "**", "*.py"), recursive=True))
+    else:
+        fuentes = [archivo] if os.path.isfile(archivo) else []
+    h = hashlib.sha1()
+    for ruta in fuentes:
+        with open(ruta, "rb") as f:
+            h.update(f.read())
+    return f"{getattr(core, '__version__', '')}:{h.hexdigest()[:12]}"
+
+
+# ======================================
+# DISCO
+# ======================================
+def _ruta(clave: str, nombre: Optional[str] = None) -> str:
+    return os.path.join(CACHE_DIR, clave, nombre) if nombre else os.path.join(CACHE_DIR, clave)
+
+
+def _leer(clave: str) -> Optional[Tuple[Resultado, pd.DataFrame]]:
+    if not os.path.exists(_ruta(clave, "meta.json")):
+        return None
+    try:
+        frames = tuple(pd.read_pickle(_ruta(clave, f"{n}.pkl")) for n in RESULTADOS)
+        huellas = pd.read_pickle(_ruta(clave, "huellas.pkl"))
+    except (OSError, EOFError, ValueError):
+        return None
+    os.utime(_ruta(clave, "meta.json"))  # marca de uso para el LRU
+    return frames, huellas
+
+
+def _escribir(clave: str, resultado: Resultado, huellas: pd.DataFrame, meta: dict) -> None:
+    # pickle y no feather: los frames del core vuelven idénticos (dtypes incluidos)
+    tmp = _ruta(f"{clave}.tmp{os.getpid()}")
+    os.makedirs(tmp, exist_ok=True)
+    for nombre, df in zip(RESULTADOS, resultado):
+        df.to_pickle(os.path.join(tmp, f"{nombre}.pkl"))
+    huellas.to_pickle(os.path.join(tmp, "huellas.pkl"))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    shutil.rmtree(_ruta(clave), ignore_errors=True)
+    os.replace(tmp, _ruta(clave))
+
+
+def _tamano(carpeta: str) -> int:
+    return sum(e.stat().st_size for e in os.scandir(carpeta) if e.is_file())
+
+
+def desalojar(max_bytes: int = MAX_BYTES) -> int:
+    """Borra las entradas menos usadas hasta quedar bajo max_bytes. Devuelve cuántas borró."""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    entradas = []
+    for e in os.scandir(CACHE_DIR):
+        meta = os.path.join(e.path, "meta.json")
+        if e.is_dir() and os.path.exists(meta):
+            entradas.append((os.path.getmtime(meta), _tamano(e.path), e.path))
+    total = sum(t for _, t, _ in entradas)
+    borradas = 0
+    for _, tamano, carpeta in sorted(entradas):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(carpeta, ignore_errors=True)
+        total -= tamano
+        borradas += 1
+    return borradas
+
+
+def _ultima(base: str) -> Optional[str]:
+    ruta = os.path.join(CACHE_DIR, f"ultima_{base}.txt")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def _marcar_ultima(base: str, clave: str, n_skus: int) -> None:
+    """Apunta a la corrida que servirá de base para recálculos parciales.
+
+    Una corrida filtrada (p.ej. un solo SKU) no reemplaza a una completa.
+    """
+    previa = _ultima(base)
+    if previa and previa != clave and os.path.exists(_ruta(previa, "meta.json")):
+        with open(_ruta(previa, "meta.json"), encoding="utf-8") as f:
+            if n_skus < 0.5 * json.load(f).get("skus", 0):
+                return
+    ruta = os.path.join(CACHE_DIR, f"ultima_{base}.txt")
+    with open(f"{ruta}.tmp{os.getpid()}", "w", encoding="utf-8") as f:
+        f.write(clave)
+    os.replace(f"{ruta}.tmp{os.getpid()}", ruta)
+
+
+# ======================================
+# API
+# ======================================
+def _filtrar(df: pd.DataFrame, skus) -> pd.DataFrame:
+    return df[df["sku"].astype(str).isin(skus)]
+
+
+def _ordenar(df: pd.DataFrame) -> pd.DataFrame:
+    # mismo orden de filas con recálculo completo o parcial (estable: dentro
+    # de cada SKU queda el orden del forecast)
+    if "sku" not in df.columns:
+        return df
+    return df.sort_values("sku", kind="stable", key=lambda s: s.astype(str)).reset_index(drop=True)
+
+
+def forecast_cacheado(entradas: Dict[str, pd.DataFrame],
+                      freq: str,
+                      horizon: Optional[int],
+                      tenant: str,
+                      forecast: Callable[..., Resultado],
+                      max_fraccion_parcial: float = MAX_FRACCION_PARCIAL) -> Tuple[Resultado, str]:
+    """(det, res, prop) desde la caché o recalculando; el estado dice cuál fue.
+
+    forecast recibe ventas, stock, config, inbound, freq y horizon_override
+    (forecast_all o forecast_particionado).
+    """
+    huellas = huellas_por_sku(entradas)
+    base = _sha1(tenant, freq, horizon, pd.Timestamp.today().date(), version_core())
+    clave = _sha1(base, huellas.index.to_numpy().astype(str).tobytes(), huellas.to_numpy().tobytes())
+
+    cache = _leer(clave)
+    if cache is not None:
+        return cache[0], "hit"
+
+    def _correr(ent: Dict[str, pd.DataFrame]) -> Resultado:
+        return forecast(**ent, freq=freq, horizon_override=horizon)
+
+    resultado, estado = None, "miss"
+    previa = _ultima(base)
+    cache = _leer(previa) if previa else None
+    if cache is not None and all("sku" in df.columns for df in cache[0]):
+        (det0, res0, prop0), huellas0 = cache
+        en_previa = huellas.index.isin(huellas0.index)
+        iguales = np.zeros(len(huellas), dtype=bool)
+        if en_previa.any():
+            idx = huellas.index[en_previa]
+            iguales[en_previa] = (huellas.loc[idx, ENTRADAS].to_numpy()
+                                  == huellas0.loc[idx, ENTRADAS].to_numpy()).all(axis=1)
+        cambiados = huellas.index[~iguales]
+        if len(cambiados) <= max_fraccion_parcial * max(len(huellas), 1):
+            vigentes = huellas.index.difference(cambiados)
+            nuevo = None
+            if len(cambiados):
+                parcial = {n: _filtrar(df, cambiados) if df is not None and "sku" in df.columns else df
+                           for n, df in entradas.items()}
+                nuevo = _correr(parcial)
+            if nuevo is None or all("sku" in df.columns for df in nuevo):
+                resultado = tuple(
+                    _ordenar(pd.concat([_filtrar(viejo, vigentes)] + ([nuevo[i]] if nuevo is not None else []),
+                                       ignore_index=True))
+                    for i, viejo in enumerate((det0, res0, prop0))
+                )
+                estado = f"parcial ({len(cambiados)} SKU recalculados)"
+
+    if resultado is None:
+        resultado = tuple(_ordenar(df) for df in _correr(entradas))
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _escribir(clave, resultado, huellas, {"tenant": tenant, "freq": freq, "horizon": horizon,
+                                          "skus": len(huellas), "creado": pd.Timestamp.now().isoformat()})
+    _marcar_ultima(base, clave, len(huellas))
+    desalojar()
+    return resultado, estado
@@ -0,0 +1,354 @@
+# clasificador.py — Clasificación vectorizada de movimientos de cartola
+#
+# Las reglas viven en una tabla (PATRON, TIPO, SIGNO, PRIORIDAD, CLASIFICACION)
+# que se compila una sola vez en un índice por signo (abono / cargo):
+#   - EXACTO   -> diccionario hash
+#   - PREFIJO  -> trie de caracteres
+#   - CONTIENE -> una única regex combinada que encuentra todos los patrones
+#   - REGEX    -> expresiones propias, evaluadas vectorizadas
+# La regla ganadora (menor PRIORIDAD; a igualdad, la que aparece antes) se
+# resuelve solo para las descripciones distintas y se reparte a todas las filas.
+#
+# La tabla base reproduce la cascada del comparativo. clasificador_oficial.xlsx
+# la complementa: una hoja REGLAS con el formato de la tabla, y/o la hoja
+# histórica Comentario/Clasificacion (coincidencias exactas).
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import medido
+
+NO_CLASIFICADO = "NO CLASIFICADO"
+
+COLUMNAS_REGLAS = ["PATRON", "TIPO", "SIGNO", "PRIORIDAD", "CLASIFICACION"]
+TIPOS = {
+    "CONTIENE": "CONTIENE", "CONTAINS": "CONTIENE",
+    "PREFIJO": "PREFIJO", "PREFIX": "PREFIJO",
+    "EXACTO": "EXACTO", "EXACT": "EXACTO",
+    "REGEX": "REGEX",
+}
+SIGNOS = {"ABONO", "CARGO", "AMBOS"}
+
+# Las coincidencias exactas de la hoja histórica van después de la tabla base:
+# solo clasifican lo que las reglas no resuelven.
+PRIORIDAD_HISTORICA = 10_000
+
+# ======================================
+# CASCADAS BASE (en orden: la primera que calza gana)
+# ======================================
+# Cada regla: (patrones, clasificación). Basta que la descripción normalizada
+# contenga alguno de los patrones.
+Regla = Tuple[Tuple[str, ...], str]
+
+# variante histórica de flujo_caja_app.py
+REGLAS_FLUJO_CAJA: Dict[str, List[Regla]] = {
+    "abono": [
+        (("FACTURA", "COBRAR", "FLUJO", "APP-TRASPASO", "PAGO", "DEPOSITO", "DEP.CHEQ", "DEPOSITO EN EFECTIVO"),
+         "1.01.05.01 - Facturas por cobrar Nacional- FLUJO"),
+        (("LINEA DE CREDITO",), "LINEA DE CREDITO"),
+        (("RECICLAJES ECOLOGICOS DE CHILE LIMITADA",), "FINANCIAMIENTO EXTERNO"),
+        (("TRASPASO DE",), "1.01.05.01 - Facturas por cobrar Nacional- FLUJO"),
+    ],
+    "cargo": [
+        (("PROVEEDORES",), "PROVEEDORES NACIONALES"),
+        (("SUELDOS", "REMUNERACION"), "REMUNERACIONES POR PAGAR"),
+        (("SERVIPAG", "AGUA", "DISTRIBUIDORA", "TRASPASO A"), "PROVEEDORES NACIONALES"),
+        (("HONORARIOS",), "HONORARIOS POR PAGAR"),
+        (("INSTITUTO", "COLEGIO"), "GASTOS EDUCACION"),
+        (("CONSTRUCCION", "SEPCO"), "FACTURAS POR COBRAR NACIONAL"),
+        (("LINEA",), "LINEA DE CREDITO"),
+        (("EFECTIVO",), "DEPOSITO EFECTIVO"),
+        (("VIRTUALPOS",), "SERVICIOS TRANSBANK"),
+        (("BRUSSELS",), "SERVICIOS EXTERNOS"),
+        (("COMISION", "SEGURO"), "GASTOS Y COMISIONES BANCARIAS ( BANCO CHILE - SECURITY )"),
+        (("PAGO EN SII",), "IMPUESTOS"),
+        (("PAGO DE CREDITOS M/N",), "CREDITO BANCO DE CHILE"),
+        (("PAGO AUTOMATICO TARJETA DE CREDITO",), "PAGO TARJETA DE CREDITO"),
+        (("INVERSIONES ISLA KENT SPA", "INMOBILIARIA MONJITAS SA", "MALSCH Y COMPANIA S.A."),
+         "2.01.07.01-Proveedores Arrdo  Oficina , estacionamiento"),
+        (("PAGO INSTITUCIONES PREVISIONALES",), "IMPOSICIONES"),
+        (("TRASPASO DE:RECICLAJES ECOLOGICOS DE CHILE LIMITADA",), "FINANCIAMIENTO EXTERNO"),
+    ],
+}
+
+# flujo_caja_comparativo_app.py (etiquetas alineadas con flujo_proyectado.xlsx)
+REGLAS_COMPARATIVO: Dict[str, List[Regla]] = {
+    "abono": [
+        (("TRASPASO DE: RECICLAJES ECOLOGICOS DE CHILE LIMITADA",), "FINANCIAMIENTO EXTERNO"),
+        (("FACTURA", "COBRAR", "FLUJO", "APP-TRASPASO", "PAGO", "TRASPASO DE", "DEPOSITO", "DEP.CHEQ", "DEPOSITO EN EFECTIVO"),
+         "1.01.05.01-FACTURAS POR COBRAR NACIONAL- FLUJO"),
+        (("LINEA DE CREDITO",), "LINEA DE CREDITO"),
+    ],
+    "cargo": [
+        (("PAGO: PROVEEDORES",), "2.01.07.01-PROVEEDORES NACIONALES FIJOS"),
+        (("PROVISION: PROVEEDORES",), "2.01.07.01-PROVEEDORES NACIONALES EXISTENCIAS"),
+        (("PROVEEDORES",), "PROVEEDORES NACIONALES"),
+        (("SUELDOS", "REMUNERACION"), "REMUNERACIONES POR PAGAR"),
+        (("SERVIPAG", "AGUA", "DISTRIBUIDORA", "TRASPASO A"), "PROVEEDORES NACIONALES"),
+        (("HONORARIOS",), "HONORARIOS"),
+        (("INSTITUTO", "COLEGIO"), "GASTOS EDUCACION"),
+        (("CONSTRUCCION", "SEPCO"), "FACTURAS POR COBRAR NACIONAL"),
+        (("LINEA",), "LINEA DE CREDITO"),
+        (("EFECTIVO",), "DEPOSITO EFECTIVO"),
+        (("VIRTUALPOS",), "SERVICIOS TRANSBANK"),
+        (("BRUSSELS",), "SERVICIOS EXTERNOS"),
+        (("COMISION", "SEGURO"), "GASTOS Y COMISIONES BANCARIAS ( BANCO CHILE - SECURITY )"),
+        (("PAGO EN SII",), "IMPUESTOS"),
+        (("PAGO DE CREDITOS M/N",), "CREDITO BANCO DE CHILE"),
+        (("PAGO AUTOMATICO TARJETA DE CREDITO",), "PAGO TARJETA DE CREDITO"),
+        (("INVERSIONES ISLA KENT SPA", "INMOBILIARIA MONJITAS SA", "MALSCH Y COMPANIA S.A."),
+         "2.01.07.01-PROVEEDORES ARRIENDO OFICINA"),
+        (("PAGO INSTITUCIONES PREVISIONALES",), "IMPOSICIONES"),
+    ],
+}
+
+# ======================================
+# NORMALIZACIÓN
+# ======================================
+def normalizar(texto) -> str:
+    if pd.isnull(texto):
+        return ""
+    texto = str(texto).upper().strip()
+    texto = unicodedata.normalize("NFD", texto).encode("ascii", "ignore").decode("utf-8")
+    return texto
+
+
+# memo acotado de descripciones ya normalizadas (se vacía al llenarse);
+# compartido entre las sesiones, que lo leen y escriben con _lock_memo
+MEMO_NORMALIZAR_MAX = 200_000
+_memo_normalizar: Dict[str, str] = {}
+_lock_memo = threading.Lock()
+
+
+def normalizar_serie(serie: pd.Series) -> pd.Series:
+    """Igual que normalizar() pero sobre toda la columna: solo procesa valores distintos no vistos."""
+    codigos, unicos = pd.factorize(serie, sort=False)
+    if any(not isinstance(u, str) for u in unicos):
+        # factorize junta 1, 1.0 y True, que normalizan distinto
+        codigos, unicos = pd.factorize(serie.astype(str).where(serie.notna()), sort=False)
+    with _lock_memo:
+        local = {u: _memo_normalizar[u] for u in unicos if u in _memo_normalizar}
+    faltan = [u for u in unicos if u not in local]
+    if faltan:
+        nuevos = (
+            pd.Series(faltan, dtype=object)
+            .str.upper().str.strip()
+            .str.normalize("NFD").str.encode("ascii", "ignore").str.decode("utf-8")
+        )
+        local.update(zip(faltan, nuevos))
+        # al memo van a lo más MEMO_NORMALIZAR_MAX; el mapa sale de local
+        guardar = list(zip(faltan, nuevos))[-MEMO_NORMALIZAR_MAX:] if MEMO_NORMALIZAR_MAX > 0 else []
+        with _lock_memo:
+            if len(_memo_normalizar) + len(guardar) > MEMO_NORMALIZAR_MAX:
+                _memo_normalizar.clear()
+            _memo_normalizar.update(guardar)
+    mapa = np.array([local[u] for u in unicos] + [""], dtype=object)
+    return pd.Series(mapa[codigos], index=serie.index, name=serie.name)  # nulos (-1) -> ""
+
+# ======================================
+# TABLA DE REGLAS
+# ======================================
+def tabla_desde_cascada(reglas: Dict[str, List[Regla]]) -> pd.DataFrame:
+    """Convierte una cascada {signo: [(patrones, etiqueta), ...]} en tabla de reglas."""
+    filas = []
+    for signo, lista in reglas.items():
+        for i, (patrones, etiqueta) in enumerate(lista):
+            for p in patrones:
+                filas.append((p, "CONTIENE", signo.upper(), i * 10, etiqueta))
+    return pd.DataFrame(filas, columns=COLUMNAS_REGLAS)
+
+
+REGLAS_BASE = tabla_desde_cascada(REGLAS_COMPARATIVO)
+
+
+def validar_reglas(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza una tabla de reglas (mayúsculas, alias de TIPO, defaults)."""
+    df = df.copy()
+    df.columns = [normalizar(c) for c in df.columns]
+    if "PATRON" not in df.columns or "CLASIFICACION" not in df.columns:
+        raise ValueError("La tabla de reglas debe tener columnas 'PATRON' y 'CLASIFICACION'.")
+    for c, default in [("TIPO", "CONTIENE"), ("SIGNO", "AMBOS"), ("PRIORIDAD", 0)]:
+        if c not in df.columns:
+            df[c] = default
+    df = df.dropna(subset=["PATRON", "CLASIFICACION"])
+
+    df["TIPO"] = df["TIPO"].fillna("CONTIENE").map(normalizar)
+    desconocidos = set(df["TIPO"]) - set(TIPOS)
+    if desconocidos:
+        raise ValueError(f"TIPO de regla desconocido: {sorted(desconocidos)}")
+    df["TIPO"] = df["TIPO"].map(TIPOS)
+
+    df["SIGNO"] = df["SIGNO"].fillna("AMBOS").map(normalizar).replace("", "AMBOS")
+    desconocidos = set(df["SIGNO"]) - SIGNOS
+    if desconocidos:
+        raise ValueError(f"SIGNO de regla desconocido: {sorted(desconocidos)}")
+
+    df["PRIORIDAD"] = pd.to_numeric(df["PRIORIDAD"], errors="coerce").fillna(0)
+    df["CLASIFICACION"] = df["CLASIFICACION"].astype(str).str.strip()
+    # las regex se usan tal cual; el resto se compara contra texto normalizado
+    df["PATRON"] = [
+        str(p) if t == "REGEX" else normalizar(p) for p, t in zip(df["PATRON"], df["TIPO"])
+    ]
+    df = df[df["PATRON"] != ""]
+    return df[COLUMNAS_REGLAS].reset_index(drop=True)
+
+
+def _reglas_historicas(df: pd.DataFrame) -> pd.DataFrame:
+    """Hoja Comentario/Clasificacion: el comentario es 'Pago ' + la descripción de cartola."""
+    comentario = df["Comentario"].map(normalizar).str.replace(r"^PAGO ", "", regex=True)
+    return pd.DataFrame(
+        {
+            "PATRON": comentario,
+            "TIPO": "EXACTO",
+            "SIGNO": "CARGO",
+            "PRIORIDAD": PRIORIDAD_HISTORICA,
+            "CLASIFICACION": df["Clasificacion"],
+        }
+    )
+
+
+def leer_reglas(path: str, base: Optional[pd.DataFrame] = REGLAS_BASE) -> pd.DataFrame:
+    """Tabla de reglas oficial: hoja REGLAS + hoja histórica del workbook, sobre la base."""
+    partes = [] if base is None else [base]
+    if os.path.exists(path):
+        for nombre, hoja in pd.read_excel(path, sheet_name=None).items():
+            cols = {normalizar(c) for c in hoja.columns}
+            if {"PATRON", "CLASIFICACION"} <= cols:
+                partes.append(hoja)
+            elif {"Comentario", "Clasificacion"} <= set(hoja.columns):
+                partes.append(_reglas_historicas(hoja))
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_REGLAS)
+    return validar_reglas(pd.concat([validar_reglas(p) for p in partes], ignore_index=True))
+
+# ======================================
+# ÍNDICE COMPILADO
+# ======================================
+_FIN = None  # marca de patrón completo dentro del trie
+
+
+class _Indice:
+    """Reglas de un signo compiladas; rango = posición de la regla en orden de prioridad."""
+
+    def __init__(self, reglas: pd.DataFrame):
+        self.etiquetas = reglas["CLASIFICACION"].tolist()
+        self.sin_regla = len(self.etiquetas)
+        self.exactos: Dict[str, int] = {}
+        self.trie: dict = {}
+        self.regex: List[Tuple[re.Pattern, int]] = []
+        contiene: Dict[str, int] = {}
+
+        for rango, (patron, tipo) in enumerate(zip(reglas["PATRON"], reglas["TIPO"])):
+            if tipo == "EXACTO":
+                self.exactos.setdefault(patron, rango)
+            elif tipo == "PREFIJO":
+                nodo = self.trie
+                for ch in patron:
+                    nodo = nodo.setdefault(ch, {})
+                nodo.setdefault(_FIN, rango)
+            elif tipo == "REGEX":
+                self.regex.append((re.compile(patron, re.IGNORECASE), rango))
+            else:
+                contiene.setdefault(patron, rango)
+
+        # La regex toma, en cada posición, el patrón más largo que empieza ahí.
+        # Todo patrón que aparece en el texto es prefijo de ese más largo, así
+        # que basta con cerrar cada hallazgo sobre sus sub-patrones.
+        self.mejor: Dict[str, int] = {
+            p: min(r for q, r in contiene.items() if q in p) for p in contiene
+        }
+        if contiene:
+            alternativas = "|".join(re.escape(p) for p in sorted(contiene, key=len, reverse=True))
+            self.contiene: Optional[re.Pattern] = re.compile(f"(?=({alternativas}))")
+        else:
+            self.contiene = None
+
+    def _rango_prefijo(self, texto: str) -> int:
+        nodo, mejor = self.trie, self.sin_regla
+        for ch in texto:
+            nodo = nodo.get(ch)
+            if nodo is None:
+                break
+            mejor = min(mejor, nodo.get(_FIN, mejor))
+        return mejor
+
+    def _rango_contiene(self, texto: str) -> int:
+        hallados = self.contiene.findall(texto)
+        if not hallados:
+            return self.sin_regla
+        return min(self.mejor[p] for p in hallados)
+
+    def clasificar_unicos(self, textos: List[str]) -> np.ndarray:
+        rangos = np.full(len(textos), self.sin_regla, dtype=np.int64)
+        if self.exactos:
+            rangos = np.minimum(rangos, np.fromiter(
+                (self.exactos.get(t, self.sin_regla) for t in textos), dtype=np.int64, count=len(textos)))
+        if self.trie:
+            rangos = np.minimum(rangos, np.fromiter(
+                (self._rango_prefijo(t) for t in textos), dtype=np.int64, count=len(textos)))
+        if self.contiene is not None:
+            rangos = np.minimum(rangos, np.fromiter(
+                (self._rango_contiene(t) for t in textos), dtype=np.int64, count=len(textos)))
+        if self.regex:
+            serie = pd.Series(textos, dtype=object)
+            for patron, rango in self.regex:
+                calza = serie.str.contains(patron, na=False).to_numpy()
+                rangos = np.where(calza, np.minimum(rangos, rango), rangos)
+        etiquetas = np.array(self.etiquetas + [NO_CLASIFICADO], dtype=object)
+        return etiquetas[rangos]  # sin_regla apunta a NO_CLASIFICADO
+
+
+class Clasificador:
+    """Tabla de reglas compilada por signo; clasifica un DataFrame completo de una vez."""
+
+    def __init__(self, reglas: pd.DataFrame):
+        reglas = validar_reglas(reglas).sort_values("PRIORIDAD", kind="stable")
+        self.reglas = reglas.reset_index(drop=True)
+        # identifica el ruleset (p.ej. para invalidar cachés de cartolas clasificadas)
+        self.version = hashlib.sha1(self.reglas.to_csv(index=False).encode("utf-8")).hexdigest()[:12]
+        self.abono = _Indice(reglas[reglas["SIGNO"].isin(["ABONO", "AMBOS"])])
+        self.cargo = _Indice(reglas[reglas["SIGNO"].isin(["CARGO", "AMBOS"])])
+
+    @medido("clasificar")
+    def clasificar(self, descripciones: pd.Series, abonos: pd.Series) -> pd.Series:
+        """Devuelve la CLASIFICACION de cada movimiento (abono > 0 usa las reglas de abono)."""
+        es_abono = (pd.to_numeric(abonos, errors="coerce") > 0).to_numpy()
+        codigos, unicos = pd.factorize(descripciones.astype(str), sort=False)
+        normalizados = normalizar_serie(pd.Series(unicos, dtype=object)).tolist()
+
+        # cada descripción distinta se evalúa a lo más una vez por signo
+        out = np.empty(len(descripciones), dtype=object)
+        for mascara, indice in ((es_abono, self.abono), (~es_abono, self.cargo)):
+            if not mascara.any():
+                continue
+            cods = codigos[mascara]
+            usados = np.unique(cods)
+            etiquetas = indice.clasificar_unicos([normalizados[c] for c in usados])
+            mapa = np.empty(len(unicos), dtype=object)
+            mapa[usados] = etiquetas
+            out[mascara] = mapa[cods]
+        return pd.Series(out, index=descripciones.index, name="CLASIFICACION")
+
+
+# ======================================
+# CLASIFICADOR OFICIAL (compartido por los dashboards)
+# ======================================
+CLASIFICADOR_PATH = "clasificador_oficial.xlsx"
+_cache_clasificadores: Dict[Tuple[str, int], Clasificador] = {}
+
+
+def cargar_clasificador(path: str = CLASIFICADOR_PATH) -> Clasificador:
+    """Compila las reglas oficiales una vez por versión (mtime) del workbook."""
+    mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    clave = (os.path.abspath(path), mtime)
+    if clave not in _cache_clasificadores:
+        _cache_clasificadores.clear()
+        _cache_clasificadores[clave] = Clasificador(leer_reglas(path))
+    return _cache_clasificadores[clave]
@@ -0,0 +1,188 @@
+# cobertura.py — Días de cobertura, sobre-stock y bajo stock por SKU
+#
+# Cobertura = stock / consumo diario, calculada para todos los SKU de una vez a
+# partir de cualquier ventana de consumo (RollupVentas.por_sku). Los umbrales
+# salen por SKU de la pestaña config del tenant:
+#   bajo stock  -> cobertura <= lead_time_dias + seguridad_dias
+#   sobre-stock -> cobertura >= umbral de bajo stock + MARGEN_SOBRE_DIAS
+# Sin lead time ni seguridad se usan UMBRAL_BAJO / UMBRAL_SOBRE.
+#
+# Evaluación batch de todos los tenants activos:
+#   python cobertura.py --clientes <sheet_id_clientes_config> [--dias 60] [--salida cobertura.csv]
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from esquemas import EsNumerica, esquema
+from sheets import MAX_WORKERS, Lector
+
+UMBRAL_SOBRE = 20
+UMBRAL_BAJO = 5
+MARGEN_SOBRE_DIAS = UMBRAL_SOBRE - UMBRAL_BAJO
+SIN_CONSUMO = 9999          # cobertura de un SKU con stock y sin ventas en la ventana
+
+ESTADO_SOBRE = "sobre-stock"
+ESTADO_BAJO = "bajo stock"
+ESTADO_OK = "ok"
+
+
+# ======================================
+# NORMALIZACIÓN
+# ======================================
+def _columnas_stock(df: pd.DataFrame, es_numerica: EsNumerica) -> dict:
+    cols = {c.lower(): c for c in df.columns}
+    sku_c = cols.get("sku") or cols.get("codigo") or list(df.columns)[0]
+    stock_c = next((c for c in df.columns if es_numerica(c)), None)
+    return {"sku": sku_c, "stock": stock_c}
+
+
+def normalizar_stock(df: pd.DataFrame, sheet_id: str = "") -> pd.DataFrame:
+    """Pestaña de stock -> (sku, stock); toma la primera columna numérica como stock."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["sku", "stock"])
+    # pestaña propia en la caché de esquemas: la regla difiere de la del predictor
+    cols = esquema(df, sheet_id, "stock_reporteria", lambda es_numerica: _columnas_stock(df, es_numerica))
+    sku_c, stock_c = cols["sku"], cols["stock"]
+    out = pd.DataFrame()
+    out["sku"]   = df[sku_c].astype(str).str.strip().str.upper()
+    out["stock"] = pd.to_numeric(df[stock_c], errors="coerce").fillna(0)
+    return out
+
+
+def umbrales_desde_config(config: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Umbrales por SKU (sku, umbral_bajo, umbral_sobre) desde la pestaña config.
+
+    Config global (sin columna sku) -> una fila con sku None que aplica a todos.
+    """
+    if config is None or config.empty:
+        return pd.DataFrame(columns=["sku", "umbral_bajo", "umbral_sobre"])
+    df = config.copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    if "sku" in df.columns:
+        df["sku"] = df["sku"].astype(str).str.strip().str.upper()
+        df = df.drop_duplicates("sku", keep="last")
+    else:
+        df = df.head(1).assign(sku=None)
+
+    dias = sum(
+        pd.to_numeric(df[c], errors="coerce").fillna(0) if c in df.columns else 0
+        for c in ["lead_time_dias", "seguridad_dias"]
+    )
+    bajo = np.where(np.asarray(dias, dtype=float) > 0, dias, UMBRAL_BAJO).astype(float)
+    return pd.DataFrame({
+        "sku": df["sku"].to_numpy(),
+        "umbral_bajo": bajo,
+        "umbral_sobre": bajo + MARGEN_SOBRE_DIAS,
+    })
+
+
+# ======================================
+# MOTOR
+# ======================================
+def calcular_cobertura(stock: pd.DataFrame,
+                       consumo: pd.DataFrame,
+                       dias_ventana: int,
+                       umbrales: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Cobertura de todos los SKU con stock.
+
+    stock: (sku, stock); consumo: (sku, qty) de una ventana de dias_ventana días.
+    Devuelve sku, stock, consumo, consumo_dia, dias_cobertura, umbral_bajo,
+    umbral_sobre y estado.
+    """
+    out = stock[["sku", "stock"]].merge(
+        consumo[["sku", "qty"]].rename(columns={"qty": "consumo"}), on="sku", how="left"
+    )
+    out["consumo"] = out["consumo"].fillna(0).astype(float)
+    out["consumo_dia"] = out["consumo"] / float(dias_ventana)
+
+    con_consumo = out["consumo"].to_numpy() > 0
+    sin_consumo = out["stock"].to_numpy() > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["dias_cobertura"] = np.where(
+            con_consumo,
+            out["stock"].to_numpy(dtype=float) / out["consumo_dia"].to_numpy(),
+            np.where(sin_consumo, float(SIN_CONSUMO), 0.0),
+        )
+
+    out["umbral_bajo"] = float(UMBRAL_BAJO)
+    out["umbral_sobre"] = float(UMBRAL_SOBRE)
+    if umbrales is not None and not umbrales.empty:
+        globales = umbrales[umbrales["sku"].isna()]
+        if not globales.empty:
+            out["umbral_bajo"] = globales["umbral_bajo"].iloc[0]
+            out["umbral_sobre"] = globales["umbral_sobre"].iloc[0]
+        por_sku = umbrales.dropna(subset=["sku"]).set_index("sku")
+        if not por_sku.empty:
+            for c in ["umbral_bajo", "umbral_sobre"]:
+                out[c] = out["sku"].map(por_sku[c]).fillna(out[c])
+
+    cobertura = out["dias_cobertura"].to_numpy()
+    out["estado"] = np.select(
+        [
+            cobertura >= out["umbral_sobre"].to_numpy(),
+            (cobertura > 0) & (cobertura <= out["umbral_bajo"].to_numpy()),
+        ],
+        [ESTADO_SOBRE, ESTADO_BAJO],
+        default=ESTADO_OK,
+    )
+    return out
+
+
+# ======================================
+# BATCH MULTI-TENANT
+# ======================================
+def cobertura_tenant(sheet_id: str, lector: Lector, dias: int = 60,
+                     hoy: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    from reporteria import cargar_tenant  # reporteria importa este módulo
+
+    hoy = pd.Timestamp.today().normalize() if hoy is None else pd.Timestamp(hoy).normalize()
+    rollup, stock, umbrales = cargar_tenant(sheet_id, lector)
+    consumo = rollup.por_sku(hoy - pd.Timedelta(days=dias), hoy)
+    return calcular_cobertura(stock, consumo, dias, umbrales)
+
+
+def cobertura_tenants(sheet_ids: Iterable[str], lector: Lector, dias: int = 60,
+                      hoy: Optional[pd.Timestamp] = None,
+                      max_workers: int = MAX_WORKERS) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Cobertura de varios tenants en paralelo -> (frame con columna sheet_id, errores)."""
+    sheet_ids = list(dict.fromkeys(sheet_ids))
+    frames, errores = [], {}
+    if not sheet_ids:
+        return pd.DataFrame(), errores
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sheet_ids))) as pool:
+        futuros = {sid: pool.submit(cobertura_tenant, sid, lector, dias, hoy) for sid in sheet_ids}
+    for sid, fut in futuros.items():
+        try:
+            frames.append(fut.result().assign(sheet_id=sid))
+        except Exception as e:
+            errores[sid] = str(e)
+    return (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()), errores
+
+
+if __name__ == "__main__":
+    from snapshots import lector_con_snapshot, sheets_de_clientes
+
+    parser = argparse.ArgumentParser(description="Cobertura de stock de todos los tenants.")
+    parser.add_argument("sheet_ids", nargs="*")
+    parser.add_argument("--clientes", help="sheet con clientes_config: evalúa todos los tenants activos")
+    parser.add_argument("--dias", type=int, default=60, help="ventana de consumo en días")
+    parser.add_argument("--salida", default="cobertura.csv")
+    args = parser.parse_args()
+
+    sheet_ids = list(args.sheet_ids)
+    if args.clientes:
+        sheet_ids = sheets_de_clientes(args.clientes) + sheet_ids
+    t0 = time.perf_counter()
+    resultado, errores = cobertura_tenants(sheet_ids, lector_con_snapshot(), dias=args.dias)
+    for sid, err in errores.items():
+        print(f"{sid}: error: {err}")
+    if not resultado.empty:
+        resultado.to_csv(args.salida, index=False)
+        resumen = resultado.groupby(["sheet_id", "estado"]).size().unstack(fill_value=0)
+        print(resumen.to_string())
+    print(f"{len(sheet_ids)} tenants en {time.perf_counter() - t0:.1f}s -> {args.salida}")
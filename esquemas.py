@@ -0,0 +1,68 @@
+# esquemas.py — Inferencia de columnas de las pestañas, con caché
+#
+# Las pestañas de stock llegan con nombres de columna distintos por tenant;
+# los normalizadores adivinan cuál es el SKU y cuál la cantidad mirando qué
+# columnas son numéricas. Aquí cada columna se perfila una sola vez (con una
+# muestra de MUESTRA_FILAS valores no nulos; las columnas de dtype numérico no
+# se convierten) y el mapeo resultante se guarda por (sheet_id, pestaña,
+# firma de encabezados). Mientras la pestaña conserve columnas y dtypes, las
+# cargas siguientes no vuelven a inferir nada. Se guardan a lo más
+# MAX_ESQUEMAS mapeos; sale el menos usado (LRU).
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+MUESTRA_FILAS = 500
+MAX_ESQUEMAS = 256
+
+EsNumerica = Callable[[str], bool]
+
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def firma(df: pd.DataFrame) -> Tuple[tuple, tuple]:
+    """Nombres y dtypes de las columnas: si cambian, se vuelve a inferir."""
+    return tuple(str(c) for c in df.columns), tuple(str(t) for t in df.dtypes)
+
+
+def perfilador(df: pd.DataFrame, muestra: int = MUESTRA_FILAS) -> EsNumerica:
+    """es_numerica(col) perezosa y memoizada: cada columna se perfila como mucho una vez."""
+    memo: Dict[str, bool] = {}
+
+    def es_numerica(col) -> bool:
+        if col not in memo:
+            s = df[col]
+            if pd.api.types.is_numeric_dtype(s):
+                memo[col] = bool(s.notna().any())
+            else:
+                valores = s.dropna().head(muestra)
+                memo[col] = bool(pd.to_numeric(valores, errors="coerce").notna().any())
+        return memo[col]
+
+    return es_numerica
+
+
+def esquema(df: pd.DataFrame, sheet_id: str, tab: str,
+            inferir: Callable[[EsNumerica], dict]) -> dict:
+    """Mapeo de columnas de la pestaña: desde la caché o inferido con el perfil."""
+    clave = (sheet_id, tab, firma(df))
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    mapeo = inferir(perfilador(df))
+    with _lock:
+        _cache[clave] = mapeo
+        _cache.move_to_end(clave)
+        while len(_cache) > MAX_ESQUEMAS:
+            _cache.popitem(last=False)
+    return mapeo
+
+
+def limpiar() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,189 @@
+# flujo_caja.py — Núcleo de los dashboards de flujo de caja (sin Streamlit)
+#
+# flujo_caja_app.py: cartola clasificada, filtros por fecha y clasificación,
+# totales y cuadratura del saldo calculado contra el saldo de la cartola.
+# flujo_caja_comparativo_app.py: movimientos reales (cartola única o store
+# multi-mes), proyección, cruce por CLASIFICACION × MES, validación de la
+# clasificación y resumen mensual con semáforo (clásico y ajustado por avance).
+
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from cache_compartida import TENANTS, por_tenant
+from agregados import calcular_avance, construir_cubo, cruzar_con_proyeccion, evaluar_semaforo, totales_mensuales
+from clasificador import NO_CLASIFICADO, normalizar_serie
+from ingesta import CARTOLAS_DIR, actualizar_store, cargar_cartola, cargar_cubo, cargar_movimientos
+from instrumentacion import medido
+
+CARTOLA_PATH = "cartola_junio_2025.xlsx"
+PROYECCION_PATH = "flujo_proyectado.xlsx"
+# clave en la caché compartida (no es un tenant: una cartola/store por despliegue)
+CLAVE_CACHE = "flujo_caja"
+
+# la ingesta del store no admite dos a la vez (sesiones + precalentado)
+_lock_store = threading.Lock()
+# directorio de cartolas -> clave del último comparativo armado
+_ultimas: Dict[str, tuple] = {}
+
+# ======================================
+# FILTROS Y TOTALES
+# ======================================
+def filtrar(df: pd.DataFrame,
+            desde=None,
+            hasta=None,
+            clasificaciones: Optional[Iterable[str]] = None,
+            col_fecha: str = "FECHA") -> pd.DataFrame:
+    """Filas con desde <= fecha <= hasta y, si se pasan, de esas clasificaciones."""
+    mascara = pd.Series(True, index=df.index)
+    if desde is not None:
+        mascara &= df[col_fecha] >= pd.to_datetime(desde)
+    if hasta is not None:
+        mascara &= df[col_fecha] <= pd.to_datetime(hasta)
+    if clasificaciones is not None:
+        mascara &= df["CLASIFICACION"].isin(list(clasificaciones))
+    return df[mascara]
+
+
+def totales(df: pd.DataFrame) -> dict:
+    """abonos, cargos y flujo neto."""
+    abonos = df["ABONOS (CLP)"].sum()
+    cargos = df["CARGOS (CLP)"].sum()
+    return {"abonos": abonos, "cargos": cargos, "neto": abonos - cargos}
+
+
+def cuadratura_saldo(df: pd.DataFrame, saldo_inicial: float = 0) -> dict:
+    """Saldo calculado (inicial + abonos - cargos) contra el último saldo informado en la cartola.
+
+    saldo_cartola, fecha_saldo y diferencia quedan en None si la cartola no trae saldo.
+    """
+    t = totales(df)
+    saldo_calculado = saldo_inicial + t["abonos"] - t["cargos"]
+    con_saldo = df.sort_values(by="FECHA")
+    ultimo = con_saldo[con_saldo["SALDO (CLP)"].notna()].iloc[-1:]
+    out = {"saldo_calculado": saldo_calculado, "saldo_cartola": None, "fecha_saldo": None, "diferencia": None}
+    if not ultimo.empty:
+        out["saldo_cartola"] = ultimo["SALDO (CLP)"].values[0]
+        out["fecha_saldo"] = pd.to_datetime(ultimo["FECHA"].values[0])
+        out["diferencia"] = saldo_calculado - out["saldo_cartola"]
+    return out
+
+
+def resumen_clasificacion(df: pd.DataFrame) -> pd.DataFrame:
+    """Abonos y cargos por CLASIFICACION."""
+    return df.groupby("CLASIFICACION")[["ABONOS (CLP)", "CARGOS (CLP)"]].sum().reset_index()
+
+# ======================================
+# COMPARATIVO: CARGA
+# ======================================
+def fuente_real(directorio: str = CARTOLAS_DIR, cartola: str = CARTOLA_PATH) -> Tuple[str, Optional[str]]:
+    """(ruta, versión del store): el store incremental si hay directorio de cartolas, si no la cartola única.
+
+    Si otra sesión o el precalentado está ingiriendo, espera a que termine (el
+    store a medio escribir no se lee).
+    """
+    if not os.path.isdir(directorio):
+        return cartola, None
+    with _lock_store:
+        return directorio, actualizar_store(directorio)
+
+
+@medido()
+def cargar_real(path: str) -> pd.DataFrame:
+    """Movimientos reales con columna MES (inicio de mes)."""
+    df = cargar_movimientos() if os.path.isdir(path) else cargar_cartola(path)
+    df["MES"] = df["FECHA"].dt.to_period("M").dt.to_timestamp()
+    return df
+
+
+@medido()
+def cargar_proyeccion(path: str = PROYECCION_PATH) -> pd.DataFrame:
+    """Proyección (CLASIFICACION × meses en columnas) en formato largo: CLASIFICACION, FECHA, MONTO, MES."""
+    df = pd.read_excel(path)
+    df.dropna(subset=["CLASIFICACION"], inplace=True)
+    df = df.melt(id_vars="CLASIFICACION", var_name="FECHA", value_name="MONTO")
+    df["FECHA"] = pd.to_datetime(df["FECHA"], errors="coerce")
+    df["MES"] = df["FECHA"].dt.to_period("M").dt.to_timestamp()
+    df["CLASIFICACION"] = normalizar_serie(df["CLASIFICACION"].astype(str))
+    return df
+
+
+@medido()
+def cargar_comparativo(path: str, proyeccion: pd.DataFrame,
+                       real: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(cruce real vs proyección, totales mensuales). Con store se usa su cubo precalculado."""
+    if os.path.isdir(path):
+        cubo = cargar_cubo()
+    else:
+        cubo = construir_cubo(cargar_real(path) if real is None else real)
+    return cruzar_con_proyeccion(cubo, proyeccion), totales_mensuales(cubo)
+
+
+def _fecha_archivo(path: str) -> Optional[float]:
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def comparativo_compartido(directorio: str = CARTOLAS_DIR,
+                           cartola: str = CARTOLA_PATH,
+                           path_proj: str = PROYECCION_PATH,
+                           forzar: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(movimientos reales, cruce con la proyección, totales mensuales), compartidos entre sesiones.
+
+    Se rearma cuando cambia la versión del store (o la cartola) o la
+    proyección; la versión anterior se descarta. Mientras otro ingiere el
+    store se entrega el último comparativo armado; si no hay, se espera.
+    """
+    if not forzar and os.path.isdir(directorio) and _lock_store.locked() and directorio in _ultimas:
+        valor = TENANTS.consultar((CLAVE_CACHE, "comparativo", *_ultimas[directorio]))
+        if valor is not None:
+            return valor
+
+    path, version = fuente_real(directorio, cartola)
+    clave = (path, version or _fecha_archivo(path), path_proj, _fecha_archivo(path_proj))
+
+    def _cargar():
+        real = cargar_real(path)
+        return (real, *cargar_comparativo(path, cargar_proyeccion(path_proj), real))
+
+    valor, hit = por_tenant(CLAVE_CACHE, "comparativo", _cargar, *clave, forzar=forzar)
+    if not hit:
+        TENANTS.invalidar(lambda c: c[:2] == (CLAVE_CACHE, "comparativo") and c[2:] != clave)
+    _ultimas[directorio] = clave
+    return valor
+
+# ======================================
+# COMPARATIVO: RESÚMENES
+# ======================================
+def validar_clasificacion(df: pd.DataFrame, fecha_limite) -> dict:
+    """Clasificados / no clasificados hasta fecha_limite; no_clasificados trae las filas."""
+    evaluados = df[df["FECHA"] <= pd.to_datetime(fecha_limite)]
+    no_clasificados = evaluados[evaluados["CLASIFICACION"] == NO_CLASIFICADO]
+    total = len(evaluados)
+    return {
+        "total": total,
+        "clasificados": total - len(no_clasificados),
+        "no_clasificados": no_clasificados,
+        "pct_clasificado": (total - len(no_clasificados)) / total * 100 if total else 0.0,
+    }
+
+
+@medido()
+def resumen_mensual(vista: pd.DataFrame, fecha_max: pd.Timestamp) -> pd.DataFrame:
+    """MONTO / REAL_NETO / DIFERENCIA por MES con semáforo clásico y ajustado por avance del mes."""
+    df = vista.groupby("MES")[["MONTO", "REAL_NETO", "DIFERENCIA"]].sum().reset_index()
+    df["EVALUACION"] = evaluar_semaforo(df["DIFERENCIA"], df["MONTO"])
+    df["AVANCE"] = calcular_avance(df["MES"], fecha_max)
+    df["MONTO_AJUSTADO"] = df["MONTO"] * df["AVANCE"]
+    df["DIFERENCIA_AJUSTADA"] = df["REAL_NETO"] - df["MONTO_AJUSTADO"]
+    df["EVALUACION_AJUSTADA"] = evaluar_semaforo(
+        df["DIFERENCIA_AJUSTADA"], df["MONTO_AJUSTADO"], sin_base="🔘 Sin Avance"
+    )
+    return df
+
+
+def resumen_por_clasificacion(vista: pd.DataFrame) -> pd.DataFrame:
+    """MONTO / REAL_NETO / DIFERENCIA por CLASIFICACION, de mayor a menor MONTO."""
+    df = vista.groupby("CLASIFICACION")[["MONTO", "REAL_NETO", "DIFERENCIA"]].sum().reset_index()
+    return df.sort_values("MONTO", ascending=False)
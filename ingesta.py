@@ -0,0 +1,276 @@
+# ingesta.py — Lectura de cartolas con caché columnar en disco
+#
+# La primera vez que se ve un workbook de cartola se parsea con openpyxl, se
+# normalizan columnas, se clasifica y se guarda como Feather (Arrow IPC sin
+# compresión) en CACHE_DIR. La clave es hash del contenido + versión del
+# ruleset, así que cambiar la cartola o las reglas invalida la copia. Las
+# cargas siguientes leen el archivo con memory-map.
+#
+# Para varios meses, actualizar_store() recorre un directorio de cartolas,
+# detecta por manifest (mtime/tamaño/hash) qué archivos son nuevos o cambiaron,
+# deduplica movimientos repetidos entre cartolas y deja un store particionado
+# por mes, junto con el cubo CLASIFICACION × MES ya agregado. Uso:
+#   python ingesta.py [directorio_cartolas]
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from agregados import COLUMNAS_CUBO, construir_cubo
+from clasificador import Clasificador, cargar_clasificador, normalizar_serie
+from instrumentacion import medido
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # sin pyarrow: se parsea siempre, sin caché
+    feather = None
+
+CACHE_DIR = ".cache_cartolas"
+CARTOLAS_DIR = "cartolas"
+STORE_DIR = os.path.join(CACHE_DIR, "movimientos")
+
+# un mismo movimiento puede venir en dos cartolas que se traslapan
+CLAVE_MOVIMIENTO = ["FECHA", "DESCRIPCION", "CARGOS (CLP)", "ABONOS (CLP)", "SALDO (CLP)"]
+
+# ======================================
+# PARSEO
+# ======================================
+def hash_archivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def normalizar_cartola(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas en mayúsculas, DESCRIPCION como texto, COMENTARIO normalizado y FECHA como fecha."""
+    df.columns = df.columns.str.strip().str.upper()
+    if "DESCRIPCIÓN" in df.columns:
+        df.rename(columns={"DESCRIPCIÓN": "DESCRIPCION"}, inplace=True)
+
+    df["DESCRIPCION"] = df["DESCRIPCION"].astype(str)
+    df["COMENTARIO"] = normalizar_serie(df["DESCRIPCION"])
+    df["FECHA"] = pd.to_datetime(df["FECHA"], dayfirst=True, errors="coerce")
+    return df.loc[:, ~df.columns.str.contains("^UNNAMED")]
+
+
+def parsear_cartola(path: str, clasificador: Clasificador) -> pd.DataFrame:
+    """Lee el xlsx de cartola, normaliza columnas y agrega COMENTARIO y CLASIFICACION."""
+    df = normalizar_cartola(pd.read_excel(path))
+    df["CLASIFICACION"] = clasificador.clasificar(df["COMENTARIO"], df["ABONOS (CLP)"])
+    return df.reset_index(drop=True)
+
+# ======================================
+# CACHÉ
+# ======================================
+def _prefijo_cache(path: str) -> str:
+    # nombre + hash de la ruta absoluta: dos cartolas con el mismo nombre en
+    # carpetas distintas no comparten (ni se borran) sus cachés
+    base = os.path.splitext(os.path.basename(path))[0]
+    ruta = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:10]
+    return f"{base}_{ruta}__"
+
+
+def _ruta_cache(path: str, clave: str) -> str:
+    return os.path.join(CACHE_DIR, f"{_prefijo_cache(path)}{clave}.feather")
+
+
+def _limpiar_versiones(path: str, vigente: str) -> None:
+    prefijo = _prefijo_cache(path)
+    for nombre in os.listdir(CACHE_DIR):
+        ruta = os.path.join(CACHE_DIR, nombre)
+        if nombre.startswith(prefijo) and ruta != vigente:
+            os.remove(ruta)
+
+
+@medido()
+def cargar_cartola(path: str, clasificador: Optional[Clasificador] = None) -> pd.DataFrame:
+    """Cartola parseada y clasificada; usa la copia Feather si existe para este contenido y ruleset."""
+    clasificador = clasificador or cargar_clasificador()
+    if feather is None:
+        return parsear_cartola(path, clasificador)
+
+    clave = f"{hash_archivo(path)[:16]}_{clasificador.version}"
+    ruta = _ruta_cache(path, clave)
+    if os.path.exists(ruta):
+        return feather.read_table(ruta, memory_map=True).to_pandas()
+
+    df = parsear_cartola(path, clasificador)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{ruta}.tmp"
+        feather.write_feather(df, tmp, compression="uncompressed")
+        os.replace(tmp, ruta)
+        _limpiar_versiones(path, ruta)
+    except Exception:
+        # la caché es solo una optimización: si no se puede escribir, seguimos
+        pass
+    return df
+
+# ======================================
+# STORE MULTI-MES
+# ======================================
+def _leer_manifest(store: str) -> dict:
+    ruta = os.path.join(store, "manifest.json")
+    if not os.path.exists(ruta):
+        return {"version": None, "archivos": {}}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _escribir_manifest(store: str, manifest: dict) -> None:
+    ruta = os.path.join(store, "manifest.json")
+    with open(f"{ruta}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(f"{ruta}.tmp", ruta)
+
+
+def _version_manifest(manifest: dict) -> str:
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def _particion(mes: pd.Series) -> pd.Series:
+    return mes.dt.strftime("%Y-%m").fillna("sin_fecha")
+
+
+def _deduplicar(df: pd.DataFrame) -> pd.DataFrame:
+    clave = [c for c in CLAVE_MOVIMIENTO if c in df.columns]
+    return df.drop_duplicates(subset=clave, keep="first")
+
+
+def _escribir_particiones(df: pd.DataFrame, store: str, reemplazar: bool) -> None:
+    for nombre, parte in df.groupby(_particion(df["FECHA"]), sort=True):
+        ruta = os.path.join(store, f"{nombre}.feather")
+        if not reemplazar and os.path.exists(ruta):
+            parte = pd.concat([feather.read_feather(ruta), parte], ignore_index=True)
+        parte = _deduplicar(parte).sort_values("FECHA", kind="stable").reset_index(drop=True)
+        feather.write_feather(parte, f"{ruta}.tmp", compression="uncompressed")
+        os.replace(f"{ruta}.tmp", ruta)
+
+
+def listar_cartolas(directorio: str) -> List[str]:
+    # ~$ son archivos de bloqueo de Excel
+    return sorted(
+        p for p in glob.glob(os.path.join(directorio, "*.xlsx"))
+        if not os.path.basename(p).startswith("~$")
+    )
+
+
+def actualizar_store(directorio: str = CARTOLAS_DIR,
+                     store: str = STORE_DIR,
+                     clasificador: Optional[Clasificador] = None) -> str:
+    """Ingiere solo las cartolas nuevas o modificadas. Devuelve la versión del store."""
+    if feather is None:
+        raise RuntimeError("El store de movimientos requiere pyarrow.")
+    clasificador = clasificador or cargar_clasificador()
+    os.makedirs(store, exist_ok=True)
+    manifest = _leer_manifest(store)
+    previos: Dict[str, dict] = manifest["archivos"]
+
+    actuales: Dict[str, dict] = {}
+    nuevos, modificados = [], []
+    for path in listar_cartolas(directorio):
+        nombre = os.path.basename(path)
+        st_ = os.stat(path)
+        info = {"mtime_ns": st_.st_mtime_ns, "size": st_.st_size}
+        previo = previos.get(nombre)
+        if previo and all(previo.get(k) == v for k, v in info.items()):
+            actuales[nombre] = previo
+            continue
+        info["hash"] = hash_archivo(path)
+        if previo and previo.get("hash") == info["hash"]:
+            actuales[nombre] = {**previo, **info}  # solo cambió el mtime
+            continue
+        (modificados if previo else nuevos).append(path)
+        actuales[nombre] = info
+
+    # archivos que cambiaron o desaparecieron, o reglas nuevas: se reconstruye
+    # todo (las cartolas ya parseadas salen de la caché Feather)
+    reconstruir = bool(
+        modificados
+        or set(previos) - set(actuales)
+        or manifest.get("version") != clasificador.version
+    )
+    pendientes = listar_cartolas(directorio) if reconstruir else nuevos
+
+    if reconstruir:
+        for viejo in glob.glob(os.path.join(store, "*.feather")):
+            os.remove(viejo)
+    if pendientes:
+        partes = []
+        for path in pendientes:
+            df = cargar_cartola(path, clasificador)
+            df["ARCHIVO"] = os.path.basename(path)
+            actuales[os.path.basename(path)]["filas"] = len(df)
+            partes.append(df)
+        _escribir_particiones(pd.concat(partes, ignore_index=True), store, reemplazar=reconstruir)
+
+    ruta_cubo = os.path.join(store, "cubo.feather")
+    if pendientes or reconstruir or not os.path.exists(ruta_cubo):
+        cubo = construir_cubo(cargar_movimientos(store))
+        feather.write_feather(cubo, f"{ruta_cubo}.tmp", compression="uncompressed")
+        os.replace(f"{ruta_cubo}.tmp", ruta_cubo)
+
+    nuevo = {"version": clasificador.version, "archivos": actuales}
+    if actuales != previos or manifest.get("version") != clasificador.version:
+        _escribir_manifest(store, nuevo)
+    return _version_manifest(nuevo)
+
+
+def cargar_movimientos(store: str = STORE_DIR,
+                       desde: Optional[str] = None,
+                       hasta: Optional[str] = None) -> pd.DataFrame:
+    """Movimientos del store; desde/hasta ('YYYY-MM') limitan las particiones leídas."""
+    rutas = sorted(glob.glob(os.path.join(store, "*.feather")))
+    partes = []
+    for ruta in rutas:
+        mes = os.path.splitext(os.path.basename(ruta))[0]
+        if mes == "cubo":
+            continue
+        if (desde or hasta) and mes == "sin_fecha":
+            continue
+        if (desde and mes < desde) or (hasta and mes > hasta):
+            continue
+        partes.append(feather.read_table(ruta, memory_map=True).to_pandas())
+    if not partes:
+        return _movimientos_vacios()
+    return pd.concat(partes, ignore_index=True)
+
+
+def _movimientos_vacios() -> pd.DataFrame:
+    # con los dtypes de una cartola parseada: FECHA admite .dt y los montos suman 0
+    return pd.DataFrame({
+        "FECHA": pd.Series(dtype="datetime64[ns]"),
+        "DESCRIPCION": pd.Series(dtype="str"),
+        "CARGOS (CLP)": pd.Series(dtype="float64"),
+        "ABONOS (CLP)": pd.Series(dtype="float64"),
+        "SALDO (CLP)": pd.Series(dtype="float64"),
+        "COMENTARIO": pd.Series(dtype="str"),
+        "CLASIFICACION": pd.Series(dtype="str"),
+        "ARCHIVO": pd.Series(dtype="str"),
+    })
+
+
+def cargar_cubo(store: str = STORE_DIR) -> pd.DataFrame:
+    """Cubo CLASIFICACION × MES precalculado por actualizar_store()."""
+    ruta = os.path.join(store, "cubo.feather")
+    if not os.path.exists(ruta):
+        return pd.DataFrame(columns=COLUMNAS_CUBO)
+    return feather.read_table(ruta, memory_map=True).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingiere cartolas mensuales al store de movimientos.")
+    parser.add_argument("directorio", nargs="?", default=CARTOLAS_DIR)
+    parser.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args()
+
+    version = actualizar_store(args.directorio, args.store)
+    movimientos = cargar_movimientos(args.store)
+    print(f"Store {args.store} (versión {version}): {len(movimientos)} movimientos")
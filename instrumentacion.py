@@ -0,0 +1,232 @@
+# instrumentacion.py — Tramos de tiempo y memoria por corrida
+#
+# Una corrida agrupa los tramos de un rerun de un dashboard. Cada tramo
+# (context manager `tramo` o decorador `medido`) registra milisegundos, filas
+# del resultado y delta de RSS, y al cerrarse emite una línea JSON por el
+# logger "instrumentacion" (stderr, o el archivo de INSTRUMENTACION_LOG).
+# Los logs de muchas sesiones se agregan con:
+#   python instrumentacion.py instrumentacion.jsonl
+# Sin corrida activa los tramos no miden nada: el núcleo se puede decorar sin
+# costo para los batch.
+
+import argparse
+import contextvars
+import functools
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+import pandas as pd
+
+LOG_ENV = "INSTRUMENTACION_LOG"
+
+logger = logging.getLogger("instrumentacion")
+
+_corrida: contextvars.ContextVar[Optional["Corrida"]] = contextvars.ContextVar("corrida", default=None)
+_padre: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("padre_tramo", default=None)
+
+try:
+    _PAGINA = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGINA = None
+
+# ======================================
+# MEDIDAS
+# ======================================
+def rss_mb() -> Optional[float]:
+    """RSS actual del proceso en MB (Linux, /proc); None donde no se puede leer."""
+    if _PAGINA is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGINA / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def contar_filas(valor) -> Optional[int]:
+    """Filas de un resultado: DataFrame/Series, objetos con len() o tuplas/dicts de ellos."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return len(valor)
+    if isinstance(valor, (tuple, list, dict)):
+        partes = [contar_filas(v) for v in (valor.values() if isinstance(valor, dict) else valor)]
+        partes = [n for n in partes if n is not None]
+        return sum(partes) if partes else None
+    if isinstance(valor, (str, bytes)) or not hasattr(valor, "__len__"):
+        return None
+    return len(valor)
+
+# ======================================
+# LOG JSON
+# ======================================
+def configurar_log(path: Optional[str] = None) -> None:
+    """Una línea JSON por tramo: a path (o INSTRUMENTACION_LOG) si se indica, si no a stderr."""
+    if logger.handlers:
+        return
+    path = path or os.environ.get(LOG_ENV)
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# ======================================
+# CORRIDAS Y TRAMOS
+# ======================================
+class Corrida:
+    """Tramos medidos durante un rerun (app + contexto, p.ej. el tenant)."""
+
+    def __init__(self, app: str, **contexto):
+        self.id = uuid.uuid4().hex[:12]
+        self.app = app
+        self.contexto = contexto
+        self.inicio = time.perf_counter()
+        self.tramos: List[dict] = []
+
+    def registrar(self, registro: dict) -> None:
+        self.tramos.append(registro)
+        logger.info(json.dumps(
+            {"ts": round(time.time(), 3), "corrida": self.id, "app": self.app, **self.contexto, **registro},
+            default=str, ensure_ascii=False,
+        ))
+
+    def segundos(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def tabla(self) -> pd.DataFrame:
+        """Tramos en orden de cierre (los anidados antes que su padre)."""
+        columnas = ["tramo", "padre", "ms", "filas", "rss_delta_mb", "rss_mb"]
+        df = pd.DataFrame(self.tramos)
+        return df.reindex(columns=columnas + [c for c in df.columns if c not in columnas])
+
+
+def iniciar_corrida(app: str, **contexto) -> Corrida:
+    """Abre una corrida en el contexto actual (un script de Streamlit no tiene un with que la cierre)."""
+    configurar_log()
+    corrida_nueva = Corrida(app, **contexto)
+    _corrida.set(corrida_nueva)
+    _padre.set(None)
+    return corrida_nueva
+
+
+@contextmanager
+def corrida(app: str, **contexto) -> Iterator[Corrida]:
+    """Corrida acotada a un bloque."""
+    configurar_log()
+    actual = Corrida(app, **contexto)
+    token = _corrida.set(actual)
+    try:
+        yield actual
+    finally:
+        _corrida.reset(token)
+
+
+def corrida_actual() -> Optional[Corrida]:
+    return _corrida.get()
+
+
+@contextmanager
+def tramo(nombre: str, **atributos) -> Iterator[dict]:
+    """Mide el bloque. El dict entregado admite atributos extra (p.ej. registro["filas"] = n)."""
+    registro = {"tramo": nombre, **atributos}
+    actual = _corrida.get()
+    if actual is None:
+        yield registro
+        return
+    registro["padre"] = _padre.get()
+    token = _padre.set(nombre)
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield registro
+    except BaseException as e:
+        registro["error"] = type(e).__name__
+        raise
+    finally:
+        registro["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        _padre.reset(token)
+        rss1 = rss_mb()
+        if rss1 is not None:
+            registro["rss_mb"] = round(rss1, 1)
+            registro["rss_delta_mb"] = round(rss1 - rss0, 1)
+        actual.registrar(registro)
+
+
+def medido(nombre: Optional[str] = None) -> Callable:
+    """Decorador: un tramo por llamada, con las filas del resultado."""
+    def decorador(funcion: Callable) -> Callable:
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envuelta(*args, **kwargs):
+            if _corrida.get() is None:
+                return funcion(*args, **kwargs)
+            with tramo(etiqueta) as registro:
+                valor = funcion(*args, **kwargs)
+                registro["filas"] = contar_filas(valor)
+                return valor
+        return envuelta
+    return decorador
+
+
+def en_contexto(funcion: Callable) -> Callable:
+    """La función corre en una copia del contexto actual (para pasarla a un hilo sin perder la corrida)."""
+    contexto = contextvars.copy_context()
+    return functools.partial(contexto.run, funcion)
+
+# ======================================
+# AGREGACIÓN ENTRE SESIONES
+# ======================================
+def leer_log(path: str) -> pd.DataFrame:
+    """Líneas JSON del log (las que no parsean se ignoran)."""
+    registros = []
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registros.append(json.loads(linea))
+            except ValueError:
+                continue
+    return pd.DataFrame(registros)
+
+
+def resumir(registros: pd.DataFrame, por: Optional[List[str]] = None) -> pd.DataFrame:
+    """Por app y tramo: llamadas, ms p50/p95/máx, filas medias y delta de RSS medio."""
+    por = por or ["app", "tramo"]
+    for col in ["ms", "filas", "rss_delta_mb"]:
+        if col not in registros.columns:
+            registros[col] = float("nan")
+    g = registros.groupby(por)
+    out = pd.DataFrame({
+        "llamadas": g.size(),
+        "ms_p50": g["ms"].median(),
+        "ms_p95": g["ms"].quantile(0.95),
+        "ms_max": g["ms"].max(),
+        "ms_total": g["ms"].sum(),
+        "filas_media": g["filas"].mean(),
+        "rss_delta_mb_media": g["rss_delta_mb"].mean(),
+    })
+    return out.round(2).sort_values("ms_total", ascending=False).reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega los logs JSON de instrumentación por tramo.")
+    parser.add_argument("logs", nargs="+", help="Archivos .jsonl (INSTRUMENTACION_LOG)")
+    parser.add_argument("--por", default="app,tramo", help="Columnas de agrupación, separadas por coma")
+    parser.add_argument("--tenant", help="Solo este tenant")
+    args = parser.parse_args()
+
+    registros = pd.concat([leer_log(p) for p in args.logs], ignore_index=True)
+    if args.tenant and "tenant" in registros.columns:
+        registros = registros[registros["tenant"] == args.tenant]
+    if registros.empty:
+        print("Sin registros.")
+        return
+    print(resumir(registros, args.por.split(",")).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# modelo_ventas.py — Representación compacta de las ventas normalizadas
+#
+# En vez de un DataFrame con sku como strings de Python y qty float64, las
+# ventas se guardan como arrays numpy ordenados por día:
+#   codigos int32  -> posición del SKU en skus (categorías ordenadas)
+#   dias    int32  -> días desde 1970-01-01 (lo mismo que date32 de Arrow)
+#   qty     float32
+# ~12 bytes por fila más un string por SKU distinto. Al estar ordenadas por
+# día, una ventana de fechas es un corte de los arrays (vistas, sin copia).
+# desde_partes arma el modelo bloque a bloque (la reportería lo hace desde la
+# copia local leída por record batches), sin tener nunca la pestaña completa
+# en memoria.
+
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+TAB_VENTAS = "ventas_raw"
+COLUMNAS_VENTAS = {"fecha", "sku", "cantidad", "qty"}
+
+
+def normalizar_ventas(df: pd.DataFrame) -> pd.DataFrame:
+    """Pestaña ventas_raw -> (fecha, sku categórico, qty float64)."""
+    cols = {c.lower(): c for c in df.columns}
+    out = pd.DataFrame()
+    out["fecha"] = pd.to_datetime(df[cols.get("fecha")], errors="coerce")
+    out["sku"]   = df[cols.get("sku")].astype(str).str.strip().str.upper()
+    qty_col = cols.get("cantidad") or cols.get("qty")
+    out["qty"]   = pd.to_numeric(df[qty_col], errors="coerce").fillna(0).astype("float64")
+    out = out.dropna(subset=["fecha", "sku"])
+    out["sku"] = out["sku"].astype("category")
+    return out.reset_index(drop=True)
+
+
+def es_columna_ventas(col) -> bool:
+    """Proyección de ventas_raw: solo las columnas que usa normalizar_ventas."""
+    return str(col).lower() in COLUMNAS_VENTAS
+
+
+def dia(fecha) -> int:
+    """Fecha -> días desde 1970-01-01."""
+    return int(pd.Timestamp(fecha).to_datetime64().astype("datetime64[D]").astype(np.int64))
+
+
+class VentasCompactas:
+    """Ventas (fecha, sku, qty) en arrays compactos ordenados por día."""
+
+    __slots__ = ("skus", "codigos", "dias", "qty")
+
+    def __init__(self, skus: pd.Index, codigos: np.ndarray, dias: np.ndarray, qty: np.ndarray):
+        self.skus = skus
+        self.codigos = codigos
+        self.dias = dias
+        self.qty = qty
+
+    @classmethod
+    def desde_frame(cls, ventas: pd.DataFrame) -> "VentasCompactas":
+        """Desde un frame normalizado (fecha, sku, qty)."""
+        sku = ventas["sku"]
+        if not isinstance(sku.dtype, pd.CategoricalDtype):
+            sku = sku.astype(str).astype("category")
+        codigos = sku.cat.codes.to_numpy().astype(np.int32)
+        dias = ventas["fecha"].to_numpy().astype("datetime64[D]").astype(np.int64)
+        validos = (codigos >= 0) & ventas["fecha"].notna().to_numpy()
+        orden = np.argsort(dias[validos], kind="stable")
+        return cls(
+            pd.Index(sku.cat.categories.astype(str)),
+            codigos[validos][orden],
+            dias[validos][orden].astype(np.int32),
+            ventas["qty"].to_numpy(dtype=np.float32)[validos][orden],
+        )
+
+    @classmethod
+    def desde_tab(cls, df: pd.DataFrame) -> "VentasCompactas":
+        """Desde la pestaña cruda ventas_raw."""
+        return cls.desde_frame(normalizar_ventas(df))
+
+    @classmethod
+    def desde_partes(cls, partes: Iterable[pd.DataFrame]) -> "VentasCompactas":
+        """Desde bloques crudos de ventas_raw: se normaliza y compacta cada bloque."""
+        posiciones: Dict[str, int] = {}
+        codigos, dias, qty = [], [], []
+        for parte in partes:
+            v = normalizar_ventas(parte)
+            if v.empty:
+                continue
+            categorias = v["sku"].cat.categories.astype(str)
+            mapa = np.array([posiciones.setdefault(s, len(posiciones)) for s in categorias], dtype=np.int32)
+            codigos.append(mapa[v["sku"].cat.codes.to_numpy()])
+            dias.append(v["fecha"].to_numpy().astype("datetime64[D]").astype(np.int64).astype(np.int32))
+            qty.append(v["qty"].to_numpy(dtype=np.float32))
+        if not codigos:
+            vacio = np.empty(0, dtype=np.int32)
+            return cls(pd.Index([], dtype=object), vacio, vacio, np.empty(0, dtype=np.float32))
+
+        # categorías en orden alfabético, como las de un Categorical
+        skus = pd.Index(list(posiciones))
+        orden_cat = skus.argsort()
+        recodificar = np.empty(len(skus), dtype=np.int32)
+        recodificar[orden_cat] = np.arange(len(skus), dtype=np.int32)
+        codigos = recodificar[np.concatenate(codigos)]
+        dias = np.concatenate(dias)
+        qty = np.concatenate(qty)
+        orden = np.argsort(dias, kind="stable")
+        return cls(skus[orden_cat], codigos[orden], dias[orden], qty[orden])
+
+    def __len__(self) -> int:
+        return len(self.dias)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.codigos.nbytes + self.dias.nbytes + self.qty.nbytes
+
+    def ventana(self, desde=None, hasta=None) -> "VentasCompactas":
+        """Filas con desde <= día <= hasta (por día calendario), como vistas."""
+        lo = 0 if desde is None else np.searchsorted(self.dias, dia(desde), side="left")
+        hi = len(self) if hasta is None else np.searchsorted(self.dias, dia(hasta), side="right")
+        hi = max(hi, lo)
+        return VentasCompactas(self.skus, self.codigos[lo:hi], self.dias[lo:hi], self.qty[lo:hi])
+
+    def del_sku(self, sku: str) -> "VentasCompactas":
+        pos = self.skus.get_indexer([sku])[0]
+        mascara = self.codigos == pos
+        return VentasCompactas(self.skus, self.codigos[mascara], self.dias[mascara], self.qty[mascara])
+
+    def fechas(self) -> np.ndarray:
+        return self.dias.astype("datetime64[D]")
+
+    def a_frame(self, sku_categorico: bool = True) -> pd.DataFrame:
+        """Vuelta a DataFrame (fecha, sku, qty) para quien lo necesite."""
+        sku = pd.Categorical.from_codes(self.codigos, categories=self.skus)
+        return pd.DataFrame({
+            "fecha": pd.to_datetime(self.fechas()),
+            "sku": sku if sku_categorico else np.asarray(sku, dtype=object),
+            "qty": self.qty,
+        })
+
+
+def compactar(ventas) -> VentasCompactas:
+    """VentasCompactas desde un frame normalizado o una instancia ya compacta."""
+    if isinstance(ventas, VentasCompactas):
+        return ventas
+    return VentasCompactas.desde_frame(ventas)
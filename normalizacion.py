@@ -0,0 +1,263 @@
+# normalizacion.py — Normalizadores de las pestañas del predictor
+#
+# ventas_raw / stock_snapshot / config / inbound_po -> frames con las columnas
+# que espera predictor_core.forecast_all. Sin Streamlit: los usa la app del
+# predictor y el batch nocturno (prediccion_batch.py).
+#
+# Con sku=... los normalizadores solo materializan las filas de ese SKU
+# (se normaliza la columna sku, se filtra y recién ahí se convierte el resto).
+# IndiceSKU agrupa las filas de varios frames por SKU una sola vez para
+# seleccionar SKUs (o rangos de SKUs) sin volver a recorrer las columnas.
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from esquemas import EsNumerica, esquema
+from instrumentacion import medido
+
+
+def _sku_normalizado(df: pd.DataFrame, col: str, sku: Optional[str]):
+    """(df, skus normalizados), restringidos a un SKU si se pide."""
+    skus = df[col].astype(str).str.strip().str.upper()
+    if sku is None:
+        return df, skus
+    mascara = (skus == sku).to_numpy()
+    return df[mascara], skus[mascara]
+
+
+@medido()
+def normalize_ventas_sheet(df: pd.DataFrame, sku: Optional[str] = None) -> pd.DataFrame:
+    cols_lc = {c.lower(): c for c in df.columns}
+    fecha_col = cols_lc.get("fecha")
+    sku_col   = cols_lc.get("sku")
+    qty_col   = cols_lc.get("cantidad") or cols_lc.get("qty")
+    if not fecha_col or not sku_col or not qty_col:
+        raise ValueError("ventas_raw debe tener columnas 'fecha', 'sku' y 'cantidad'.")
+    df, skus = _sku_normalizado(df, sku_col, sku)
+    out = pd.DataFrame()
+    out["fecha"] = pd.to_datetime(df[fecha_col], errors="coerce")
+    out["sku"]   = skus
+    out["qty"]   = pd.to_numeric(df[qty_col], errors="coerce").fillna(0)
+    out = out.dropna(subset=["fecha", "sku"])
+    return out
+
+
+def _guess_sku_col(df: pd.DataFrame, es_numerica: EsNumerica) -> str:
+    prefer = ["sku", "SKU", "codigo", "producto", "Producto"]
+    for c in prefer:
+        if c in df.columns and not es_numerica(c):
+            return c
+    for c in df.columns:
+        if not es_numerica(c):
+            return c
+    return df.columns[0]
+
+
+def _guess_stock_col(df: pd.DataFrame, es_numerica: EsNumerica) -> str:
+    prefer = ["stock", "cantidad", "qty", "disponible", "on_hand"]
+    for c in prefer:
+        if c in df.columns and es_numerica(c):
+            return c
+    for c in df.columns:
+        if es_numerica(c):
+            return c
+    raise ValueError("No encontré columna numérica de stock.")
+
+
+@medido()
+def normalize_stock_sheet(df: pd.DataFrame,
+                          sku: Optional[str] = None,
+                          sheet_id: str = "",
+                          tab: str = "stock_snapshot") -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["sku", "stock"])
+    cols = esquema(df, sheet_id, tab, lambda es_numerica: {
+        "sku": _guess_sku_col(df, es_numerica),
+        "stock": _guess_stock_col(df, es_numerica),
+    })
+    sku_col, qty_col = cols["sku"], cols["stock"]
+    df, skus = _sku_normalizado(df, sku_col, sku)
+    out = pd.DataFrame()
+    out["sku"]   = skus
+    out["stock"] = pd.to_numeric(df[qty_col], errors="coerce").fillna(0)
+    return out
+
+
+@medido()
+def normalize_config_sheet(df: pd.DataFrame,
+                           ventas_n: pd.DataFrame,
+                           stock_n: pd.DataFrame,
+                           sku: Optional[str] = None) -> pd.DataFrame:
+    """
+    Devuelve SIEMPRE un dataframe por SKU.
+    Si la hoja viene en modo global (1 fila) replica los valores a todos los SKU
+    y también trae predictor_url / reporteria_url.
+    """
+    if df.empty:
+        skus = sorted(set(ventas_n["sku"]).union(set(stock_n["sku"])))
+        return pd.DataFrame(
+            {
+                "sku": skus,
+                "proveedor": "",
+                "lead_time_dias": 0,
+                "minimo_compra": 1,
+                "multiplo": 1,
+                "alias": None,
+                "activo": True,
+                "seguridad_dias": 0,
+                "predictor_url": None,
+                "reporteria_url": None,
+            }
+        )
+
+    df2 = df.copy()
+    df2.columns = [str(c).strip().lower() for c in df2.columns]
+
+    # ----- caso 1: por SKU -----
+    if "sku" in df2.columns:
+        rename_map = {
+            "min_lote": "minimo_compra",
+            "minimo_lote": "minimo_compra",
+            "multiplo_lote": "multiplo",
+        }
+        df2 = df2.rename(columns={k: v for k, v in rename_map.items() if k in df2.columns})
+
+        for c in ["lead_time_dias", "minimo_compra", "multiplo", "seguridad_dias"]:
+            if c in df2.columns:
+                df2[c] = pd.to_numeric(df2[c], errors="coerce").fillna(0)
+
+        df2["sku"] = df2["sku"].astype(str).str.strip().str.upper()
+
+        for c, default in [
+            ("proveedor", ""),
+            ("minimo_compra", 1),
+            ("multiplo", 1),
+            ("alias", None),
+            ("activo", True),
+            ("seguridad_dias", 0),
+            ("predictor_url", None),
+            ("reporteria_url", None),
+        ]:
+            if c not in df2.columns:
+                df2[c] = default
+
+        if sku is not None:
+            df2 = df2[df2["sku"] == sku]
+        return df2
+
+    # ----- caso 2: global -----
+    lead_time = int(pd.to_numeric(df2.get("lead_time_dias", pd.Series([0])).iloc[0], errors="coerce") or 0)
+    seg_dias  = int(pd.to_numeric(df2.get("seguridad_dias", pd.Series([0])).iloc[0], errors="coerce") or 0)
+    min_lote  = int(pd.to_numeric(df2.get("min_lote", pd.Series([1])).iloc[0], errors="coerce") or 1)
+
+    predictor_url  = df2.get("predictor_url",  pd.Series([None])).iloc[0]
+    reporteria_url = df2.get("reporteria_url", pd.Series([None])).iloc[0]
+
+    skus = sorted(set(ventas_n["sku"]).union(set(stock_n["sku"])))
+    cfg = pd.DataFrame(
+        {
+            "sku": skus,
+            "proveedor": "",
+            "lead_time_dias": lead_time,
+            "minimo_compra": min_lote,
+            "multiplo": 1,
+            "alias": None,
+            "activo": True,
+            "seguridad_dias": seg_dias,
+            "predictor_url": predictor_url,
+            "reporteria_url": reporteria_url,
+        }
+    )
+    return cfg
+
+
+@medido()
+def normalize_inbound_sheet(df: pd.DataFrame, sku: Optional[str] = None) -> pd.DataFrame:
+    """Versión robusta: si hay filas sin estado, no rompe."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["sku", "qty", "eta", "estado"])
+    cols = {c.lower(): c for c in df.columns}
+    sku_c = cols.get("sku")
+    qty_c = cols.get("qty") or cols.get("cantidad")
+    eta_c = cols.get("eta") or cols.get("fecha")
+    est_c = cols.get("estado") or cols.get("status")
+    if not sku_c or not qty_c:
+        return pd.DataFrame(columns=["sku", "qty", "eta", "estado"])
+    df, skus = _sku_normalizado(df, sku_c, sku)
+    out = pd.DataFrame()
+    out["sku"] = skus
+    out["qty"] = pd.to_numeric(df[qty_c], errors="coerce").fillna(0)
+    out["eta"] = pd.to_datetime(df[eta_c], errors="coerce") if eta_c else pd.NaT
+    if est_c:
+        out["estado"] = df[est_c].astype(str).str.upper().str.strip()
+    else:
+        out["estado"] = "ABIERTA"
+    out = out[out["qty"] > 0]
+    return out
+
+
+@medido()
+def prepare_inbound_for_core(inbound: pd.DataFrame) -> pd.DataFrame:
+    if inbound is None or inbound.empty:
+        return pd.DataFrame(columns=["sku", "qty", "eta", "estado"])
+    df = inbound.copy()
+    df = df[pd.to_numeric(df["qty"], errors="coerce").fillna(0) > 0]
+    today = pd.Timestamp.today().normalize()
+    df["eta"] = pd.to_datetime(df["eta"], errors="coerce")
+    df.loc[df["eta"].isna(), "eta"] = today
+    df.loc[df["eta"] < today, "eta"] = today
+    df_grp = df.groupby("sku", as_index=False)["qty"].sum()
+    df_grp["eta"] = today
+    df_grp["estado"] = "PENDIENTE"
+    return df_grp
+
+
+# ======================================
+# ÍNDICE DE SKU
+# ======================================
+class IndiceSKU:
+    """Índice categórico de SKU compartido por varios frames normalizados.
+
+    Por frame guarda las filas ordenadas por código de SKU y el offset de cada
+    grupo; seleccionar SKUs es cortar ese orden (las filas salen en su orden
+    original).
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+        skus = set()
+        for df in frames.values():
+            if df is not None and "sku" in df.columns:
+                skus.update(df["sku"].astype(str).unique())
+        self.skus = pd.Index(sorted(skus))
+        self._orden: Dict[str, np.ndarray] = {}
+        self._offsets: Dict[str, np.ndarray] = {}
+        for nombre, df in frames.items():
+            if df is None or "sku" not in df.columns:
+                continue
+            codigos = self.skus.get_indexer(df["sku"].astype(str))
+            orden = np.argsort(codigos, kind="stable")
+            self._orden[nombre] = orden
+            self._offsets[nombre] = np.searchsorted(codigos[orden], np.arange(len(self.skus) + 1))
+
+    def _cortar(self, nombre: str, tramos) -> pd.DataFrame:
+        df = self.frames[nombre]
+        if nombre not in self._orden:
+            return df
+        orden, offsets = self._orden[nombre], self._offsets[nombre]
+        partes = [orden[offsets[i]:offsets[j]] for i, j in tramos]
+        pos = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.intp)
+        return df.iloc[pos]
+
+    def seleccionar(self, skus: Iterable[str]) -> Dict[str, pd.DataFrame]:
+        """Filas de los SKU pedidos (comparación exacta, SKU ya normalizado) en cada frame."""
+        codigos = self.skus.get_indexer(list(skus))
+        tramos = [(c, c + 1) for c in np.unique(codigos[codigos >= 0])]
+        return {nombre: self._cortar(nombre, tramos) for nombre in self.frames}
+
+    def rango(self, inicio: int, fin: int) -> Dict[str, pd.DataFrame]:
+        """Filas de los SKU skus[inicio:fin] en cada frame."""
+        fin = min(fin, len(self.skus))
+        return {nombre: self._cortar(nombre, [(inicio, fin)]) for nombre in self.frames}
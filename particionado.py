@@ -0,0 +1,56 @@
+# particionado.py — forecast_all repartido por SKU entre procesos
+#
+# Los SKU se ordenan y se cortan en shards de tam_shard; cada shard lleva sus
+# filas de ventas, stock, config e inbound y se pronostica en un proceso
+# aparte. det / res / prop se concatenan en el orden de los shards, así que
+# el resultado no depende de qué proceso termina primero.
+# Supone que forecast_all trata cada SKU de forma independiente.
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from normalizacion import IndiceSKU
+
+TAM_SHARD = 500
+
+
+def particionar(entradas: Dict[str, pd.DataFrame], tam_shard: int = TAM_SHARD) -> List[Dict[str, pd.DataFrame]]:
+    """Entradas de forecast_all cortadas en shards alineados por SKU."""
+    indice = IndiceSKU(entradas)
+    return [indice.rango(i, i + tam_shard) for i in range(0, len(indice.skus), tam_shard)]
+
+
+def _forecast_shard(args: Tuple[Dict[str, pd.DataFrame], str, Optional[int]]):
+    from predictor_core import forecast_all
+
+    entradas, freq, horizon = args
+    return forecast_all(**entradas, freq=freq, horizon_override=horizon)
+
+
+def forecast_particionado(ventas: pd.DataFrame,
+                          stock: pd.DataFrame,
+                          config: pd.DataFrame,
+                          inbound: pd.DataFrame,
+                          freq: str = "M",
+                          horizon_override: Optional[int] = None,
+                          tam_shard: int = TAM_SHARD,
+                          max_workers: Optional[int] = None):
+    """Mismo contrato que forecast_all -> (det, res, prop), repartido en procesos."""
+    entradas = {"ventas": ventas, "stock": stock, "config": config, "inbound": inbound}
+    shards = particionar(entradas, max(1, int(tam_shard)))
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(shards)))
+    if len(shards) <= 1 or max_workers == 1:
+        resultados = [_forecast_shard((s, freq, horizon_override)) for s in shards or [entradas]]
+    else:
+        # spawn: hacer fork de un servidor con hilos (Streamlit) no es seguro
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as pool:
+            resultados = list(pool.map(_forecast_shard, [(s, freq, horizon_override) for s in shards]))
+
+    det, res, prop = (
+        pd.concat([r[i] for r in resultados], ignore_index=True) for i in range(3)
+    )
+    return det, res, prop
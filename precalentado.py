@@ -0,0 +1,291 @@
+# precalentado.py — Precalentado en segundo plano de los tenants activos
+#
+# Cada dashboard arranca (una vez por proceso) un hilo que cada CADENCIA_SEG
+# recorre los tenants activos de clientes_config, primero los consultados más
+# recientemente en la caché compartida, y deja listo lo que pide la página:
+#   - snapshots: baja las pestañas del tenant sin copia local o vencidas
+#   - predictor: pestañas crudas y normalizadas (sin filtro de SKU)
+#   - reporteria: rollup diario, stock y umbrales de cobertura
+#   - comparativo: movimientos reales, cubo y cruce con la proyección (se
+#     rearma solo cuando llegan cartolas nuevas o cambia la proyección)
+# predictor y reporteria se rearman solo si cambió el hash (manifest) de alguna
+# pestaña desde el último armado; si no, el paso queda "sin cambios".
+# Los escenarios Make piden además el precalentado de su tenant al terminar
+# (solicitar), que relee todas sus pestañas aunque el hash no haya cambiado.
+#
+#   python precalentado.py [--perfil predictor] [--clientes <sheet>]   (un ciclo, con tiempos)
+
+import argparse
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from cache_compartida import ultimo_uso
+from flujo_caja import comparativo_compartido
+from instrumentacion import corrida
+from prediccion import TABS_LECTURA, leer_offline, leer_online, lector_tenant, normalizadas_compartidas
+from reporteria import TABS_REPORTERIA, tenant_compartido
+from sheets import leer_tab, leer_tabs
+from snapshots import (
+    esperar_refresco,
+    huellas_snapshot,
+    leer_snapshot,
+    leer_snapshot_por_partes,
+    partes_con_snapshot,
+    refrescar,
+    tabs_vencidas,
+)
+from tenants import DEFAULT_SHEET_ID, leer_clientes_config, tenants
+
+CADENCIA_SEG = float(os.environ.get("PRECALENTADO_SEG", 240))   # <= 0: solo a pedido
+TABS_TENANT = list(dict.fromkeys(TABS_LECTURA + TABS_REPORTERIA))
+
+# ======================================
+# CALENTADORES
+# ======================================
+# cada uno recibe el tenant y las pestañas que cambiaron desde su último armado
+def calentar_snapshots(tenant: dict, recargar: List[str]) -> Optional[str]:
+    """Copia local al día: espera el refresco de fondo en curso y baja lo que siga vencido."""
+    if tenant["offline"]:
+        return "offline"
+    sheet_id = tenant["sheet_id"]
+    esperar_refresco(sheet_id)
+    vencidas = tabs_vencidas(sheet_id, TABS_TENANT)
+    if not vencidas:
+        return None
+    errores = {tab: e for tab, e in refrescar(sheet_id, vencidas).items() if e != "ok"}
+    return f"errores: {errores}" if errores else f"{len(vencidas)} pestañas"
+
+
+def calentar_predictor(tenant: dict, recargar: List[str]) -> None:
+    """Pestañas y frames normalizados que lee app_predictor al ejecutar sin filtro de SKU.
+
+    Solo se releen las pestañas de recargar; los normalizados siguen a las
+    pestañas (prediccion.normalizadas_compartidas), así que no hace falta forzarlos.
+    """
+    sheet_id = tenant["sheet_id"]
+    lector = lector_tenant(tenant["offline"])
+    for tab in recargar:
+        leer_tab(sheet_id, tab, lector=lector, forzar=True)
+    tabs, _ = leer_tabs(sheet_id, TABS_LECTURA, lector=lector)
+    normalizadas_compartidas(tabs, sheet_id)
+
+
+def _snapshot_obligatorio(sheet_id: str, tab: str) -> pd.DataFrame:
+    df = leer_snapshot(sheet_id, tab)
+    if df is None:
+        raise FileNotFoundError(f"sin copia local de '{tab}'")
+    return df
+
+
+_partes_online = partes_con_snapshot()
+
+
+def calentar_reporteria(tenant: dict, recargar: List[str]) -> None:
+    """Rollup, stock y umbrales con la misma clave que usa app_reporteria (la clave ya sigue a las copias)."""
+    if tenant["offline"]:
+        tenant_compartido(tenant["sheet_id"], _snapshot_obligatorio, leer_snapshot, modo="offline",
+                          partes=leer_snapshot_por_partes)
+    else:
+        tenant_compartido(tenant["sheet_id"], leer_online, modo="online", partes=_partes_online)
+
+
+def calentar_comparativo() -> None:
+    """Ingesta las cartolas nuevas y deja armado el comparativo de esa versión."""
+    comparativo_compartido()
+
+
+POR_TENANT: Dict[str, Callable[[dict, List[str]], Optional[str]]] = {
+    "snapshots": calentar_snapshots,
+    "predictor": calentar_predictor,
+    "reporteria": calentar_reporteria,
+}
+# pestañas de las que depende cada paso: sin cambios en su hash no se rearma
+ENTRADAS: Dict[str, List[str]] = {
+    "predictor": TABS_LECTURA,
+    "reporteria": TABS_REPORTERIA,
+}
+GLOBALES: Dict[str, Callable[[], Optional[str]]] = {
+    "comparativo": calentar_comparativo,
+}
+# pasos de cada dashboard, en orden
+PERFILES: Dict[str, List[str]] = {
+    "predictor": ["snapshots", "predictor"],
+    "reporteria": ["snapshots", "reporteria"],
+    "flujo_caja_comparativo": ["comparativo"],
+}
+
+# ======================================
+# PRECALENTADOR
+# ======================================
+class Precalentador:
+    """Hilo de fondo que corre los pasos de un perfil por cadencia y a pedido."""
+
+    def __init__(self,
+                 perfil: str,
+                 cadencia: float = CADENCIA_SEG,
+                 sheet_clientes: str = DEFAULT_SHEET_ID,
+                 offline: bool = False):
+        self.perfil = perfil
+        self.pasos = PERFILES[perfil]
+        self.cadencia = cadencia
+        self.sheet_clientes = sheet_clientes
+        self.offline = offline
+        self.ultimo: List[dict] = []
+        self._lock = threading.Lock()
+        self._pendientes: Dict[str, float] = {}   # sheet_id -> cuándo precalentar (monotonic)
+        self._armados: Dict[tuple, tuple] = {}    # (sheet_id, offline, paso) -> hashes con que se armó
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def tenants(self) -> List[dict]:
+        """Tenants activos de clientes_config (OFFLINE global: todos offline)."""
+        clientes = leer_clientes_config(leer_offline if self.offline else leer_online, self.sheet_clientes)
+        lista = list(tenants(clientes).values())
+        for tenant in lista:
+            tenant["offline"] = self.offline or tenant["offline"]
+        return lista
+
+    # ---------- pasos ----------
+    def _calentar(self, paso: str, tenant: dict, forzar: bool) -> Optional[str]:
+        tabs = ENTRADAS.get(paso)
+        if tabs is None:
+            return POR_TENANT[paso](tenant, [])
+        clave = (tenant["sheet_id"], tenant["offline"], paso)
+        huellas = huellas_snapshot(tenant["sheet_id"], tabs)
+        previas = self._armados.get(clave)
+        if forzar:
+            recargar = list(tabs)
+        elif previas is None:
+            recargar = []   # primer armado del proceso: vale lo que ya esté en caché
+        else:
+            recargar = [tab for (tab, h), (_, h0) in zip(huellas, previas) if h != h0]
+            if not recargar:
+                return "sin cambios"
+        detalle = POR_TENANT[paso](tenant, recargar)
+        self._armados[clave] = huellas
+        return detalle
+
+    def _correr(self, paso: str, tenant: Optional[dict], forzar: bool = False) -> dict:
+        tenant_id = tenant["tenant_id"] if tenant else ""
+        t0 = time.perf_counter()
+        with corrida("precalentado", tenant=tenant_id, paso=paso):
+            try:
+                detalle = self._calentar(paso, tenant, forzar) if tenant else GLOBALES[paso]()
+                estado = detalle or "ok"
+            except Exception as e:
+                estado = f"error: {e}"
+        return {"tenant": tenant_id, "paso": paso, "segundos": round(time.perf_counter() - t0, 2), "estado": estado}
+
+    def ciclo(self,
+              sheet_ids: Optional[set] = None,
+              forzar: bool = False,
+              globales: bool = True) -> pd.DataFrame:
+        """Corre los pasos del perfil (por tenant, solo para sheet_ids si se indican).
+
+        forzar rearma aunque las pestañas no hayan cambiado. Devuelve el estado de cada paso.
+        """
+        estados = []
+        if globales:
+            estados += [self._correr(paso, None) for paso in self.pasos if paso in GLOBALES]
+        pasos_tenant = [paso for paso in self.pasos if paso in POR_TENANT]
+        if pasos_tenant:
+            try:
+                lista = self.tenants()
+            except Exception as e:
+                lista = []
+                estados.append({"tenant": "", "paso": "clientes_config", "segundos": 0.0, "estado": f"error: {e}"})
+            vistos = set()
+            # los que alguien está mirando primero (sort estable: el resto en orden de clientes_config)
+            for tenant in sorted(lista, key=lambda t: -ultimo_uso(t["sheet_id"])):
+                clave = (tenant["sheet_id"], tenant["offline"])
+                if clave in vistos or (sheet_ids is not None and tenant["sheet_id"] not in sheet_ids):
+                    continue
+                vistos.add(clave)
+                estados += [self._correr(paso, tenant, forzar) for paso in pasos_tenant]
+        self.ultimo = estados
+        return pd.DataFrame(estados, columns=["tenant", "paso", "segundos", "estado"])
+
+    # ---------- a pedido ----------
+    def solicitar(self, sheet_id: str, retraso: float = 0.0) -> None:
+        cuando = time.monotonic() + retraso
+        with self._lock:
+            self._pendientes[sheet_id] = min(cuando, self._pendientes.get(sheet_id, cuando))
+        self._despertar.set()
+
+    def _tomar_pendientes(self) -> set:
+        ahora = time.monotonic()
+        with self._lock:
+            listos = {sid for sid, cuando in self._pendientes.items() if cuando <= ahora}
+            for sid in listos:
+                del self._pendientes[sid]
+        return listos
+
+    def _proximo_pendiente(self) -> float:
+        with self._lock:
+            return min(self._pendientes.values(), default=float("inf"))
+
+    # ---------- hilo ----------
+    def iniciar(self) -> None:
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._bucle, name=f"precalentado-{self.perfil}", daemon=True)
+            self._hilo.start()
+
+    def _bucle(self) -> None:
+        proximo_ciclo = time.monotonic() if self.cadencia > 0 else float("inf")
+        while True:
+            listos = self._tomar_pendientes()
+            if listos:
+                self.ciclo(listos, forzar=True, globales=False)
+            if time.monotonic() >= proximo_ciclo:
+                self.ciclo()
+                proximo_ciclo = time.monotonic() + self.cadencia
+            espera = min(proximo_ciclo, self._proximo_pendiente()) - time.monotonic()
+            self._despertar.wait(min(max(espera, 0.0), 3600))
+            self._despertar.clear()
+
+# ======================================
+# UNO POR PROCESO
+# ======================================
+_lock = threading.Lock()
+_activos: Dict[str, Precalentador] = {}
+
+
+def iniciar(perfil: str, **kwargs) -> Precalentador:
+    """El precalentador del perfil en este proceso; se crea y arranca la primera vez (los reruns lo reutilizan)."""
+    with _lock:
+        precalentador = _activos.get(perfil)
+        if precalentador is None:
+            precalentador = _activos[perfil] = Precalentador(perfil, **kwargs)
+            precalentador.iniciar()
+    return precalentador
+
+
+def solicitar(sheet_id: str, retraso: float = 0.0) -> None:
+    """Pide precalentar el sheet en este proceso tras retraso segundos (p.ej. al terminar un escenario Make)."""
+    with _lock:
+        activos = list(_activos.values())
+    for precalentador in activos:
+        precalentador.solicitar(sheet_id, retraso)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corre un ciclo de precalentado y muestra el tiempo de cada paso.")
+    parser.add_argument("--perfil", choices=list(PERFILES), action="append",
+                        help="Perfiles a correr (por defecto todos)")
+    parser.add_argument("--clientes", default=DEFAULT_SHEET_ID, help="Sheet con clientes_config")
+    parser.add_argument("--offline", action="store_true", help="Solo copias locales, sin Sheets")
+    args = parser.parse_args()
+
+    for perfil in args.perfil or list(PERFILES):
+        t0 = time.perf_counter()
+        estados = Precalentador(perfil, sheet_clientes=args.clientes, offline=args.offline).ciclo()
+        print(f"== {perfil} ({time.perf_counter() - t0:.1f}s)")
+        print(estados.to_string(index=False) if len(estados) else "(sin pasos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# prediccion.py — Núcleo del predictor de compras (sin Streamlit)
+#
+# Lectura de las pestañas del tenant (copia local / plantillas OFFLINE),
+# normalización hacia las entradas de predictor_core.forecast_all, pronóstico
+# (directo o particionado por SKU, con o sin caché en disco) y disparo de los
+# escenarios Make con espera de hojas frescas. app_predictor.py es solo la
+# vista; prediccion_batch.py corre lo mismo para todos los tenants.
+# predictor_core se importa recién al pronosticar.
+
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from actualizacion import (
+    disparar_escenarios,
+    esperar_actualizacion,
+    huella,
+    huellas_actuales,
+    plazo_escenario,
+    trigger_make,
+)
+from cache_compartida import por_tenant
+from cache_forecast import Resultado, forecast_cacheado
+from instrumentacion import medido
+from normalizacion import (
+    normalize_config_sheet,
+    normalize_inbound_sheet,
+    normalize_stock_sheet,
+    normalize_ventas_sheet,
+    prepare_inbound_for_core,
+)
+from particionado import TAM_SHARD, forecast_particionado
+from sheets import CACHE_TTL_SEG, Lector, carga, descargar_tab, invalidar
+from snapshots import leer_snapshot, lector_con_snapshot, refrescar_en_segundo_plano, vencer
+
+TAB_VENTAS         = "ventas_raw"
+TAB_STOCK          = "stock_snapshot"
+TAB_STOCK_TRANS    = "stock_transición"   # la seguimos leyendo, pero NO se suma
+TAB_CONFIG         = "config"
+TAB_INBOUND        = "inbound_po"
+TABS_PREDICCION = [TAB_VENTAS, TAB_STOCK, TAB_CONFIG, TAB_INBOUND]
+TABS_LECTURA    = [TAB_VENTAS, TAB_STOCK, TAB_STOCK_TRANS, TAB_CONFIG, TAB_INBOUND]
+
+# pestañas que actualiza cada escenario de Make (para invalidar la caché)
+TABS_ESCENARIO = {"S1": [TAB_VENTAS], "S2": [TAB_STOCK, TAB_STOCK_TRANS], "S3": [TAB_INBOUND]}
+# pestañas por las que se espera: stock_transición es solo informativa
+TABS_ESPERA = {"S1": [TAB_VENTAS], "S2": [TAB_STOCK], "S3": [TAB_INBOUND]}
+
+BASE_PLANTILLAS = "templates_csv"
+
+# ======================================
+# LECTURA
+# ======================================
+# copia local refrescada en segundo plano; ventas_raw se baja en streaming y proyectada
+leer_online: Lector = lector_con_snapshot(descargar_tab)
+
+
+def leer_offline(sheet_id: str, tab: str) -> pd.DataFrame:
+    """Copia local del sheet (snapshots/); si no existe, las plantillas CSV de BASE_PLANTILLAS."""
+    df = leer_snapshot(sheet_id, tab)
+    if df is None:
+        return pd.read_csv(os.path.join(BASE_PLANTILLAS, f"{tab}.csv"))
+    return df
+
+
+def lector_tenant(offline: bool) -> Lector:
+    """Tenant OFFLINE: solo copia local, nunca Sheets."""
+    return leer_offline if offline else leer_online
+
+# ======================================
+# NORMALIZACIÓN
+# ======================================
+@medido()
+def normalizar_tabs(tabs: Dict[str, pd.DataFrame],
+                    sheet_id: str = "",
+                    sku: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """Pestañas crudas -> ventas, stock, stock_trans, config, inbound e inbound_core.
+
+    Con sku solo se materializan las filas de ese SKU (ya normalizado).
+    """
+    ventas = normalize_ventas_sheet(tabs[TAB_VENTAS], sku=sku)
+    stock = normalize_stock_sheet(tabs[TAB_STOCK], sku=sku, sheet_id=sheet_id, tab=TAB_STOCK)
+    inbound = normalize_inbound_sheet(tabs[TAB_INBOUND], sku=sku)
+    return {
+        "ventas": ventas,
+        "stock": stock,
+        "stock_trans": normalize_stock_sheet(tabs.get(TAB_STOCK_TRANS), sku=sku,
+                                             sheet_id=sheet_id, tab=TAB_STOCK_TRANS),
+        "config": normalize_config_sheet(tabs[TAB_CONFIG], ventas, stock, sku=sku),
+        "inbound": inbound,
+        "inbound_core": prepare_inbound_for_core(inbound),
+    }
+
+
+def normalizadas_compartidas(tabs: Dict[str, pd.DataFrame],
+                            sheet_id: str,
+                            sku: Optional[str] = None,
+                            ttl: float = CACHE_TTL_SEG,
+                            forzar: bool = False) -> Dict[str, pd.DataFrame]:
+    """normalizar_tabs compartido entre sesiones: mismo sheet, SKU y pestañas, mismos frames (solo lectura).
+
+    Las pestañas entran a la clave por su número de carga en la caché de
+    sheets (o su huella, si no vienen de ahí): con pestañas nuevas se
+    normaliza de nuevo; lo de cargas anteriores sale por LRU.
+    """
+    firma = tuple((tab, carga(df) or huella(df)) for tab, df in sorted(tabs.items()))
+    valor, _ = por_tenant(sheet_id, "normalizadas", lambda: normalizar_tabs(tabs, sheet_id, sku=sku), sku, firma,
+                          ttl=ttl, forzar=forzar)
+    return valor
+
+
+def entradas_core(normalizadas: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Argumentos de forecast_all. El stock al core es solo stock_snapshot (sin copia)."""
+    return {
+        "ventas": normalizadas["ventas"],
+        "stock": normalizadas["stock"],
+        "config": normalizadas["config"],
+        "inbound": normalizadas["inbound_core"],
+    }
+
+
+def preparar_entradas(tabs: Dict[str, pd.DataFrame], sheet_id: str = "") -> Dict[str, pd.DataFrame]:
+    """Pestañas crudas -> argumentos de forecast_all (ventas, stock, config, inbound)."""
+    return entradas_core(normalizar_tabs(tabs, sheet_id))
+
+# ======================================
+# PRONÓSTICO
+# ======================================
+def elegir_forecast(paralelo: bool = False,
+                    tam_shard: int = TAM_SHARD,
+                    workers: Optional[int] = None) -> Callable[..., Resultado]:
+    """forecast_all, o su versión repartida por SKU entre procesos."""
+    if paralelo:
+        def forecast(**kwargs):
+            return forecast_particionado(**kwargs, tam_shard=int(tam_shard), max_workers=workers)
+        return forecast
+    from predictor_core import forecast_all
+    return forecast_all
+
+
+@medido()
+def predecir(entradas: Dict[str, pd.DataFrame],
+             freq: str,
+             horizon: Optional[int],
+             tenant_id: str,
+             usar_cache: bool = True,
+             paralelo: bool = False,
+             tam_shard: int = TAM_SHARD,
+             workers: Optional[int] = None) -> Tuple[Resultado, str]:
+    """(det, res, prop) y el estado de la caché ("hit", "parcial (...)", "miss" o "sin caché")."""
+    # con caché, forecast_all solo aparece como tramo cuando hay que calcular
+    forecast = medido("forecast_all")(elegir_forecast(paralelo, tam_shard, workers))
+    if usar_cache:
+        return forecast_cacheado(entradas, freq, horizon, tenant_id, forecast)
+    return forecast(**entradas, freq=freq, horizon_override=horizon), "sin caché"
+
+# ======================================
+# MAKE
+# ======================================
+def invalidar_tabs(sheet_id: str, tabs: list) -> None:
+    """Make actualizó estas pestañas: fuera de la caché y copia local marcada como vieja."""
+    invalidar(sheet_id, tabs)
+    vencer(sheet_id, tabs)
+
+
+def payload_escenario(nombre: str, tenant_id: str) -> dict:
+    payload = {"reason": "ui_run", "tenant_id": tenant_id}
+    if nombre == "S2":
+        payload["use_stock_total"] = True
+    return payload
+
+
+def disparar_escenario(nombre: str, tenant: dict) -> dict:
+    """Dispara un escenario (S1/S2/S3) sin esperar y deja sus pestañas por refrescar."""
+    respuesta = trigger_make(tenant["webhooks"][nombre], payload_escenario(nombre, tenant["tenant_id"]))
+    invalidar_tabs(tenant["sheet_id"], TABS_ESCENARIO[nombre])
+    if respuesta.get("ok"):
+        # sin esperar a Make: se precalienta cuando el escenario ya debería haber terminado
+        from precalentado import solicitar  # aquí: precalentado importa este módulo
+        solicitar(tenant["sheet_id"], retraso=plazo_escenario(respuesta))
+    return respuesta
+
+
+def actualizar_y_esperar(tenant: dict, lector_online: Lector = descargar_tab) -> Tuple[Dict[str, dict], Dict[str, bool]]:
+    """Dispara S1/S2/S3 en paralelo y sondea sus hojas hasta que cambien.
+
+    Solo se espera por las hojas de escenarios que respondieron OK (un tenant
+    OFFLINE no lee Sheets, así que no hay nada que esperar), y un escenario
+    que avisó que terminó se espera poco o nada (plazo_escenario). Lo recién llegado
+    queda en la caché, la copia local se pone al día de fondo y se pide el
+    precalentado del tenant.
+    Devuelve (respuesta por escenario, {pestaña: cambió}).
+    """
+    sheet_id = tenant["sheet_id"]
+    tabs_espera = [t for tabs in TABS_ESPERA.values() for t in tabs]
+    previas = {} if tenant["offline"] else huellas_actuales(sheet_id, tabs_espera, lector=lector_online)
+    respuestas = disparar_escenarios({
+        nombre: (tenant["webhooks"][nombre], payload_escenario(nombre, tenant["tenant_id"]))
+        for nombre in TABS_ESPERA
+    })
+    esperadas = {
+        tab: previas[tab]
+        for nombre, tabs in TABS_ESPERA.items() if respuestas[nombre].get("ok")
+        for tab in tabs if tab in previas
+    }
+    plazos = {tab: plazo_escenario(respuestas[nombre]) for nombre, tabs in TABS_ESPERA.items() for tab in tabs}
+    cambios = esperar_actualizacion(sheet_id, esperadas, lector=lector_online, plazos=plazos)
+    invalidar_tabs(sheet_id, [TAB_STOCK_TRANS])
+    actualizadas = [tab for tab, ok in cambios.items() if ok]
+    if actualizadas:
+        refrescar_en_segundo_plano(sheet_id, actualizadas, lector_online)
+    from precalentado import solicitar  # aquí: precalentado importa este módulo
+    solicitar(sheet_id)
+    return respuestas, cambios
@@ -0,0 +1,174 @@
+# prediccion_batch.py — Predicción nocturna de todos los tenants
+#
+# Recorre los tenants activos de clientes_config y, para cada uno, refresca la
+# copia local de sus pestañas, normaliza, corre forecast_all y escribe
+#   <salida>/<AAAA-MM-DD>/<tenant_id>/propuesta.csv, pred_resumen.csv, pred_detalle.csv
+# Cada tenant corre en su propio proceso (como máximo --workers a la vez) con
+# un plazo de --timeout segundos; si se pasa, el proceso se termina y el tenant
+# queda como "timeout". Al final se escribe resumen_batch.csv con duración,
+# estado y tamaño de la propuesta de cada tenant.
+#
+#   python prediccion_batch.py [tenant_id ...] [--freq M|W] [--horizonte 6]
+#                              [--workers 4] [--timeout 900] [--salida propuestas]
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from prediccion import TAB_VENTAS, TABS_PREDICCION, predecir, preparar_entradas
+from sheets import descargar_tab
+from snapshots import leer_snapshot, refrescar
+from tenants import DEFAULT_SHEET_ID, TAB_CLIENTES_CONF, leer_clientes_config, tenant_desde_fila
+
+SALIDA_DIR = "propuestas"
+MAX_WORKERS = 4
+TIMEOUT_SEG = 900
+ARCHIVOS_SALIDA = {"prop": "propuesta.csv", "res": "pred_resumen.csv", "det": "pred_detalle.csv"}
+
+
+# ======================================
+# TENANTS
+# ======================================
+def tenants_activos(sheet_clientes: str = DEFAULT_SHEET_ID) -> List[dict]:
+    """Configuración de cada tenant activo de clientes_config (ver tenants.tenant_desde_fila)."""
+    try:
+        df = leer_clientes_config(descargar_tab, sheet_clientes)
+    except Exception:
+        if leer_snapshot(sheet_clientes, TAB_CLIENTES_CONF) is None:
+            raise
+        df = leer_clientes_config(leer_snapshot, sheet_clientes)
+    return [tenant_desde_fila(row) for _, row in df.iterrows()]
+
+
+# ======================================
+# UN TENANT
+# ======================================
+def leer_tabs_tenant(sheet_id: str, offline: bool) -> Dict[str, pd.DataFrame]:
+    """Refresca la copia local (si el tenant es online) y lee las pestañas desde ella."""
+    if not offline:
+        refrescar(sheet_id, TABS_PREDICCION)  # si Sheets falla queda la copia anterior
+    tabs = {}
+    for tab in TABS_PREDICCION:
+        df = leer_snapshot(sheet_id, tab)
+        if df is None:
+            if tab == TAB_VENTAS:
+                raise ValueError(f"sin copia local de '{tab}'")
+            df = pd.DataFrame()
+        tabs[tab] = df
+    return tabs
+
+
+def predecir_tenant(tenant: dict, freq: str, horizon: int, salida: str) -> dict:
+    """Corre la predicción de un tenant y escribe sus CSV. Devuelve el resumen."""
+    entradas = preparar_entradas(leer_tabs_tenant(tenant["sheet_id"], tenant["offline"]), tenant["sheet_id"])
+    resumen = {"skus": int(entradas["ventas"]["sku"].nunique()), "filas_propuesta": 0, "qty_sugerida": 0}
+    if entradas["ventas"].empty:
+        resumen["estado"] = "sin ventas"
+        return resumen
+
+    (det, res, prop), resumen["cache"] = predecir(entradas, freq, horizon, tenant["tenant_id"])
+    carpeta = os.path.join(salida, tenant["tenant_id"])
+    os.makedirs(carpeta, exist_ok=True)
+    for nombre, df in zip(["det", "res", "prop"], [det, res, prop]):
+        df.to_csv(os.path.join(carpeta, ARCHIVOS_SALIDA[nombre]), index=False)
+    resumen["filas_propuesta"] = len(prop)
+    if not prop.empty and "qty_sugerida" in prop.columns:
+        resumen["qty_sugerida"] = int(prop["qty_sugerida"].sum())
+    resumen["estado"] = "ok"
+    return resumen
+
+
+def _worker(tenant: dict, freq: str, horizon: int, salida: str, conexion) -> None:
+    try:
+        resumen = predecir_tenant(tenant, freq, horizon, salida)
+    except Exception as e:
+        resumen = {"estado": f"error: {e}"}
+    conexion.send(resumen)
+    conexion.close()
+
+
+# ======================================
+# BATCH
+# ======================================
+def ejecutar_batch(tenants: List[dict],
+                   freq: str = "M",
+                   horizon: int = 6,
+                   salida: str = SALIDA_DIR,
+                   max_workers: int = MAX_WORKERS,
+                   timeout: float = TIMEOUT_SEG,
+                   fecha: Optional[str] = None) -> pd.DataFrame:
+    """Predice todos los tenants, uno por proceso, y devuelve el resumen del batch."""
+    fecha = fecha or pd.Timestamp.today().strftime("%Y-%m-%d")
+    salida = os.path.join(salida, fecha)
+    os.makedirs(salida, exist_ok=True)
+
+    # un pipe por proceso: terminar uno por timeout no afecta a los demás
+    ctx = mp.get_context("spawn")
+    pendientes = list(tenants)
+    corriendo: Dict[str, tuple] = {}     # tenant_id -> (proceso, receptor, inicio)
+    resultados: Dict[str, dict] = {}
+
+    def _cerrar(tid: str, resumen: dict) -> None:
+        proceso, receptor, inicio = corriendo.pop(tid)
+        receptor.close()
+        proceso.join(timeout=5)
+        resultados[tid] = {"segundos": round(time.perf_counter() - inicio, 1), **resumen}
+
+    while pendientes or corriendo:
+        while pendientes and len(corriendo) < max_workers:
+            tenant = pendientes.pop(0)
+            receptor, emisor = ctx.Pipe(duplex=False)
+            proceso = ctx.Process(target=_worker, args=(tenant, freq, horizon, salida, emisor), daemon=True)
+            proceso.start()
+            emisor.close()
+            corriendo[tenant["tenant_id"]] = (proceso, receptor, time.perf_counter())
+
+        listos = wait([r for _, r, _ in corriendo.values()], timeout=1)
+        for tid, (proceso, receptor, inicio) in list(corriendo.items()):
+            if receptor in listos:
+                try:
+                    resumen = receptor.recv()
+                except EOFError:  # el proceso murió sin responder
+                    proceso.join(timeout=5)
+                    resumen = {"estado": f"error: proceso terminó con código {proceso.exitcode}"}
+                _cerrar(tid, resumen)
+            elif time.perf_counter() - inicio > timeout:
+                proceso.terminate()
+                _cerrar(tid, {"estado": "timeout"})
+
+    filas = [
+        {"tenant_id": t["tenant_id"], "sheet_id": t["sheet_id"], **resultados.get(t["tenant_id"], {})}
+        for t in tenants
+    ]
+    resumen = pd.DataFrame(filas, columns=["tenant_id", "sheet_id", "estado", "segundos",
+                                           "cache", "skus", "filas_propuesta", "qty_sugerida"])
+    resumen.to_csv(os.path.join(salida, "resumen_batch.csv"), index=False)
+    return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predicción de compras de todos los tenants activos.")
+    parser.add_argument("tenant_ids", nargs="*", help="solo estos tenants (por defecto, todos los activos)")
+    parser.add_argument("--clientes", default=DEFAULT_SHEET_ID, help="sheet con clientes_config")
+    parser.add_argument("--freq", choices=["M", "W"], default="M")
+    parser.add_argument("--horizonte", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_SEG, help="segundos por tenant")
+    parser.add_argument("--salida", default=SALIDA_DIR)
+    args = parser.parse_args()
+
+    tenants = tenants_activos(args.clientes)
+    if args.tenant_ids:
+        tenants = [t for t in tenants if t["tenant_id"] in args.tenant_ids]
+
+    t0 = time.perf_counter()
+    resumen = ejecutar_batch(tenants, freq=args.freq, horizon=args.horizonte, salida=args.salida,
+                             max_workers=args.workers, timeout=args.timeout)
+    print(resumen.to_string(index=False))
+    fallidos = resumen[resumen["estado"] != "ok"]
+    print(f"{len(resumen)} tenants, {len(fallidos)} con problemas, {time.perf_counter() - t0:.1f}s")
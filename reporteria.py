@@ -0,0 +1,117 @@
+# reporteria.py — Núcleo de la reportería de ventas y stock (sin Streamlit)
+#
+# Carga de un tenant (rollup diario de ventas, stock normalizado y umbrales de
+# cobertura) y las tablas que muestra app_reporteria.py: ventas de una
+# ventana, evolución mensual, productos en alza / en baja y cobertura.
+
+from datetime import timedelta
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from cache_compartida import TENANTS, por_tenant
+from cobertura import calcular_cobertura, normalizar_stock, umbrales_desde_config
+from instrumentacion import medido
+from modelo_ventas import VentasCompactas
+from rollup_ventas import RollupVentas
+from sheets import Lector
+from snapshots import LectorPartes, huellas_snapshot
+
+TAB_VENTAS = "ventas_raw"
+TAB_STOCK  = "stock_snapshot"
+TAB_CONFIG = "config"
+TABS_REPORTERIA = [TAB_VENTAS, TAB_STOCK, TAB_CONFIG]
+
+DIAS_COBERTURA = 60
+
+
+@medido()
+def cargar_tenant(sheet_id: str,
+                  lector: Lector,
+                  lector_config: Optional[Lector] = None,
+                  partes: Optional[LectorPartes] = None) -> Tuple[RollupVentas, pd.DataFrame, pd.DataFrame]:
+    """(rollup, stock, umbrales) del tenant. Sin pestaña config se usan los umbrales por defecto.
+
+    Con partes, las ventas se compactan bloque a bloque desde la copia local
+    (sin la pestaña entera en memoria); sin copia se cae a lector.
+    """
+    bloques = partes(sheet_id, TAB_VENTAS) if partes is not None else None
+    if bloques is not None:
+        ventas = VentasCompactas.desde_partes(bloques)
+    else:
+        ventas = VentasCompactas.desde_tab(lector(sheet_id, TAB_VENTAS))
+    rollup = RollupVentas(ventas)
+    stock = normalizar_stock(lector(sheet_id, TAB_STOCK), sheet_id)
+    try:
+        config = (lector_config or lector)(sheet_id, TAB_CONFIG)
+    except Exception:
+        config = None
+    return rollup, stock, umbrales_desde_config(config)
+
+
+def tenant_compartido(sheet_id: str,
+                      lector: Lector,
+                      lector_config: Optional[Lector] = None,
+                      modo: str = "",
+                      partes: Optional[LectorPartes] = None,
+                      ttl: Optional[float] = None,
+                      forzar: bool = False) -> Tuple[RollupVentas, pd.DataFrame, pd.DataFrame, pd.Timestamp]:
+    """cargar_tenant compartido entre sesiones del proceso, más la hora de carga.
+
+    Todas las sesiones del mismo tenant (y modo de lectura) usan el mismo rollup
+    y stock de solo lectura; con varias pidiéndolo a la vez se carga una vez.
+    Ambos lectores sirven la copia local, así que la clave lleva el hash de
+    cada pestaña en el manifest: una copia nueva arma otra entrada. Si la carga
+    misma bajó copias (tenant sin snapshots), el resultado queda también bajo
+    los hashes nuevos, que son los que pedirá el próximo rerun.
+    """
+    def _cargar():
+        return (*cargar_tenant(sheet_id, lector, lector_config, partes), pd.Timestamp.now())
+    antes = huellas_snapshot(sheet_id, TABS_REPORTERIA)
+    valor, hit = por_tenant(sheet_id, "reporteria", _cargar, modo, antes, ttl=ttl, forzar=forzar)
+    if not hit:
+        despues = huellas_snapshot(sheet_id, TABS_REPORTERIA)
+        if despues != antes:
+            TENANTS.poner((sheet_id, "reporteria", modo, despues), valor)
+    return valor
+
+
+def _filtrar_sku(df: pd.DataFrame, sku: Optional[str]) -> pd.DataFrame:
+    return df[df["sku"] == sku] if sku else df
+
+
+@medido()
+def ventas_ventana(rollup: RollupVentas, hoy: pd.Timestamp, dias: int, sku: Optional[str] = None) -> pd.DataFrame:
+    """(sku, qty) de los últimos dias días."""
+    return _filtrar_sku(rollup.por_sku(hoy - timedelta(days=dias), hoy), sku)
+
+
+@medido()
+def evolucion_mensual(rollup: RollupVentas, hoy: pd.Timestamp, sku: Optional[str] = None) -> pd.DataFrame:
+    """(mes, qty) de los últimos 12 meses."""
+    return rollup.mensual(hoy - timedelta(days=365), hoy, sku=sku or None)
+
+
+@medido()
+def alza_baja(rollup: RollupVentas, hoy: pd.Timestamp, sku: Optional[str] = None) -> pd.DataFrame:
+    """Mes pasado contra antepasado por SKU: qty_cur, qty_prev y delta."""
+    ini_mes_actual = hoy.replace(day=1)
+    ini_mes_m1 = ini_mes_actual - pd.offsets.MonthBegin(1)
+    ini_mes_m2 = ini_mes_actual - pd.offsets.MonthBegin(2)
+
+    m1 = rollup.por_sku(ini_mes_m1, ini_mes_actual - timedelta(days=1)).rename(columns={"qty": "qty_cur"})
+    m2 = rollup.por_sku(ini_mes_m2, ini_mes_m1 - timedelta(days=1)).rename(columns={"qty": "qty_prev"})
+    out = pd.merge(_filtrar_sku(m1, sku), _filtrar_sku(m2, sku), on="sku", how="outer").fillna(0)
+    out["delta"] = out["qty_cur"] - out["qty_prev"]
+    return out
+
+
+@medido()
+def cobertura_stock(rollup: RollupVentas,
+                    stock: pd.DataFrame,
+                    umbrales: pd.DataFrame,
+                    hoy: pd.Timestamp,
+                    dias: int = DIAS_COBERTURA) -> pd.DataFrame:
+    """Cobertura de cada SKU con stock según el consumo de los últimos dias días (columna consumo_<dias>d)."""
+    consumo = rollup.por_sku(hoy - timedelta(days=dias), hoy)
+    return calcular_cobertura(stock, consumo, dias, umbrales).rename(columns={"consumo": f"consumo_{dias}d"})
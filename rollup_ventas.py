@@ -0,0 +1,110 @@
+# rollup_ventas.py — Rollup diario de ventas por SKU con sumas acumuladas
+#
+# Las ventas se agregan una vez a SKU × día, ordenadas por (sku, día), con la
+# cantidad y el número de líneas acumulados. Cualquier ventana de fechas se
+# resuelve con dos búsquedas binarias y una resta por SKU, sin volver a
+# recorrer las filas crudas: top de N días, evolución mensual, mes contra mes
+# y consumo para cobertura salen todos de la misma estructura.
+# Las ventanas son por día calendario, con ambos extremos incluidos.
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modelo_ventas import compactar
+from modelo_ventas import dia as _dia
+
+
+def _acumular(valores: np.ndarray) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(valores)])
+
+
+class RollupVentas:
+    """Índice SKU × día sobre las ventas (VentasCompactas o frame normalizado).
+
+    Las sumas acumuladas van en float64 aunque qty sea float32: acumular en
+    float32 perdería unidades en tenants con mucho volumen.
+    """
+
+    def __init__(self, ventas):
+        ventas = compactar(ventas)
+        self.skus = ventas.skus
+        codigos = ventas.codigos.astype(np.int64)
+        dias = ventas.dias.astype(np.int64)
+        qty = ventas.qty.astype(np.float64)
+
+        self.dia_min = int(dias.min()) if len(dias) else 0
+        self.span = int(dias.max()) - self.dia_min + 1 if len(dias) else 1
+
+        # (sku, día) -> clave entera ordenable
+        claves, inversa = np.unique(codigos * self.span + (dias - self.dia_min), return_inverse=True)
+        self.claves = claves
+        self.cum_qty = _acumular(np.bincount(inversa, weights=qty, minlength=len(claves)))
+        self.cum_n = _acumular(np.bincount(inversa, minlength=len(claves))).astype(np.int32)
+
+        # total diario (todos los SKU)
+        dias_agg = claves % self.span
+        self.dias_total, inv_total = np.unique(dias_agg, return_inverse=True)
+        pesos = np.diff(self.cum_qty)
+        self.cum_qty_total = _acumular(np.bincount(inv_total, weights=pesos, minlength=len(self.dias_total)))
+        self.cum_n_total = _acumular(np.bincount(inv_total, weights=np.diff(self.cum_n),
+                                                 minlength=len(self.dias_total))).astype(np.int32)
+        self.dias_total = self.dias_total.astype(np.int32)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.claves) == 0
+
+    # ---------- ventanas ----------
+    def _rango_dias(self, desde, hasta) -> Tuple[int, int]:
+        d0 = min(max(_dia(desde) - self.dia_min, 0), self.span)
+        d1 = min(max(_dia(hasta) - self.dia_min, -1), self.span - 1)
+        return d0, d1
+
+    def por_sku(self, desde, hasta) -> pd.DataFrame:
+        """Cantidad por SKU en [desde, hasta]; solo SKUs con ventas en la ventana."""
+        d0, d1 = self._rango_dias(desde, hasta)
+        base = np.arange(len(self.skus), dtype=np.int64) * self.span
+        lo = np.searchsorted(self.claves, base + d0, side="left")
+        hi = np.maximum(np.searchsorted(self.claves, base + d1, side="right"), lo)
+        n = self.cum_n[hi] - self.cum_n[lo]
+        qty = self.cum_qty[hi] - self.cum_qty[lo]
+        con_ventas = n > 0
+        return pd.DataFrame({"sku": self.skus[con_ventas], "qty": qty[con_ventas]})
+
+    def _segmento(self, sku: Optional[str]):
+        """(días, cum_qty, cum_n) de un SKU o del total."""
+        if sku is None:
+            return self.dias_total, self.cum_qty_total, self.cum_n_total
+        pos = self.skus.get_indexer([sku])[0]
+        if pos < 0:
+            vacio = np.zeros(1)
+            return np.empty(0, dtype=np.int64), vacio, vacio
+        lo, hi = np.searchsorted(self.claves, [pos * self.span, (pos + 1) * self.span], side="left")
+        return self.claves[lo:hi] - pos * self.span, self.cum_qty[lo:hi + 1] - self.cum_qty[lo], \
+            self.cum_n[lo:hi + 1] - self.cum_n[lo]
+
+    def total(self, desde, hasta, sku: Optional[str] = None) -> float:
+        dias, cum_qty, _ = self._segmento(sku)
+        d0, d1 = self._rango_dias(desde, hasta)
+        lo = np.searchsorted(dias, d0, side="left")
+        hi = max(np.searchsorted(dias, d1, side="right"), lo)
+        return float(cum_qty[hi] - cum_qty[lo])
+
+    def mensual(self, desde, hasta, sku: Optional[str] = None) -> pd.DataFrame:
+        """Cantidad por mes ('YYYY-MM') en [desde, hasta]; solo meses con ventas."""
+        desde, hasta = pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize()
+        if desde > hasta:
+            return pd.DataFrame(columns=["mes", "qty"])
+        meses = pd.period_range(desde, hasta, freq="M")
+        inicios = [max(m.start_time, desde) for m in meses]
+        fines = [min(m.end_time.normalize(), hasta) for m in meses]
+
+        dias, cum_qty, cum_n = self._segmento(sku)
+        d0 = np.array([_dia(d) - self.dia_min for d in inicios])
+        d1 = np.array([_dia(d) - self.dia_min for d in fines])
+        lo = np.searchsorted(dias, d0, side="left")
+        hi = np.maximum(np.searchsorted(dias, d1, side="right"), lo)
+        out = pd.DataFrame({"mes": meses.astype(str), "qty": cum_qty[hi] - cum_qty[lo]})
+        return out[(cum_n[hi] - cum_n[lo]) > 0].reset_index(drop=True)
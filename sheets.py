@@ -0,0 +1,138 @@
+# sheets.py — Lectura de pestañas de Google Sheets (export gviz CSV)
+#
+# Una sola requests.Session (keep-alive) para todas las descargas, caché de
+# proceso por (sheet_id, tab) con TTL compartida entre sesiones (LRU acotada,
+# una sola descarga aunque varias sesiones pidan la misma pestaña),
+# invalidación explícita cuando Make actualiza las hojas, y lectura
+# concurrente de varias pestañas con tiempos.
+# Las pestañas grandes (ventas_raw) se pueden bajar en streaming, por bloques
+# de filas y solo con las columnas necesarias (descargar_tab_por_partes).
+
+import io
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache_compartida import CacheCompartida, invalidar_tenant
+from instrumentacion import en_contexto, medido, tramo
+
+# base de la API; se puede apuntar a un servidor local en pruebas
+GSHEETS_BASE_URL = "https://docs.google.com/spreadsheets/d"
+CACHE_TTL_SEG = 300
+TIMEOUT_SEG = 30
+MAX_WORKERS = 5
+FILAS_POR_PARTE = 100_000
+TABS_MAX_MB = float(os.environ.get("CACHE_TABS_MB", 1024))
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+_cache = CacheCompartida(TABS_MAX_MB)
+# número de carga de cada pestaña en caché (df.attrs): lo derivado de ella se
+# guarda con ese número y no se confunde con lo de una carga anterior
+_cargas = itertools.count(1)
+
+Lector = Callable[[str, str], pd.DataFrame]
+
+# ======================================
+# DESCARGA
+# ======================================
+def url_gsheets(sheet_id: str, tab: str) -> str:
+    sheet_param = quote(tab, safe="")
+    return f"{GSHEETS_BASE_URL}/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_param}"
+
+
+@medido()
+def descargar_tab(sheet_id: str, tab: str) -> pd.DataFrame:
+    """Descarga una pestaña como CSV reutilizando la sesión HTTP."""
+    r = _session.get(url_gsheets(sheet_id, tab), timeout=TIMEOUT_SEG)
+    r.raise_for_status()
+    return pd.read_csv(io.BytesIO(r.content))
+
+
+def descargar_tab_por_partes(sheet_id: str,
+                             tab: str,
+                             columnas: Optional[Callable[[str], bool]] = None,
+                             filas_por_parte: int = FILAS_POR_PARTE) -> Iterator[pd.DataFrame]:
+    """Descarga la pestaña en streaming y la entrega en bloques de filas.
+
+    columnas decide por nombre qué columnas se parsean (el resto se descarta
+    al leer). Todo llega como texto, así los bloques comparten esquema; el
+    parseo de cada bloque avanza mientras sigue llegando el resto.
+    """
+    with _session.get(url_gsheets(sheet_id, tab), timeout=TIMEOUT_SEG, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        with pd.read_csv(r.raw, usecols=columnas, dtype=str, chunksize=filas_por_parte) as partes:
+            yield from partes
+
+# ======================================
+# CACHÉ
+# ======================================
+def leer_tab(sheet_id: str,
+             tab: str,
+             lector: Lector = descargar_tab,
+             ttl: float = CACHE_TTL_SEG,
+             forzar: bool = False) -> Tuple[pd.DataFrame, bool]:
+    """Pestaña desde la caché si está vigente; si no (o con forzar), la lee. Devuelve (df, hit)."""
+    with tramo("leer_tab", tab=tab) as registro:
+        df, hit = _cache.obtener((sheet_id, tab), lambda: _numerar(lector(sheet_id, tab)), ttl, forzar)
+        registro.update(cache=hit, filas=len(df))
+    return df, hit
+
+
+def _numerar(df: pd.DataFrame) -> pd.DataFrame:
+    df.attrs["carga"] = next(_cargas)
+    return df
+
+
+def carga(df: pd.DataFrame) -> Optional[int]:
+    """Número de carga de una pestaña leída con leer_tab(s) (None si no salió de la caché)."""
+    return df.attrs.get("carga")
+
+
+def guardar(sheet_id: str, tab: str, df: pd.DataFrame) -> None:
+    """Deja en la caché una pestaña recién leída por otra vía."""
+    _cache.poner((sheet_id, tab), _numerar(df))
+
+
+def invalidar(sheet_id: str, tabs: Optional[Iterable[str]] = None) -> None:
+    """Descarta de la caché las pestañas indicadas (o todas las del sheet) y lo derivado de ellas."""
+    tabs = None if tabs is None else set(tabs)
+    _cache.invalidar(lambda clave: clave[0] == sheet_id and (tabs is None or clave[1] in tabs))
+    invalidar_tenant(sheet_id)
+
+
+def estado_cache_tabs() -> dict:
+    return _cache.estado()
+
+
+def leer_tabs(sheet_id: str,
+              tabs: List[str],
+              lector: Lector = descargar_tab,
+              ttl: float = CACHE_TTL_SEG,
+              forzar: bool = False) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """Lee varias pestañas en paralelo. Devuelve ({tab: df}, tiempos por pestaña)."""
+
+    def _leer(tab: str):
+        t0 = time.perf_counter()
+        df, hit = leer_tab(sheet_id, tab, lector, ttl, forzar)
+        return tab, df, hit, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(tabs)) or 1) as pool:
+        # cada hilo con su copia del contexto: los tramos quedan en la corrida del rerun
+        resultados = [f.result() for f in [pool.submit(en_contexto(_leer), tab) for tab in tabs]]
+
+    frames = {tab: df for tab, df, _, _ in resultados}
+    tiempos = pd.DataFrame(
+        [(tab, round(seg, 3), hit, len(df)) for tab, df, hit, seg in resultados],
+        columns=["tab", "segundos", "cache", "filas"],
+    )
+    return frames, tiempos
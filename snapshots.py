@@ -0,0 +1,337 @@
+# snapshots.py — Copia local de las pestañas de cada tenant
+#
+# Cada sheet de tenant se refleja en SNAPSHOT_DIR/<sheet_id>/<tab>.feather con
+# su entrada de manifest en <tab>.manifest.json (fetched_at, hash = huella del
+# frame guardado, filas). Una entrada por pestaña: varios procesos (apps,
+# batch, CLI) refrescan el mismo sheet y ninguno reescribe lo de otra pestaña.
+# Los dashboards leen desde aquí: arrancan sin esperar a Google Sheets y siguen
+# funcionando si Sheets cae.
+# Cuando una copia es más vieja que EDAD_MAX_SEG se refresca en un hilo de
+# fondo, sin bloquear la página. También sirve de fuente para el modo OFFLINE.
+# Las pestañas de PROYECCIONES (ventas_raw) se bajan en streaming y se guardan
+# bloque a bloque solo con las columnas que usan los normalizadores.
+#
+# Poblar / refrescar a mano:
+#   python snapshots.py <sheet_id> [<sheet_id> ...]
+#   python snapshots.py --clientes <sheet_id_clientes_config>
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from actualizacion import huella, huella_inicial, sumar_filas
+from modelo_ventas import es_columna_ventas
+from sheets import Lector, descargar_tab, descargar_tab_por_partes
+from tenants import leer_clientes_config, sheets_activos
+
+SNAPSHOT_DIR = "snapshots"
+TABS_SNAPSHOT = ["ventas_raw", "stock_snapshot", "inbound_po", "config", "clientes_config"]
+EDAD_MAX_SEG = 600
+SUFIJO_MANIFEST = ".manifest.json"
+MANIFEST_LEGADO = "manifest.json"   # formato anterior (un archivo por sheet), solo lectura
+PROYECCIONES = {"ventas_raw": es_columna_ventas}
+
+# (sheet_id, tab) -> bloques de la copia local, o None si no hay copia
+LectorPartes = Callable[[str, str], Optional[Iterator[pd.DataFrame]]]
+
+_lock = threading.Lock()
+_en_curso: Dict[str, threading.Thread] = {}
+# una descarga+escritura a la vez por pestaña (refresco de fondo, precalentado, CLI)
+_locks_tab: Dict[Tuple[str, str], threading.RLock] = {}
+
+# ======================================
+# LECTURA / ESCRITURA
+# ======================================
+def _ruta(sheet_id: str, nombre: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, sheet_id, nombre)
+
+
+def _leer_json(ruta: str) -> Optional[dict]:
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _escribir_json(ruta: str, datos: dict) -> None:
+    tmp = _temporal(ruta)
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, ruta)
+    except Exception:
+        _descartar(tmp)
+        raise
+
+
+def leer_info(sheet_id: str, tab: str) -> Optional[dict]:
+    """Entrada del manifest de la pestaña (None si no hay copia)."""
+    info = _leer_json(_ruta(sheet_id, f"{tab}{SUFIJO_MANIFEST}"))
+    if info is None:
+        info = (_leer_json(_ruta(sheet_id, MANIFEST_LEGADO)) or {}).get(tab)
+    return info
+
+
+def leer_manifest(sheet_id: str) -> dict:
+    """{pestaña: entrada} de todas las copias del sheet."""
+    manifest = _leer_json(_ruta(sheet_id, MANIFEST_LEGADO)) or {}
+    carpeta = _ruta(sheet_id, "")
+    for nombre in os.listdir(carpeta) if os.path.isdir(carpeta) else []:
+        if nombre.endswith(SUFIJO_MANIFEST):
+            manifest[nombre[:-len(SUFIJO_MANIFEST)]] = _leer_json(os.path.join(carpeta, nombre))
+    return manifest
+
+
+def edad_snapshot(sheet_id: str, tab: str) -> Optional[float]:
+    """Segundos desde la última copia de la pestaña (None si no hay)."""
+    info = leer_info(sheet_id, tab)
+    if not info:
+        return None
+    fetched = datetime.fromisoformat(info["fetched_at"])
+    return (datetime.now(timezone.utc) - fetched).total_seconds()
+
+
+def leer_snapshot(sheet_id: str, tab: str) -> Optional[pd.DataFrame]:
+    ruta = _ruta(sheet_id, f"{tab}.feather")
+    if not os.path.exists(ruta):
+        return None
+    return feather.read_table(ruta, memory_map=True).to_pandas()
+
+
+def leer_snapshot_por_partes(sheet_id: str, tab: str) -> Optional[Iterator[pd.DataFrame]]:
+    """La copia local bloque a bloque (record batches, con memory-map); None si no hay copia.
+
+    Solo un bloque pasa a pandas a la vez: quien los consume (p.ej.
+    VentasCompactas.desde_partes) no tiene nunca la pestaña completa en memoria.
+    """
+    ruta = _ruta(sheet_id, f"{tab}.feather")
+    if not os.path.exists(ruta):
+        return None
+    archivo = pa.ipc.open_file(pa.memory_map(ruta))
+    return (archivo.get_batch(i).to_pandas() for i in range(archivo.num_record_batches))
+
+
+def _lock_tab(sheet_id: str, tab: str) -> threading.RLock:
+    with _lock:
+        return _locks_tab.setdefault((sheet_id, tab), threading.RLock())
+
+
+def _temporal(ruta: str) -> str:
+    """Archivo temporal único junto a ruta (mismo disco, para os.replace)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix=f"{os.path.basename(ruta)}.", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+
+def _descartar(tmp: str) -> None:
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+
+def guardar_snapshot(sheet_id: str, tab: str, df: pd.DataFrame) -> dict:
+    """Escribe la pestaña y actualiza su entrada en el manifest."""
+    os.makedirs(_ruta(sheet_id, ""), exist_ok=True)
+    ruta = _ruta(sheet_id, f"{tab}.feather")
+    with _lock_tab(sheet_id, tab):
+        tmp = _temporal(ruta)
+        try:
+            try:
+                feather.write_feather(df, tmp, compression="uncompressed")
+            except (TypeError, ValueError):
+                # columnas object con tipos mezclados (p.ej. números y texto)
+                objetos = df.select_dtypes(include="object").columns
+                feather.write_feather(df.astype({c: "string" for c in objetos}), tmp,
+                                      compression="uncompressed")
+            os.replace(tmp, ruta)
+        except Exception:
+            _descartar(tmp)
+            raise
+        return _registrar(sheet_id, tab, huella(df), len(df))
+
+
+def guardar_snapshot_por_partes(sheet_id: str, tab: str, partes: Iterable[pd.DataFrame]) -> dict:
+    """Escribe la pestaña bloque a bloque (bloques de texto, mismo esquema).
+
+    La copia anterior se reemplaza solo si llegaron todos los bloques. El hash
+    del manifest es la huella del frame completo, igual que en guardar_snapshot.
+    """
+    os.makedirs(_ruta(sheet_id, ""), exist_ok=True)
+    ruta = _ruta(sheet_id, f"{tab}.feather")
+    with _lock_tab(sheet_id, tab):
+        escritor, esquema, filas, h, tmp = None, None, 0, None, None
+        try:
+            for parte in partes:
+                if escritor is None:
+                    esquema = pa.schema([(str(c), pa.string()) for c in parte.columns])
+                    tmp = _temporal(ruta)
+                    escritor = pa.ipc.new_file(tmp, esquema)
+                    h = huella_inicial(parte.columns)
+                escritor.write_table(pa.Table.from_pandas(parte, schema=esquema, preserve_index=False))
+                filas += len(parte)
+                sumar_filas(h, parte)
+            if escritor is None:  # pestaña sin filas
+                return guardar_snapshot(sheet_id, tab, pd.DataFrame())
+            escritor.close()
+            os.replace(tmp, ruta)
+        except Exception:
+            if escritor is not None:
+                escritor.close()
+                _descartar(tmp)
+            raise
+        return _registrar(sheet_id, tab, h.hexdigest(), filas)
+
+
+def _registrar(sheet_id: str, tab: str, hash_: str, filas: int) -> dict:
+    info = {
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "hash": hash_,
+        "filas": filas,
+    }
+    _escribir_json(_ruta(sheet_id, f"{tab}{SUFIJO_MANIFEST}"), info)
+    return info
+
+
+def vencer(sheet_id: str, tabs: Iterable[str]) -> None:
+    """Marca las copias como viejas: la próxima lectura dispara un refresco."""
+    for tab in tabs:
+        with _lock_tab(sheet_id, tab):
+            info = leer_info(sheet_id, tab)
+            if info:
+                info["fetched_at"] = "1970-01-01T00:00:00+00:00"
+                _escribir_json(_ruta(sheet_id, f"{tab}{SUFIJO_MANIFEST}"), info)
+
+# ======================================
+# REFRESCO
+# ======================================
+def _descargar_y_guardar(sheet_id: str, tab: str, lector: Lector) -> Optional[pd.DataFrame]:
+    """Baja la pestaña y la guarda. Devuelve el frame si lo tuvo entero en memoria."""
+    with _lock_tab(sheet_id, tab):
+        if lector is descargar_tab and tab in PROYECCIONES:
+            guardar_snapshot_por_partes(sheet_id, tab, descargar_tab_por_partes(sheet_id, tab, PROYECCIONES[tab]))
+            return None
+        df = lector(sheet_id, tab)
+        guardar_snapshot(sheet_id, tab, df)
+        return df
+
+
+def refrescar(sheet_id: str,
+              tabs: Iterable[str] = TABS_SNAPSHOT,
+              lector: Lector = descargar_tab) -> Dict[str, str]:
+    """Descarga las pestañas en paralelo y guarda las que llegaron. Devuelve estado por pestaña."""
+    tabs = list(tabs)
+
+    def _uno(tab: str) -> str:
+        try:
+            _descargar_y_guardar(sheet_id, tab, lector)
+        except Exception as e:
+            return f"error: {e}"  # se conserva la copia anterior
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(5, len(tabs)))) as pool:
+        return dict(zip(tabs, pool.map(_uno, tabs)))
+
+
+def refrescar_en_segundo_plano(sheet_id: str,
+                               tabs: Iterable[str] = TABS_SNAPSHOT,
+                               lector: Lector = descargar_tab) -> bool:
+    """Lanza un refresco en un hilo si no hay otro en curso para el sheet."""
+    with _lock:
+        hilo = _en_curso.get(sheet_id)
+        if hilo is not None and hilo.is_alive():
+            return False
+        hilo = threading.Thread(target=refrescar, args=(sheet_id, list(tabs), lector), daemon=True)
+        _en_curso[sheet_id] = hilo
+    hilo.start()
+    return True
+
+
+def esperar_refresco(sheet_id: str, timeout: Optional[float] = None) -> None:
+    """Espera el refresco de fondo en curso del sheet, si hay uno."""
+    with _lock:
+        hilo = _en_curso.get(sheet_id)
+    if hilo is not None:
+        hilo.join(timeout)
+
+
+def huellas_snapshot(sheet_id: str, tabs: Iterable[str]) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """(pestaña, hash del manifest) de cada pestaña; None si no hay copia local."""
+    return tuple((tab, (leer_info(sheet_id, tab) or {}).get("hash")) for tab in tabs)
+
+
+def tabs_vencidas(sheet_id: str, tabs: Iterable[str], edad_max: float = EDAD_MAX_SEG) -> List[str]:
+    """Pestañas sin copia local o con una copia más vieja que edad_max."""
+    vencidas = []
+    for tab in tabs:
+        edad = edad_snapshot(sheet_id, tab)
+        if edad is None or edad > edad_max:
+            vencidas.append(tab)
+    return vencidas
+
+
+def lector_con_snapshot(lector_online: Lector = descargar_tab,
+                        edad_max: float = EDAD_MAX_SEG) -> Lector:
+    """Lector que sirve la copia local y la refresca en segundo plano si está vieja.
+
+    Sin copia local, lee en línea y la guarda.
+    """
+
+    def _leer(sheet_id: str, tab: str) -> pd.DataFrame:
+        df = leer_snapshot(sheet_id, tab)
+        if df is None:
+            df = _descargar_y_guardar(sheet_id, tab, lector_online)
+            return leer_snapshot(sheet_id, tab) if df is None else df
+        _refrescar_si_vieja(sheet_id, tab, lector_online, edad_max)
+        return df
+
+    return _leer
+
+
+def partes_con_snapshot(lector_online: Lector = descargar_tab,
+                        edad_max: float = EDAD_MAX_SEG) -> LectorPartes:
+    """Como lector_con_snapshot, pero entrega la copia local por bloques (leer_snapshot_por_partes)."""
+
+    def _partes(sheet_id: str, tab: str) -> Optional[Iterator[pd.DataFrame]]:
+        partes = leer_snapshot_por_partes(sheet_id, tab)
+        if partes is None:
+            _descargar_y_guardar(sheet_id, tab, lector_online)
+            return leer_snapshot_por_partes(sheet_id, tab)
+        _refrescar_si_vieja(sheet_id, tab, lector_online, edad_max)
+        return partes
+
+    return _partes
+
+
+def _refrescar_si_vieja(sheet_id: str, tab: str, lector_online: Lector, edad_max: float) -> None:
+    edad = edad_snapshot(sheet_id, tab)
+    if edad is None or edad > edad_max:
+        refrescar_en_segundo_plano(sheet_id, [tab], lector_online)
+
+
+def sheets_de_clientes(sheet_clientes: str) -> List[str]:
+    """sheet_id de los tenants activos en clientes_config."""
+    return sheets_activos(leer_clientes_config(descargar_tab, sheet_clientes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresca las copias locales de las pestañas de los tenants.")
+    parser.add_argument("sheet_ids", nargs="*")
+    parser.add_argument("--clientes", help="sheet con clientes_config: refresca todos los tenants activos")
+    args = parser.parse_args()
+
+    sheet_ids = list(args.sheet_ids)
+    if args.clientes:
+        sheet_ids = [args.clientes] + sheets_de_clientes(args.clientes) + sheet_ids
+    for sid in dict.fromkeys(sheet_ids):
+        t0 = time.perf_counter()
+        estado = refrescar(sid)
+        print(f"{sid}: {estado} ({time.perf_counter() - t0:.1f}s)")
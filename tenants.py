@@ -0,0 +1,80 @@
+# tenants.py — Tenants de clientes_config y su configuración
+#
+# Una fila por tenant: tenant_id, sheet_id, activo, offline, use_stock_total,
+# credenciales KAME y webhooks de Make (S1 ventas, S2 stock, S3 inbound).
+# Lo usan los dashboards, el batch de predicción y los refrescos de snapshots.
+
+from typing import Dict, List
+
+import pandas as pd
+
+from sheets import Lector
+
+DEFAULT_SHEET_ID  = "1Pbjxy_V-NuTbfnN_SLpexkYx_w62Umsg7eBr2qrQJrI"
+TAB_CLIENTES_CONF = "clientes_config"
+TAB_CONFIG        = "config"
+
+# Webhooks Make por defecto (3 escenarios)
+WEBHOOKS_DEFAULT = {
+    "S1": "https://hook.us1.make.com/1pdchxe8cl7qg2oo7byqi4u5x4p9cc4n",
+    "S2": "https://hook.us1.make.com/vdj87rfcjpmeuccds9vieu45410tnsug",
+    "S3": "https://hook.us1.make.com/k50t6u1rtrswqd6vl4s8mqf2ndu6noa3",
+}
+
+
+def es_verdadero(valor) -> bool:
+    return str(valor).upper() in ["TRUE", "1", "SI"]
+
+
+def leer_clientes_config(lector: Lector, sheet_clientes: str = DEFAULT_SHEET_ID) -> pd.DataFrame:
+    """Filas de los tenants activos de clientes_config (nombres de columna sin espacios)."""
+    df = lector(sheet_clientes, TAB_CLIENTES_CONF)
+    df.columns = [str(c).strip() for c in df.columns]
+    if "activo" in df.columns:
+        df = df[df["activo"].map(es_verdadero)]
+    return df
+
+
+def tenant_desde_fila(row) -> dict:
+    """Configuración de un tenant a partir de su fila de clientes_config."""
+    return {
+        "tenant_id": str(row["tenant_id"]),
+        "sheet_id": str(row.get("sheet_id", DEFAULT_SHEET_ID)).strip(),
+        "offline": es_verdadero(row.get("offline", "FALSE")),
+        "use_stock_total": es_verdadero(row.get("use_stock_total", "FALSE")),
+        "kame_client_id": row.get("kame_client_id", ""),
+        "kame_client_secret": row.get("kame_client_secret", ""),
+        "webhooks": {n: row.get(f"webhook_{n.lower()}", url) for n, url in WEBHOOKS_DEFAULT.items()},
+    }
+
+
+def tenants(clientes: pd.DataFrame) -> Dict[str, dict]:
+    """{tenant_id: configuración}, en el orden de la hoja."""
+    return {t["tenant_id"]: t for t in (tenant_desde_fila(row) for _, row in clientes.iterrows())}
+
+
+def sheets_activos(clientes: pd.DataFrame) -> List[str]:
+    """sheet_id distintos de los tenants activos."""
+    if "sheet_id" not in clientes.columns:
+        return []
+    return clientes["sheet_id"].dropna().astype(str).str.strip().unique().tolist()
+
+
+def urls_globales(config: pd.DataFrame) -> dict:
+    """predictor_url y reporteria_url de la primera fila de la pestaña config."""
+    if config is None or config.empty:
+        return {}
+    df = config.copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    row = df.iloc[0]
+    return {
+        "predictor_url": str(row.get("predictor_url", "")).strip(),
+        "reporteria_url": str(row.get("reporteria_url", "")).strip(),
+    }
+
+
+def url_con_tenant(url: str, tenant_id: str) -> str:
+    if not tenant_id:
+        return url
+    sep = "&" if "?" in url else "?"
+    return f"{url}{sep}tenant={tenant_id}"
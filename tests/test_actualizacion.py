@@ -0,0 +1,188 @@
+# Disparo de escenarios Make y espera de hojas frescas contra un servidor HTTP
+# local que hace de webhook de Make y de export CSV de Google Sheets.
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import actualizacion
+import prediccion
+import sheets
+import snapshots
+
+ESPERA_WEBHOOK_SEG = 0.5
+
+
+class _Estado:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.posts = []            # (escenario, inicio)
+        self.lecturas = {}         # tab -> n° de GET
+        self.cambia_en = {}        # tab -> desde qué lectura cambia el contenido (None: nunca)
+
+    def csv(self, tab: str) -> bytes:
+        with self.lock:
+            n = self.lecturas[tab] = self.lecturas.get(tab, 0) + 1
+        cambia = self.cambia_en.get(tab)
+        qty = 2 if cambia is not None and n >= cambia else 1
+        return f"sku,qty\nA,{qty}\n".encode("utf-8")
+
+
+@pytest.fixture
+def servidor(monkeypatch, tmp_path):
+    estado = _Estado()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            escenario = self.path.rsplit("/", 1)[-1]
+            with estado.lock:
+                estado.posts.append((escenario, time.monotonic()))
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(ESPERA_WEBHOOK_SEG)
+            self.send_response(500 if escenario == "caido" else 200)
+            if escenario.endswith("_listo"):   # "Webhook response" al final del escenario
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"terminado": true, "cambios": false}')
+                return
+            self.end_headers()
+            self.wfile.write(b"Accepted")
+
+        def do_GET(self):
+            tab = parse_qs(urlparse(self.path).query)["sheet"][0]
+            cuerpo = estado.csv(tab)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(sheets, "GSHEETS_BASE_URL", f"{base}/d")
+    monkeypatch.chdir(tmp_path)   # snapshots/ de los refrescos de fondo
+    estado.base = base
+    yield estado
+    server.shutdown()
+    server.server_close()
+
+
+def test_escenarios_se_disparan_en_paralelo(servidor):
+    t0 = time.monotonic()
+    respuestas = actualizacion.disparar_escenarios({
+        n: (f"{servidor.base}/hook/{n}", {"tenant_id": "t"}) for n in ["S1", "S2", "S3"]
+    })
+    duracion = time.monotonic() - t0
+
+    assert all(r["ok"] for r in respuestas.values())
+    assert sorted(n for n, _ in servidor.posts) == ["S1", "S2", "S3"]
+    inicios = [t for _, t in servidor.posts]
+    assert max(inicios) - min(inicios) < ESPERA_WEBHOOK_SEG
+    assert duracion < 2 * ESPERA_WEBHOOK_SEG
+
+
+def test_sondeo_termina_apenas_cambia_la_huella(servidor):
+    servidor.cambia_en["ventas_raw"] = 3   # 1 lectura previa + 1 sondeo igual + 1 sondeo distinto
+    previas = actualizacion.huellas_actuales("sh_cambio", ["ventas_raw"], lector=sheets.descargar_tab)
+
+    t0 = time.monotonic()
+    cambios = actualizacion.esperar_actualizacion(
+        "sh_cambio", previas, lector=sheets.descargar_tab, plazo=30, espera_inicial=0.05, espera_max=0.1,
+    )
+
+    assert cambios == {"ventas_raw": True}
+    assert servidor.lecturas["ventas_raw"] == 3
+    assert time.monotonic() - t0 < 2
+
+
+def test_plazo_vencido_devuelve_false_para_esa_pestana(servidor):
+    servidor.cambia_en["inbound_po"] = 2
+    tabs = ["stock_snapshot", "inbound_po"]   # stock_snapshot nunca cambia
+    previas = actualizacion.huellas_actuales("sh_plazo", tabs, lector=sheets.descargar_tab)
+
+    t0 = time.monotonic()
+    cambios = actualizacion.esperar_actualizacion(
+        "sh_plazo", previas, lector=sheets.descargar_tab, plazo=0.4, espera_inicial=0.05, espera_max=0.1,
+    )
+
+    assert cambios == {"stock_snapshot": False, "inbound_po": True}
+    assert time.monotonic() - t0 < 2
+    # la pestaña que cambió deja de sondearse; la otra sigue hasta el plazo
+    assert servidor.lecturas["inbound_po"] == 2
+    assert servidor.lecturas["stock_snapshot"] > 2
+
+
+def test_webhook_caido_devuelve_ok_false():
+    assert actualizacion.trigger_make("", {})["ok"] is False
+    assert actualizacion.trigger_make("http://127.0.0.1:9/hook", {})["ok"] is False
+
+
+def test_no_se_espera_por_el_escenario_que_fallo(servidor):
+    servidor.cambia_en.update({"ventas_raw": 2, "inbound_po": 2})
+    tenant = {
+        "tenant_id": "t",
+        "sheet_id": "sh_caido",
+        "offline": False,
+        "webhooks": {
+            "S1": f"{servidor.base}/hook/S1",
+            "S2": f"{servidor.base}/hook/caido",
+            "S3": f"{servidor.base}/hook/S3",
+        },
+    }
+
+    t0 = time.monotonic()
+    respuestas, cambios = prediccion.actualizar_y_esperar(tenant, lector_online=sheets.descargar_tab)
+    snapshots.esperar_refresco("sh_caido", timeout=10)
+
+    assert respuestas["S2"]["ok"] is False
+    assert respuestas["S1"]["ok"] and respuestas["S3"]["ok"]
+    assert cambios == {"ventas_raw": True, "inbound_po": True}
+    assert time.monotonic() - t0 < actualizacion.PLAZO_SEG / 10
+
+
+def test_webhook_que_avisa_fin_sin_cambios(servidor):
+    respuesta = actualizacion.trigger_make(f"{servidor.base}/hook/S1_listo", {})
+    assert respuesta["ok"] and respuesta["terminado"] and respuesta["cambios"] is False
+    assert actualizacion.plazo_escenario(respuesta) == 0
+    assert "terminado" not in actualizacion.trigger_make(f"{servidor.base}/hook/S1", {})
+
+
+def test_escenario_terminado_sin_cambios_no_espera_el_plazo(servidor):
+    # ninguna pestaña cambia: sin aviso de Make esto esperaría PLAZO_SEG
+    tenant = {
+        "tenant_id": "t",
+        "sheet_id": "sh_listo",
+        "offline": False,
+        "webhooks": {n: f"{servidor.base}/hook/{n}_listo" for n in ["S1", "S2", "S3"]},
+    }
+
+    t0 = time.monotonic()
+    respuestas, cambios = prediccion.actualizar_y_esperar(tenant, lector_online=sheets.descargar_tab)
+
+    assert all(r["terminado"] for r in respuestas.values())
+    assert cambios == {"ventas_raw": False, "stock_snapshot": False, "inbound_po": False}
+    assert time.monotonic() - t0 < actualizacion.PLAZO_TERMINADO_SEG
+    # una lectura previa y una de confirmación por pestaña
+    assert servidor.lecturas == {"ventas_raw": 2, "stock_snapshot": 2, "inbound_po": 2}
+
+
+def test_plazo_por_pestana(servidor):
+    tabs = ["ventas_raw", "inbound_po"]   # ninguna cambia
+    previas = actualizacion.huellas_actuales("sh_plazos", tabs, lector=sheets.descargar_tab)
+
+    cambios = actualizacion.esperar_actualizacion(
+        "sh_plazos", previas, lector=sheets.descargar_tab, plazo=0.4, espera_inicial=0.05, espera_max=0.1,
+        plazos={"ventas_raw": 0},
+    )
+
+    assert cambios == {"ventas_raw": False, "inbound_po": False}
+    assert servidor.lecturas["ventas_raw"] == 2
+    assert servidor.lecturas["inbound_po"] > 2
@@ -0,0 +1,19 @@
+# Lo que entrega la caché compartida: vistas que una sesión puede modificar
+# sin tocar lo que reciben las demás.
+
+import pandas as pd
+
+from cache_compartida import CacheCompartida
+
+
+def test_cambio_in_place_de_una_sesion_no_llega_a_otra():
+    cache = CacheCompartida(10)
+    cargar = lambda: pd.DataFrame({"sku": ["a", "b"], "qty": [1.0, 2.0]})
+
+    primera, _ = cache.obtener("k", cargar)
+    primera.loc[0, "qty"] = 99.0
+    primera["qty"] *= 2
+    segunda, hit = cache.obtener("k", cargar)
+
+    assert hit
+    assert segunda["qty"].tolist() == [1.0, 2.0]
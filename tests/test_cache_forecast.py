@@ -0,0 +1,65 @@
+# Recálculo parcial: mismo resultado (incluido el orden de filas) que una
+# corrida completa sobre las mismas entradas.
+
+import sys
+
+import pandas as pd
+import pytest
+
+import cache_forecast
+
+
+@pytest.fixture(autouse=True)
+def directorio(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_forecast, "CACHE_DIR", str(tmp_path))
+
+
+def _forecast(ventas, stock, config, inbound, freq, horizon_override):
+    # orden de salida propio del core (no el de las entradas)
+    ventas = ventas.iloc[::-1]
+    det = ventas.assign(pred=ventas["qty"] * 2)
+    res = ventas.groupby("sku", sort=False, as_index=False)["qty"].sum()
+    return det.reset_index(drop=True), res, res.rename(columns={"qty": "prop"})
+
+
+def _entradas(qty_b: int) -> dict:
+    skus = ["10", "9", "B", "A"] * 3
+    ventas = pd.DataFrame({"sku": skus, "qty": range(len(skus))})
+    ventas.loc[ventas["sku"] == "B", "qty"] = qty_b
+    return {"ventas": ventas, "stock": None, "config": None, "inbound": None}
+
+
+def test_parcial_mismo_orden_que_corrida_completa(tmp_path, monkeypatch):
+    cache_forecast.forecast_cacheado(_entradas(1), "M", None, "t", _forecast, max_fraccion_parcial=1.0)
+    parcial, estado = cache_forecast.forecast_cacheado(_entradas(5), "M", None, "t", _forecast,
+                                                       max_fraccion_parcial=1.0)
+    assert estado.startswith("parcial")
+
+    monkeypatch.setattr(cache_forecast, "CACHE_DIR", str(tmp_path / "limpio"))
+    completo, estado = cache_forecast.forecast_cacheado(_entradas(5), "M", None, "t", _forecast)
+    assert estado == "miss"
+
+    for a, b in zip(parcial, completo):
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_otra_version_del_core_no_usa_lo_guardado(monkeypatch):
+    monkeypatch.setattr(cache_forecast, "version_core", lambda: "1.0:aaa")
+    cache_forecast.forecast_cacheado(_entradas(1), "M", None, "t", _forecast)
+    _, estado = cache_forecast.forecast_cacheado(_entradas(1), "M", None, "t", _forecast)
+    assert estado == "hit"
+
+    monkeypatch.setattr(cache_forecast, "version_core", lambda: "1.1:bbb")
+    _, estado = cache_forecast.forecast_cacheado(_entradas(1), "M", None, "t", _forecast)
+    assert estado == "miss"   # ni siquiera parcial: la corrida anterior es de otro modelo
+
+
+def test_version_core_sigue_al_codigo(monkeypatch, tmp_path):
+    (tmp_path / "predictor_core.py").write_text("__version__ = '2.0'\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "predictor_core", raising=False)
+    cache_forecast.version_core.cache_clear()
+    try:
+        assert cache_forecast.version_core().startswith("2.0:")
+    finally:
+        cache_forecast.version_core.cache_clear()
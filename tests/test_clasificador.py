@@ -0,0 +1,25 @@
+# normalizar_serie con el memo compartido lleno o vaciado por otra sesión.
+
+import pandas as pd
+
+import clasificador
+
+
+def test_memo_lleno_no_pierde_valores(monkeypatch):
+    monkeypatch.setattr(clasificador, "MEMO_NORMALIZAR_MAX", 3)
+    monkeypatch.setattr(clasificador, "_memo_normalizar", {})
+
+    assert clasificador.normalizar_serie(pd.Series(["a", "b"])).tolist() == ["A", "B"]
+    assert clasificador.normalizar_serie(pd.Series(["a", "c", "d"])).tolist() == ["A", "C", "D"]
+    assert clasificador.normalizar_serie(pd.Series(list("éfghij"))).tolist() == list("EFGHIJ")
+    assert len(clasificador._memo_normalizar) <= 3
+
+
+def test_memo_vaciado_por_otra_sesion(monkeypatch):
+    class Memo(dict):
+        def update(self, *args):
+            super().update(*args)
+            self.clear()   # otra sesión lo vacía justo después de escribir
+
+    monkeypatch.setattr(clasificador, "_memo_normalizar", Memo(a="A"))
+    assert clasificador.normalizar_serie(pd.Series(["a", "b", None])).tolist() == ["A", "B", ""]
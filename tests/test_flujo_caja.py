@@ -0,0 +1,46 @@
+# Comparativo con store de cartolas: directorio vacío y sesiones que llegan
+# mientras otra está ingiriendo.
+
+import threading
+
+import pandas as pd
+import pytest
+
+import flujo_caja
+from cache_compartida import TENANTS
+
+
+@pytest.fixture
+def directorio(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "cartolas").mkdir()
+    pd.DataFrame({"CLASIFICACION": ["VENTAS"], "2025-07-01": [100.0]}).to_excel(
+        tmp_path / flujo_caja.PROYECCION_PATH, index=False)
+    TENANTS.invalidar(lambda c: c[0] == flujo_caja.CLAVE_CACHE)
+    return tmp_path
+
+
+def test_store_vacio(directorio):
+    real, cruce, totales = flujo_caja.comparativo_compartido()
+    assert real.empty and totales.empty
+    assert pd.api.types.is_datetime64_any_dtype(real["FECHA"])
+    assert len(cruce) == 1
+
+
+def test_ingesta_en_curso_entrega_lo_ya_armado(directorio):
+    previo = flujo_caja.comparativo_compartido()
+    with flujo_caja._lock_store:
+        otra = flujo_caja.comparativo_compartido()   # no espera la ingesta
+    pd.testing.assert_frame_equal(otra[1], previo[1])
+
+
+def test_ingesta_en_curso_sin_nada_armado_espera(directorio):
+    resultado = []
+    flujo_caja._ultimas.clear()
+    with flujo_caja._lock_store:
+        hilo = threading.Thread(target=lambda: resultado.append(flujo_caja.comparativo_compartido()))
+        hilo.start()
+        hilo.join(0.3)
+        assert hilo.is_alive()   # no arma con un store a medio escribir
+    hilo.join(10)
+    assert len(resultado) == 1
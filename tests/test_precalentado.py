@@ -0,0 +1,68 @@
+# Precalentado guiado por cambios: solo se rearma lo que depende de pestañas
+# cuyo hash cambió, el ciclo periódico recorre todos los tenants (los usados
+# recientemente primero) y solicitar (tras Make) relee todo.
+
+import pandas as pd
+import pytest
+
+import cache_compartida
+import precalentado
+import snapshots
+from prediccion import TABS_LECTURA
+
+SHEET = "sh_precalentado"
+
+
+@pytest.fixture
+def precalentador(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    for tab in TABS_LECTURA:
+        snapshots.guardar_snapshot(SHEET, tab, pd.DataFrame({"qty": [1]}))
+
+    llamadas = []
+    monkeypatch.setitem(precalentado.POR_TENANT, "snapshots", lambda tenant, recargar: None)
+    monkeypatch.setitem(precalentado.POR_TENANT, "predictor",
+                        lambda tenant, recargar: llamadas.append(list(recargar)))
+    p = precalentado.Precalentador("predictor", cadencia=0)
+    monkeypatch.setattr(p, "tenants", lambda: [{"tenant_id": "t", "sheet_id": SHEET, "offline": True}])
+    p.llamadas = llamadas
+    return p
+
+
+def _estado_predictor(estados: pd.DataFrame) -> str:
+    return estados.loc[estados["paso"] == "predictor", "estado"].iloc[0]
+
+
+def test_solo_se_rearma_con_pestanas_nuevas(precalentador):
+    precalentador.ciclo()
+    assert precalentador.llamadas == [[]]
+
+    assert _estado_predictor(precalentador.ciclo()) == "sin cambios"
+    assert len(precalentador.llamadas) == 1
+
+    snapshots.guardar_snapshot(SHEET, "stock_snapshot", pd.DataFrame({"qty": [2]}))
+    precalentador.ciclo()
+    assert precalentador.llamadas[-1] == ["stock_snapshot"]
+
+    precalentador.ciclo({SHEET}, forzar=True, globales=False)
+    assert precalentador.llamadas[-1] == TABS_LECTURA
+
+
+def test_ciclo_recorre_todos_los_tenants_recientes_primero(precalentador, monkeypatch):
+    lista = [{"tenant_id": n, "sheet_id": f"{SHEET}_{n}", "offline": True} for n in ["a", "b", "c"]]
+    monkeypatch.setattr(precalentador, "tenants", lambda: [dict(t) for t in lista])
+    cache_compartida.por_tenant(f"{SHEET}_c", "x", lambda: 1)
+
+    estados = precalentador.ciclo()
+
+    # nadie miró a y b (p.ej. a primera hora) y se calientan igual, después de c
+    assert list(dict.fromkeys(estados["tenant"])) == ["c", "a", "b"]
+
+
+def test_uso_se_registra_tambien_sin_acierto():
+    assert cache_compartida.ultimo_uso("sh_usos") == float("-inf")
+    cache_compartida.por_tenant("sh_usos", "x", lambda: 1)
+    primero = cache_compartida.ultimo_uso("sh_usos")
+    assert primero > float("-inf")
+    cache_compartida.por_tenant("sh_usos", "x", lambda: 1)
+    assert cache_compartida.ultimo_uso("sh_usos") >= primero
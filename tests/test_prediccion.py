@@ -0,0 +1,37 @@
+# Frames normalizados compartidos: se reutilizan mientras las pestañas sean las
+# mismas y se rearman apenas llega una carga nueva de alguna.
+
+import pandas as pd
+
+import prediccion
+import sheets
+
+
+def test_normalizadas_siguen_a_las_pestanas(monkeypatch):
+    llamadas = []
+
+    def _normalizar(tabs, sheet_id, sku=None):
+        llamadas.append({t: df["qty"].tolist() for t, df in tabs.items()})
+        return {}
+
+    monkeypatch.setattr(prediccion, "normalizar_tabs", _normalizar)
+    lector = lambda sheet_id, tab: pd.DataFrame({"qty": [1]})
+    sheet_id = "sh_normalizadas"
+
+    tabs, _ = sheets.leer_tabs(sheet_id, ["ventas_raw", "stock_snapshot"], lector=lector)
+    prediccion.normalizadas_compartidas(tabs, sheet_id)
+    tabs, _ = sheets.leer_tabs(sheet_id, ["ventas_raw", "stock_snapshot"], lector=lector)
+    prediccion.normalizadas_compartidas(tabs, sheet_id)
+    assert len(llamadas) == 1
+
+    # el sondeo tras Make deja una pestaña nueva en la caché (sin invalidar el tenant)
+    sheets.guardar(sheet_id, "stock_snapshot", pd.DataFrame({"qty": [2]}))
+    tabs, _ = sheets.leer_tabs(sheet_id, ["ventas_raw", "stock_snapshot"], lector=lector)
+    prediccion.normalizadas_compartidas(tabs, sheet_id)
+    assert llamadas[-1] == {"ventas_raw": [1], "stock_snapshot": [2]}
+
+    # frames que no salen de la caché entran por su huella
+    propios = {"ventas_raw": pd.DataFrame({"qty": [3]})}
+    prediccion.normalizadas_compartidas(propios, sheet_id)
+    prediccion.normalizadas_compartidas({"ventas_raw": pd.DataFrame({"qty": [3]})}, sheet_id)
+    assert len(llamadas) == 3
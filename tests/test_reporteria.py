@@ -0,0 +1,57 @@
+# Carga compartida de un tenant: la clave sigue a las copias locales, también
+# cuando es la propia carga la que las baja por primera vez.
+
+import pandas as pd
+import pytest
+
+import reporteria
+import snapshots
+
+
+@pytest.fixture(autouse=True)
+def directorio(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+
+
+def test_tenant_sin_copias_se_carga_una_vez(monkeypatch):
+    cargas = []
+
+    def _cargar_tenant(sheet_id, lector, lector_config=None, partes=None):
+        # como lector_con_snapshot: sin copia local, la baja y la guarda
+        for tab in reporteria.TABS_REPORTERIA:
+            if snapshots.leer_info(sheet_id, tab) is None:
+                snapshots.guardar_snapshot(sheet_id, tab, pd.DataFrame({"qty": [1]}))
+        cargas.append(sheet_id)
+        return None, pd.DataFrame(), pd.DataFrame()
+
+    monkeypatch.setattr(reporteria, "cargar_tenant", _cargar_tenant)
+    lector = lambda sheet_id, tab: pd.DataFrame()
+
+    reporteria.tenant_compartido("sh_frio", lector, modo="online")
+    reporteria.tenant_compartido("sh_frio", lector, modo="online")
+    assert len(cargas) == 1
+
+    snapshots.guardar_snapshot("sh_frio", reporteria.TAB_STOCK, pd.DataFrame({"qty": [2]}))
+    reporteria.tenant_compartido("sh_frio", lector, modo="online")
+    assert len(cargas) == 2
+
+
+def test_rollup_por_partes_igual_al_de_la_pestana_entera():
+    dias = pd.date_range("2025-01-01", periods=60).strftime("%Y-%m-%d")
+    ventas = pd.DataFrame({
+        "fecha": [dias[i % 60] for i in range(500)],
+        "sku": [f"s{i % 37}" for i in range(500)],
+        "qty": [str(i % 7) for i in range(500)],
+    })
+    snapshots.guardar_snapshot_por_partes("sh_partes", "ventas_raw",
+                                          (ventas.iloc[i:i + 90] for i in range(0, len(ventas), 90)))
+    assert len(list(snapshots.leer_snapshot_por_partes("sh_partes", "ventas_raw"))) > 1
+    assert snapshots.leer_snapshot_por_partes("sh_partes", "stock_snapshot") is None
+
+    lector = snapshots.leer_snapshot
+    completo = reporteria.VentasCompactas.desde_tab(lector("sh_partes", "ventas_raw"))
+    por_partes = reporteria.VentasCompactas.desde_partes(snapshots.leer_snapshot_por_partes("sh_partes", "ventas_raw"))
+
+    assert list(por_partes.skus) == list(completo.skus)
+    for campo in ["codigos", "dias", "qty"]:
+        assert (getattr(por_partes, campo) == getattr(completo, campo)).all()
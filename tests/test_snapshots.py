@@ -0,0 +1,88 @@
+# Escritura concurrente de copias locales: sin temporales compartidos y con el
+# manifest describiendo siempre el archivo que quedó.
+
+import json
+import multiprocessing
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import snapshots
+from actualizacion import huella
+
+
+@pytest.fixture(autouse=True)
+def directorio(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+
+
+def test_escrituras_concurrentes_de_la_misma_pestana():
+    frames = [pd.DataFrame({"sku": [f"A{i}"] * 2000, "qty": range(2000)}) for i in range(8)]
+    errores = []
+
+    def _escribir(df):
+        try:
+            snapshots.guardar_snapshot("sh", "stock_snapshot", df)
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=_escribir, args=(df,)) for df in frames]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert errores == []
+    leido = snapshots.leer_snapshot("sh", "stock_snapshot")
+    assert snapshots.leer_manifest("sh")["stock_snapshot"]["hash"] == huella(leido)
+    assert [n for n in os.listdir(snapshots._ruta("sh", "")) if n.endswith(".tmp")] == []
+
+
+def test_hash_por_partes_es_la_huella_del_frame_completo():
+    df = pd.DataFrame({"sku": [f"S{i}" for i in range(25)], "2025-01": [str(i) for i in range(25)]}, dtype=str)
+    partes = [df.iloc[i:i + 10].reset_index(drop=True) for i in range(0, len(df), 10)]
+
+    info = snapshots.guardar_snapshot_por_partes("sh", "ventas_raw", partes)
+
+    assert info["hash"] == huella(df)
+    assert info["hash"] == huella(snapshots.leer_snapshot("sh", "ventas_raw"))
+    assert info["filas"] == len(df)
+
+
+def _escribir_varias(directorio, tab, veces):
+    snapshots.SNAPSHOT_DIR = directorio
+    for i in range(veces):
+        snapshots.guardar_snapshot("sh", tab, pd.DataFrame({"qty": [i]}))
+
+
+def test_procesos_distintos_no_pisan_el_manifest_de_otra_pestana(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    procesos = [ctx.Process(target=_escribir_varias, args=(str(tmp_path), tab, 30))
+                for tab in ["stock_snapshot", "inbound_po"]]
+    for p in procesos:
+        p.start()
+    for p in procesos:
+        p.join(60)
+    assert all(p.exitcode == 0 for p in procesos)
+
+    manifest = snapshots.leer_manifest("sh")
+    assert set(manifest) == {"stock_snapshot", "inbound_po"}
+    for tab, info in manifest.items():
+        assert info["hash"] == huella(snapshots.leer_snapshot("sh", tab))
+    assert [n for n in os.listdir(snapshots._ruta("sh", "")) if n.endswith(".tmp")] == []
+
+
+def test_vencer_y_manifest_anterior(tmp_path):
+    os.makedirs(snapshots._ruta("sh", ""))
+    legado = {"config": {"fetched_at": "2026-01-01T00:00:00+00:00", "hash": "h0", "filas": 1}}
+    with open(snapshots._ruta("sh", snapshots.MANIFEST_LEGADO), "w", encoding="utf-8") as f:
+        json.dump(legado, f)
+    snapshots.guardar_snapshot("sh", "stock_snapshot", pd.DataFrame({"qty": [1]}))
+
+    assert snapshots.huellas_snapshot("sh", ["config", "stock_snapshot", "inbound_po"])[0] == ("config", "h0")
+    snapshots.vencer("sh", ["config", "stock_snapshot", "inbound_po"])
+    assert snapshots.tabs_vencidas("sh", ["config", "stock_snapshot"]) == ["config", "stock_snapshot"]
+    assert snapshots.leer_info("sh", "config")["hash"] == "h0"
+    assert snapshots.leer_info("sh", "inbound_po") is None